@@ -86,6 +86,14 @@ class MDPDPTWInstance:
     def id_(self):
         return self._id_
 
+    @property
+    def distance_matrix(self) -> np.ndarray:
+        """
+        the (integer) distance matrix. Allows vectorized computations, e.g. distance_matrix[i_array, j_array]. Must not
+        be modified!
+        """
+        return self._distance_matrix
+
     def distance(self, i: Sequence[int], j: Sequence[int]):
         """
         returns the distance between pairs of elements in i and j. Think sum(distance(i[0], j[0]), distance(i[1], j[1]),
@@ -1,6 +1,7 @@
 import datetime as dt
 import json
-from typing import List, Sequence, Dict
+from copy import deepcopy
+from typing import List, Sequence, Dict, Tuple, Union
 
 import numpy as np
 
@@ -31,6 +32,8 @@ class CAHDSolution:
                                               PDPTwoOpt=0,
                                               PDPRelocate=0,
                                               PDPRelocate2=0,
+                                              PDPExchange=0,
+                                              PDPOrOpt=0,
                                               PDPLargeInterTourNeighborhood=0)
 
     def __str__(self):
@@ -61,6 +64,8 @@ class CAHDSolution:
         config['tour_construction'] = solver.tour_construction.name
         config['tour_improvement'] = solver.tour_improvement.name
         config['tour_improvement_time_limit_per_carrier'] = solver.tour_improvement.time_limit_per_carrier
+        config['tour_improvement_budget_unit'] = solver.tour_improvement.budget_unit
+        config['tour_improvement_budget_per_carrier'] = solver.tour_improvement.budget_per_carrier
         config['neighborhoods'] = '+'.join([nbh.name for nbh in solver.tour_improvement.neighborhoods])
         config['time_window_offering'] = solver.time_window_offering.name
         config['time_window_selection'] = solver.time_window_selection.name
@@ -179,12 +184,117 @@ class CAHDSolution:
                 self.tours[tour_id] = None
             carrier.tours.clear()
 
+    def carrier_checkpoint(self, carrier_id: int):
+        """
+        a snapshot of the carrier's tours and request lists from which the carrier can be restored, see
+        restore_carrier. Only the carrier's own data is copied, which is much cheaper than copying the whole solution.
+
+        :return: the checkpoint as (carrier_id, tours, request lists, acceptance_rate)
+        """
+        carrier = self.carriers[carrier_id]
+        request_lists = (carrier.assigned_requests[:], carrier.accepted_requests[:], carrier.rejected_requests[:],
+                         carrier.unrouted_requests[:], carrier.routed_requests[:])
+        return carrier_id, [deepcopy(tour) for tour in carrier.tours], request_lists, carrier.acceptance_rate
+
+    def restore_carrier(self, checkpoint):
+        """
+        reset the carrier to the state of the checkpoint (see carrier_checkpoint), in place. In the meantime, only
+        this carrier must have been modified. The checkpoint is not consumed, i.e. it can be restored multiple times.
+
+        The carrier's current tours are restored in place (see Tour.restore) rather than replaced by copies. Thus,
+        anything that is keyed on the tour objects and their versions, e.g. the don't-look bits and move caches of the
+        neighborhoods, is as valid after the restore as it was when the checkpoint was taken.
+        """
+        carrier_id, tours, request_lists, acceptance_rate = checkpoint
+        carrier = self.carriers[carrier_id]
+
+        # release the ids of tours that have been created since the checkpoint
+        checkpoint_tour_ids = {tour.id_ for tour in tours}
+        for tour in carrier.tours:
+            if tour.id_ not in checkpoint_tour_ids:
+                self.tours[tour.id_] = None
+
+        current_tours = {tour.id_: tour for tour in carrier.tours}
+        restored_tours = []
+        for checkpoint_tour in tours:
+            tour = current_tours.get(checkpoint_tour.id_)
+            if tour is None:
+                # the tour has been dropped since the checkpoint
+                tour = deepcopy(checkpoint_tour)
+            else:
+                tour.restore(checkpoint_tour)
+            self.tours[tour.id_] = tour
+            restored_tours.append(tour)
+        carrier.tours = restored_tours
+        carrier.assigned_requests, carrier.accepted_requests, carrier.rejected_requests, carrier.unrouted_requests, \
+        carrier.routed_requests = (requests[:] for requests in request_lists)
+        carrier.acceptance_rate = acceptance_rate
+
+    def merge_carrier(self, checkpoint):
+        """
+        replace the carrier by a checkpoint (see carrier_checkpoint) that was taken from a different copy of this
+        solution, e.g. in a worker process. Other than in restore_carrier, the ids of the checkpoint's tours may be
+        in use by other carriers and are thus re-assigned. The checkpoint is consumed, i.e. its tours are used directly
+        """
+        carrier_id, tours, request_lists, acceptance_rate = checkpoint
+        carrier = self.carriers[carrier_id]
+
+        for tour in carrier.tours:
+            self.tours[tour.id_] = None
+        carrier.tours = []
+        for tour in tours:
+            tour.id_ = self.get_free_tour_id()
+            if tour.id_ < len(self.tours):
+                self.tours[tour.id_] = tour
+            else:
+                self.tours.append(tour)
+            carrier.tours.append(tour)
+        carrier.assigned_requests, carrier.accepted_requests, carrier.rejected_requests, carrier.unrouted_requests, \
+        carrier.routed_requests = request_lists
+        carrier.acceptance_rate = acceptance_rate
+
+    def carrier_encoding(self, carrier_id: int) -> Tuple[Tuple[int, ...], ...]:
+        """
+        compact encoding of the carrier's routing: the routing sequence of each tour without the depots. Other than a
+        checkpoint (see carrier_checkpoint), it contains no schedule data and is thus cheap to send to other processes.
+        See decode_carrier.
+        """
+        return tuple(tuple(tour.routing_sequence[1:-1]) for tour in self.carriers[carrier_id].tours)
+
+    def decode_carrier(self, instance: it.MDPDPTWInstance, carrier_id: int,
+                       encoding: Tuple[Tuple[int, ...], ...]):
+        """
+        rebuild the carrier's tours (in place) from a carrier_encoding of a routing of the same routed requests. The
+        tours are created anew and get new ids
+        """
+        carrier = self.carriers[carrier_id]
+        for tour in carrier.tours:
+            self.tours[tour.id_] = None
+        carrier.tours = []
+        for routing_sequence in encoding:
+            if not routing_sequence:
+                continue
+            tour_id = self.get_free_tour_id()
+            tour = tr.Tour(tour_id, depot_index=carrier.id_)
+            tour.insert_and_update(instance, range(1, len(routing_sequence) + 1), routing_sequence)
+            tour.requests.update(instance.request_from_vertex(vertex) for vertex in routing_sequence
+                                 if instance.vertex_type(vertex) == 'pickup')
+            if tour_id < len(self.tours):
+                self.tours[tour_id] = tour
+            else:
+                self.tours.append(tour)
+            carrier.tours.append(tour)
+
     def get_free_tour_id(self):
-        if None in self.tours:
-            tour_id = self.tours.index(None)
-        else:
-            tour_id = len(self.tours)
-        return tour_id
+        """
+        the smallest id that is not used by a tour of any carrier. Tours that have been dropped from their carrier
+        without releasing their id, i.e. by a neighborhood move that emptied them, do not block their id. Since only
+        empty tours are dropped, only those are looked up in their carrier's tours
+        """
+        for tour_id, tour in enumerate(self.tours):
+            if tour is None or (len(tour) <= 2 and tour not in self.carriers[tour.routing_sequence[0]].tours):
+                return tour_id
+        return len(self.tours)
 
     def as_dict(self):
         """The solution as a nested python dictionary"""
@@ -237,6 +347,8 @@ class AHDSolution:
         self.routed_requests: List = []
         self.acceptance_rate: float = 0
         self.tours: List[tr.Tour] = []
+        # lower bound on the travel distance of the routed requests, see routing_module.bounds. Set by the solver
+        self.travel_distance_lower_bound: Union[None, float] = None
 
     def __str__(self):
         s = f'---// Carrier ID: {self.id_} //---' \
@@ -276,6 +388,15 @@ class AHDSolution:
     def objective(self):
         return self.sum_profit()
 
+    def travel_distance_gap(self) -> Union[None, float]:
+        """relative gap of the travel distance to its lower bound, None if no bound has been computed"""
+        if self.travel_distance_lower_bound is None:
+            return None
+        distance = self.sum_travel_distance()
+        if distance <= 0:
+            return 0
+        return (distance - self.travel_distance_lower_bound) / distance
+
     def as_dict(self):
         return {
             # 'id_': self.id_,
@@ -296,5 +417,7 @@ class AHDSolution:
             'sum_load': self.sum_load(),
             'sum_revenue': self.sum_revenue(),
             'acceptance_rate': self.acceptance_rate,
+            'travel_distance_lower_bound': self.travel_distance_lower_bound,
+            'travel_distance_gap': self.travel_distance_gap(),
             'tour_summaries': {t.id_: t.summary() for t in self.tours}
         }
@@ -1,12 +1,33 @@
 import datetime as dt
+import itertools
 import logging.config
 from copy import deepcopy
-from typing import List, Sequence, Set, Dict
+from collections import namedtuple
+from typing import List, Sequence, Set, Dict, Union, Tuple
+
+import numpy as np
 
 import utility_module.utils as ut
 
 logger = logging.getLogger(__name__)
 
+# Concatenation data of a (sub-)sequence of vertices, following
+# Vidal,T., Crainic,T.G., Gendreau,M., & Prins,C. (2013). A hybrid genetic algorithm with adaptive diversity management
+# for a large class of vehicle routing problems with time-windows. Computers & Operations Research, 40(1), 475–489.
+# https://doi.org/10.1016/j.cor.2012.07.018
+# earliest and latest are the earliest and latest feasible start of service at the first vertex, duration is the minimum
+# duration from there until the end of service at the last vertex (including waiting). load is the net change of the
+# load on board, max_load the maximum load on board relative to the load before the sequence.
+Segment = namedtuple('Segment', ['first', 'last', 'earliest', 'latest', 'duration', 'distance', 'load', 'max_load'])
+
+# number of schedule-kernel calls, i.e. of feasibility checks and schedule updates of Tour objects, in this process. A
+# machine-independent measure of the work of a search, see PDPTWMetaHeuristic.set_budget
+kernel_calls = 0
+
+# source of tour versions, see Tour.version. Process-wide, such that a tour never gets a version twice, even if it has
+# been restored to an earlier state (see Tour.restore) in the meantime
+_versions = itertools.count(1)
+
 
 class Tour:
     def __init__(self, id_: int, depot_index: int):
@@ -20,6 +41,9 @@ class Tour:
 
         self.id_ = id_
         self.requests: Set[int] = set()  # collection of routed requests, in order of insertion! not in order of pickup
+        # changes with every modification of the routing sequence, e.g. to validate caches. A tour only has the same
+        # version twice if it has been restored to an earlier state, see restore
+        self.version: int = 0
 
         # vertex data
         self.routing_sequence: List[int] = []  # vertices in order of service
@@ -36,6 +60,9 @@ class Tour:
         self.sum_revenue: float = 0.0
         self.sum_profit: float = 0.0
 
+        # (version, requests, removal deltas), see request_removal_distance_deltas
+        self._request_removal_deltas: Union[None, Tuple[int, List[int], np.ndarray]] = None
+
         # initialize depot to depot tour
         for _ in range(2):
             self.routing_sequence.insert(1, depot_index)
@@ -65,23 +92,33 @@ class Tour:
     def __deepcopy__(self, memodict={}):
         cls = self.__class__
         result = cls.__new__(cls)
-
-        setattr(result, 'id_', self.id_)
-        setattr(result, 'requests', self.requests.copy())
-        setattr(result, 'routing_sequence', self.routing_sequence[:])
-        setattr(result, 'vertex_pos', self.vertex_pos.copy())
-        setattr(result, 'arrival_time_sequence', self.arrival_time_sequence[:])
-        setattr(result, 'service_time_sequence', self.service_time_sequence[:])
-        setattr(result, 'wait_duration_sequence', self.wait_duration_sequence[:])
-        setattr(result, 'max_shift_sequence', self.max_shift_sequence[:])
-        setattr(result, 'sum_travel_distance', self.sum_travel_distance)
-        setattr(result, 'sum_travel_duration', self.sum_travel_duration)
-        setattr(result, 'sum_load', self.sum_load)
-        setattr(result, 'sum_revenue', self.sum_revenue)
-        setattr(result, 'sum_profit', self.sum_profit)
-
+        result.restore(self)
         return result
 
+    def restore(self, other: 'Tour'):
+        """
+        reset the tour in place to the state of other, usually a copy of this tour that was taken earlier (see
+        CAHDSolution.restore_carrier). The version is restored, too, such that caches that are keyed on this tour object
+        and on the version of that state (e.g. don't-look bits and cached moves of neighborhoods) become valid again.
+        other is not modified
+        """
+        self.id_ = other.id_
+        self.requests = other.requests.copy()
+        self.version = other.version
+        self.routing_sequence = other.routing_sequence[:]
+        self.vertex_pos = other.vertex_pos.copy()
+        self.arrival_time_sequence = other.arrival_time_sequence[:]
+        self.service_time_sequence = other.service_time_sequence[:]
+        self.wait_duration_sequence = other.wait_duration_sequence[:]
+        self.max_shift_sequence = other.max_shift_sequence[:]
+        self.sum_travel_distance = other.sum_travel_distance
+        self.sum_travel_duration = other.sum_travel_duration
+        self.sum_load = other.sum_load
+        self.sum_revenue = other.sum_revenue
+        self.sum_profit = other.sum_profit
+        # valid for this tour, too: it has the same routing and version
+        self._request_removal_deltas = other._request_removal_deltas
+
     @property
     def num_routing_stops(self):
         return len(self)
@@ -143,6 +180,8 @@ class Tour:
 
         :return: True if the insertion of the insertion_vertex at insertion_position is feasible, False otherwise
         """
+        global kernel_calls
+        kernel_calls += 1
 
         i = self.routing_sequence[insertion_index - 1]
         j = insertion_vertex
@@ -184,9 +223,17 @@ class Tour:
         if not tw_cond1 or not tw_cond2:
             return False
 
-        # [4] check max vehicle load FIXME this is incorrect because it does not consider that load can increase and decrease during the tour!
-        if self.sum_load + instance.vertex_load[j] > instance.vehicles_max_load:
-            return False
+        # [4] check max vehicle load: a pickup increases the load on board from its position until its delivery (or the
+        # end of the tour if the delivery is not routed yet), a delivery only decreases it
+        if instance.vertex_load[j] > 0:
+            end = self.vertex_pos.get(j + instance.num_requests, len(self) - 1)
+            load = sum(instance.vertex_load[vertex] for vertex in self.routing_sequence[:insertion_index])
+            max_load = load
+            for vertex in self.routing_sequence[insertion_index:end]:
+                load += instance.vertex_load[vertex]
+                max_load = max(max_load, load)
+            if max_load + instance.vertex_load[j] > instance.vehicles_max_load:
+                return False
 
         return True
 
@@ -195,7 +242,9 @@ class Tour:
                                     insertion_indices: Sequence[int],
                                     insertion_vertices: Sequence[int]):
         """
-        check whether an insertion of insertion_vertices at insertion_pos is feasible.
+        check whether an insertion of insertion_vertices at insertion_pos is feasible. Multiple vertices are checked
+        without copying the tour, see pop_insert_feasibility_check. Their precedence is not checked, i.e. a pickup must
+        be inserted before its delivery.
 
         :return: True if the combined insertion of all vertices in their corresponding positions is feasible, False
         otherwise
@@ -203,19 +252,177 @@ class Tour:
         if len(insertion_indices) == 1:
             return self._single_insertion_feasibility_check(instance, insertion_indices[0], insertion_vertices[0])
         else:
-            # sanity check whether insertion positions are sorted in ascending order
-            assert all(insertion_indices[i] < insertion_indices[i + 1] for i in range(len(insertion_indices) - 1))
+            return self.pop_insert_feasibility_check(instance, [], insertion_indices, insertion_vertices)
 
-            copy = deepcopy(self)
+    def reversal_feasibility_check(self, instance, i: int, j: int, reversed_sections: List[Segment] = None):
+        """
+        check whether reversing the section i+1, ..., j of the routing sequence is feasible WITHOUT modifying the tour.
+        The reversed section is summarized by its Segment data. Since the reversed section i+1, ..., j+1 is the vertex
+        j+1 followed by the reversed section i+1, ..., j, the summaries can be extended by one vertex in constant time.
+        Checking a reversal is then constant time given the summary, plus the time for extending it.
 
-            # check all insertions sequentially
-            for idx, (pos, vertex) in enumerate(zip(insertion_indices, insertion_vertices)):
-                if copy._single_insertion_feasibility_check(instance, pos, vertex):
-                    if idx < len(insertion_indices) - 1:  # to skip the last temporary insertion
-                        copy._single_insert_and_update(instance, pos, vertex)
-                else:
+        A section that violates precedence or time window constraints remains infeasible when it is extended, thus the
+        extension stops at the first violation.
+
+        :param reversed_sections: optional memo of the summaries of all reversed sections i+1, ..., i+1+k that have been
+         computed for the same tour version and the same i. Is extended in place; None marks an infeasible section
+        :return: True if the reversal is feasible, False otherwise
+        """
+        global kernel_calls
+        kernel_calls += 1
+        assert 0 <= i < j < len(self) - 1
+        if reversed_sections is None:
+            reversed_sections = []
+        routing_sequence = self.routing_sequence
+
+        # [1] extend the summaries of the reversed sections until the section i+1, ..., j is covered
+        while len(reversed_sections) < j - i:
+            if reversed_sections and reversed_sections[-1] is None:
+                return False
+            index = i + 1 + len(reversed_sections)
+            vertex = routing_sequence[index]
+
+            # precedence: vertex is visited before all vertices of the section after the reversal
+            if instance.vertex_type(vertex) == 'delivery' and \
+                    self.vertex_pos[vertex - instance.num_requests] > i:
+                reversed_sections.append(None)
+            elif not reversed_sections:
+                reversed_sections.append(vertex_segment(instance, vertex))
+            else:
+                reversed_sections.append(concatenate_segments(instance, vertex_segment(instance, vertex),
+                                                              reversed_sections[-1]))
+
+        section = reversed_sections[j - i - 1]
+        if section is None:
+            return False
+
+        # [2] check max tour distance (assumes symmetric distances)
+        distance_delta = instance.distance([routing_sequence[i], routing_sequence[i + 1]],
+                                           [routing_sequence[j], routing_sequence[j + 1]]) - \
+                         instance.distance([routing_sequence[i], routing_sequence[j]],
+                                           [routing_sequence[i + 1], routing_sequence[j + 1]])
+        if self.sum_travel_distance + distance_delta > instance.vehicles_max_travel_distance:
+            return False
+
+        # [3] check max vehicle load
+        load_on_board = sum(instance.vertex_load[vertex] for vertex in routing_sequence[:i + 1])
+        if load_on_board + section.max_load > instance.vehicles_max_load:
+            return False
+
+        # [4] check time windows of the reversed section
+        arrival = self.service_time_sequence[i] + \
+                  instance.vertex_service_duration[routing_sequence[i]] + \
+                  instance.travel_duration([routing_sequence[i]], [routing_sequence[j]])
+        if arrival > section.latest:
+            return False
+
+        # [5] check the time windows of the succeeding vertices: the time shift of j+1 is limited by wait + max_shift
+        arrival_succ = max(arrival, section.earliest) + section.duration + \
+                       instance.travel_duration([routing_sequence[i + 1]], [routing_sequence[j + 1]])
+        if arrival_succ > instance.tw_close[routing_sequence[j + 1]]:
+            return False
+        time_shift = arrival_succ - self.arrival_time_sequence[j + 1]
+        return time_shift <= self.wait_duration_sequence[j + 1] + self.max_shift_sequence[j + 1]
+
+    def segment_table(self, instance) -> List[List[Segment]]:
+        """
+        the Segment data of all sub-sequences of the routing sequence. Any sequence that is composed of a constant
+        number of sub-sequences (e.g. after relocating a block of vertices) can then be checked for feasibility in
+        constant time by concatenating their segments. Computing the table takes O(n^2) time.
+
+        :return: table of segments, where table[i][j] summarizes the routing sequence i, ..., j (for i <= j)
+        """
+        table = []
+        for i, vertex in enumerate(self.routing_sequence):
+            row = [None] * i + [vertex_segment(instance, vertex)]
+            for j in range(i + 1, len(self)):
+                row.append(concatenate_segments(instance, row[-1], vertex_segment(instance, self.routing_sequence[j])))
+            table.append(row)
+        return table
+
+    def pop_insert_feasibility_check(self,
+                                     instance,
+                                     pop_indices: Sequence[int],
+                                     insertion_indices: Sequence[int],
+                                     insertion_vertices: Sequence[int]):
+        """
+        check whether popping the vertices at pop_indices and afterwards inserting insertion_vertices at
+        insertion_indices (indices of the final routing sequence, as in insert_and_update) is feasible WITHOUT
+        modifying or copying the tour.
+
+        The schedule of the unchanged prefix is read from the tour's schedule. The modified section is walked once
+        (popped vertices are skipped) with early exit on the first violation. As soon as the walk reaches the unchanged
+        suffix, the time shift of its first vertex is limited by wait + max_shift, as for a single insertion. The load on
+        board is checked at every vertex, i.e. also along the suffix if the modification changes the net load (e.g. a
+        pickup without its delivery). Precedence constraints are NOT checked.
+
+        :return: True if the combined pop and insertion is feasible, False otherwise
+        """
+        global kernel_calls
+        kernel_calls += 1
+        assert all(pop_indices[i] < pop_indices[i + 1] for i in range(len(pop_indices) - 1))
+        assert all(insertion_indices[i] < insertion_indices[i + 1] for i in range(len(insertion_indices) - 1))
+        routing_sequence = self.routing_sequence
+        first = min([*pop_indices[:1], *insertion_indices[:1]])  # routing sequences are identical before this index
+        last_pop = pop_indices[-1] if pop_indices else 0
+
+        prev_vertex = routing_sequence[first - 1]
+        service_time = self.service_time_sequence[first - 1]
+        load = sum(instance.vertex_load[vertex] for vertex in routing_sequence[:first])
+        new_distance = 0
+
+        old_index = first  # next index of the (unmodified) routing sequence
+        new_index = first  # index of the walked vertex in the modified routing sequence
+        insertion = 0  # number of vertices that have been inserted so far
+        while True:
+            if insertion < len(insertion_indices) and insertion_indices[insertion] == new_index:
+                vertex = insertion_vertices[insertion]
+                insertion += 1
+                vertex_index = None
+            else:
+                while old_index in pop_indices:
+                    old_index += 1
+                vertex = routing_sequence[old_index]
+                vertex_index = old_index
+                old_index += 1
+
+            # [1] check the time window of the vertex
+            arrival_time = service_time + \
+                           instance.vertex_service_duration[prev_vertex] + \
+                           instance.travel_duration([prev_vertex], [vertex])
+            if arrival_time > instance.tw_close[vertex]:
+                return False
+
+            # [2] check max vehicle load
+            load += instance.vertex_load[vertex]
+            if load > instance.vehicles_max_load:
+                return False
+
+            new_distance += instance.distance([prev_vertex], [vertex])
+
+            # the rest of the routing sequence is unchanged
+            if vertex_index is not None and vertex_index > last_pop and insertion == len(insertion_indices):
+                # [3] check max tour distance
+                old_distance = instance.distance(routing_sequence[first - 1:vertex_index],
+                                                 routing_sequence[first:vertex_index + 1])
+                if self.sum_travel_distance + new_distance - old_distance > instance.vehicles_max_travel_distance:
                     return False
-            return True
+
+                # [4] check max vehicle load of the suffix, only if the modification changes the load on board there
+                load_change = load - sum(instance.vertex_load[vertex] for vertex in routing_sequence[:vertex_index + 1])
+                if load_change > 0:
+                    for suffix_vertex in routing_sequence[vertex_index + 1:]:
+                        load += instance.vertex_load[suffix_vertex]
+                        if load > instance.vehicles_max_load:
+                            return False
+
+                # [5] check the time windows of the suffix
+                time_shift = arrival_time - self.arrival_time_sequence[vertex_index]
+                return time_shift <= self.wait_duration_sequence[vertex_index] + self.max_shift_sequence[vertex_index]
+
+            service_time = max(arrival_time, instance.tw_open[vertex])
+            prev_vertex = vertex
+            new_index += 1
 
     def _single_insert_and_update(self, instance, insertion_index: int, insertion_vertex: int):
         """
@@ -233,11 +440,14 @@ class Tour:
 
         :return: the updated input variables (sequences, sums, schedules, ...) as a dict
         """
+        global kernel_calls
+        kernel_calls += 1
 
         assert 0 < insertion_index < len(self)
         assert 0 <= insertion_vertex < instance.num_carriers + instance.num_requests * 2
 
         # ===== [1] INSERT =====
+        self.version = next(_versions)
         self.routing_sequence.insert(insertion_index, insertion_vertex)
         self.vertex_pos[insertion_vertex] = insertion_index
 
@@ -343,15 +553,32 @@ class Tour:
 
     def insert_and_update(self, instance, insertion_indices: Sequence[int], insertion_vertices: Sequence[int]):
         """
-        Inserts insertion_vertices at insertion_indices & updates the necessary data, e.g., arrival times.
+        Inserts insertion_vertices at insertion_indices & updates the necessary data, e.g., arrival times. The indices
+        refer to the routing sequence after the insertion. A single vertex is inserted incrementally, multiple vertices
+        are spliced in at once, followed by a single schedule update (see _update_schedule).
         """
         assert all(insertion_indices[i] < insertion_indices[i + 1] for i in range(len(insertion_indices) - 1))
         if isinstance(self.id_, int):
             logger.debug(f'Tour {self.id_}: Inserting {insertion_vertices} at {insertion_indices}')
 
-        # execute all insertions sequentially:
-        for index, vertex in zip(insertion_indices, insertion_vertices):
-            self._single_insert_and_update(instance, index, vertex)
+        if len(insertion_indices) <= 1:
+            for index, vertex in zip(insertion_indices, insertion_vertices):
+                self._single_insert_and_update(instance, index, vertex)
+            return
+        assert 0 < insertion_indices[0] and insertion_indices[-1] < len(self) + len(insertion_indices) - 1
+
+        self.version = next(_versions)
+        first = insertion_indices[0]
+        routing_sequence = self.routing_sequence[:first]
+        insertions = iter(zip(insertion_indices, insertion_vertices))
+        next_insertion = next(insertions, None)
+        for vertex in self.routing_sequence[first:]:
+            while next_insertion is not None and next_insertion[0] == len(routing_sequence):
+                routing_sequence.append(next_insertion[1])
+                next_insertion = next(insertions, None)
+            routing_sequence.append(vertex)
+        self.routing_sequence = routing_sequence
+        self._update_schedule(instance, first)
 
     # TODO
     # def insert_request_and_update(self, instance, request:int, pickup_pos:int, delivery_pos:int):
@@ -370,8 +597,11 @@ class Tour:
 
         :return: the popped vertex j at index pop_pos of the routing_sequence, as well as a dictionary of updated sums
         """
+        global kernel_calls
+        kernel_calls += 1
 
         # ===== [1] POP =====
+        self.version = next(_versions)
         popped = self.routing_sequence.pop(pop_index)
         self.vertex_pos.pop(popped)
 
@@ -476,23 +706,70 @@ class Tour:
     def pop_and_update(self, instance, pop_indices: Sequence[int]):
 
         """
-        Removes vertices located at pop_indices
+        Removes vertices located at pop_indices. A single vertex is removed incrementally, multiple vertices are
+        spliced out at once, followed by a single schedule update (see _update_schedule).
         :return: a list of popped vertices
         """
 
         # assure that indices are sorted
-        assert all(pop_indices[i] <= pop_indices[i + 1] for i in range(len(pop_indices) - 1))
-
-        popped = []
-
-        # traverse the indices backwards to ensure that the succeeding indices are still correct once preceding ones
-        # have been removed
-        for pop_index in reversed(pop_indices):
-            popped_vertex = self._single_pop_and_update(instance, pop_index)
-            popped.append(popped_vertex)
+        assert all(pop_indices[i] < pop_indices[i + 1] for i in range(len(pop_indices) - 1))
+
+        if len(pop_indices) <= 1:
+            return [self._single_pop_and_update(instance, pop_index) for pop_index in pop_indices]
+        assert 0 < pop_indices[0] and pop_indices[-1] < len(self) - 1
+
+        self.version = next(_versions)
+        pop_index_set = set(pop_indices)
+        popped = [self.routing_sequence[index] for index in pop_indices]
+        for vertex in popped:
+            del self.vertex_pos[vertex]
+        self.routing_sequence = [vertex for index, vertex in enumerate(self.routing_sequence)
+                                 if index not in pop_index_set]
+        self._update_schedule(instance, pop_indices[0])
+        return popped
 
-        # reverse the popped array again to return vertices in the expected order
-        return list(reversed(popped))
+    def _update_schedule(self, instance, first_index: int):
+        """
+        recomputes the schedule (arrival, service start, wait and max_shift) and the sums of the tour after its routing
+        sequence has been modified at first_index and (possibly) beyond. The schedule of the unchanged prefix is kept.
+        Arrivals, service starts and waits are recomputed in one forward pass from first_index, max_shifts in one
+        backward pass, i.e. the update is linear in the length of the tour, regardless of the number of modifications.
+        The resulting values are the same as those of the incremental updates of [1] (see _single_insert_and_update)
+        """
+        global kernel_calls
+        kernel_calls += 1
+        routing_sequence = self.routing_sequence
+        n = len(routing_sequence)
+
+        # ===== [1] FORWARD: vertex positions, arrival, service start and wait =====
+        for sequence in (self.arrival_time_sequence, self.service_time_sequence, self.wait_duration_sequence):
+            del sequence[first_index:]
+        for index in range(first_index, n):
+            predecessor, vertex = routing_sequence[index - 1], routing_sequence[index]
+            if index < n - 1:
+                self.vertex_pos[vertex] = index
+            arrival = self.service_time_sequence[index - 1] + \
+                      instance.vertex_service_duration[predecessor] + \
+                      instance.travel_duration([predecessor], [vertex])
+            self.arrival_time_sequence.append(arrival)
+            self.service_time_sequence.append(max(instance.tw_open[vertex], arrival))
+            self.wait_duration_sequence.append(max(dt.timedelta(0), instance.tw_open[vertex] - arrival))
+
+        # ===== [2] BACKWARD: max_shift =====
+        max_shift_sequence = [dt.timedelta(0)] * n
+        max_shift_sequence[-1] = instance.tw_close[routing_sequence[-1]] - self.service_time_sequence[-1]
+        for index in range(n - 2, -1, -1):
+            max_shift_sequence[index] = min(instance.tw_close[routing_sequence[index]] -
+                                            self.service_time_sequence[index],
+                                            self.wait_duration_sequence[index + 1] + max_shift_sequence[index + 1])
+        self.max_shift_sequence = max_shift_sequence
+
+        # ===== [3] SUMS =====
+        self.sum_travel_distance = float(instance.distance(routing_sequence[:-1], routing_sequence[1:]))
+        self.sum_travel_duration = instance.travel_duration(routing_sequence[:-1], routing_sequence[1:])
+        self.sum_load = sum(instance.vertex_load[vertex] for vertex in routing_sequence)
+        self.sum_revenue = sum(instance.vertex_revenue[vertex] for vertex in routing_sequence)
+        self.sum_profit = self.sum_revenue - self.sum_travel_distance
 
     def pop_distance_delta(self, instance, pop_indices: Sequence[int]):
         """
@@ -566,6 +843,47 @@ class Tour:
 
         return delta
 
+    def insert_pickup_delivery_distance_deltas(self, instance, pickup: int, delivery: int) -> np.ndarray:
+        """
+        the distance surplus of inserting the pickup and the delivery vertex for all combinations of insertion indices.
+        NOTE: Does not perform a feasibility check and does not actually insert the vertices!
+
+        :return: matrix of shape (len(self) + 1, len(self) + 1). Element [pickup_pos, delivery_pos] is the delta of
+        insert_distance_delta(instance, [pickup_pos, delivery_pos], [pickup, delivery]). Elements of invalid index
+        combinations are np.inf
+        """
+        return pickup_delivery_insertion_distance_deltas(self.routing_sequence, instance.distance_matrix, pickup,
+                                                         delivery)
+
+    def request_removal_distance_deltas(self, instance) -> Tuple[List[int], np.ndarray]:
+        """
+        the distance delta of removing each of the tour's requests (individually). Memoized per version of the tour,
+        i.e. only recomputed after the routing has been modified. The returned objects must not be modified.
+        NOTE: Does not actually remove the requests!
+
+        :return: the tour's requests in the order of their pickups and the corresponding (non-positive) deltas
+        """
+        memo = self._request_removal_deltas
+        if memo is None or memo[0] != self.version:
+            pickups = [vertex for vertex in self.routing_sequence[1:-1] if instance.vertex_type(vertex) == 'pickup']
+            requests = [instance.request_from_vertex(pickup) for pickup in pickups]
+            pickup_positions = [self.vertex_pos[pickup] for pickup in pickups]
+            delivery_positions = [self.vertex_pos[pickup + instance.num_requests] for pickup in pickups]
+            memo = (self.version, requests, pickup_delivery_removal_distance_deltas(
+                self.routing_sequence, instance.distance_matrix, pickup_positions, delivery_positions))
+            self._request_removal_deltas = memo
+        return memo[1], memo[2]
+
+    def reversal_distance_deltas(self, instance) -> np.ndarray:
+        """
+        the distance surplus of reversing the section i+1, ..., j for all combinations of i and j.
+        NOTE: Does not perform a feasibility check and does not actually reverse the sections!
+
+        :return: matrix of shape (len(self), len(self)). Element [i, j] is the delta of reversing the section
+        i+1, ..., j. Elements of invalid index combinations are np.inf
+        """
+        return reversal_distance_deltas(self.routing_sequence, instance.distance_matrix)
+
     def _single_insert_max_shift_delta(self, instance, insertion_index: int, insertion_vertex: int):
         """
         returns the change in max_shift time that would be observed if insertion_vertex was placed at
@@ -1252,3 +1570,139 @@ def multi_insert_max_shift_delta(routing_sequence: Sequence[int],
             input_dict.update(updated)
 
     return total_max_shift_delta
+
+
+def pickup_delivery_insertion_distance_deltas(routing_sequence: Sequence[int],
+                                              distance_matrix: np.ndarray,
+                                              pickup: int,
+                                              delivery: int) -> np.ndarray:
+    """
+    the distance surplus of inserting the pickup and the delivery vertex into the routing_sequence for all
+    combinations of insertion indices, computed with vectorized lookups in the distance matrix.
+
+    :return: matrix of shape (len(routing_sequence) + 1, len(routing_sequence) + 1). Element [pickup_pos, delivery_pos]
+    is the delta of inserting pickup at pickup_pos and then delivery at delivery_pos. Elements of invalid index
+    combinations are np.inf
+    """
+    n = len(routing_sequence)
+    routing_sequence = np.asarray(routing_sequence)
+    i_vertices, k_vertices = routing_sequence[:-1], routing_sequence[1:]
+    arc_distance = distance_matrix[i_vertices, k_vertices]
+
+    # delta of inserting a single vertex on each arc of the routing sequence
+    pickup_deltas = distance_matrix[i_vertices, pickup] + distance_matrix[pickup, k_vertices] - arc_distance
+    delivery_deltas = distance_matrix[i_vertices, delivery] + distance_matrix[delivery, k_vertices] - arc_distance
+
+    deltas = np.full((n + 1, n + 1), np.inf)
+    # pickup and delivery on different arcs: the delivery's arc index is shifted by the inserted pickup
+    different_arcs = pickup_deltas[:, None] + delivery_deltas[None, :]
+    deltas[1:n, 2:n + 1] = np.where(np.triu(np.ones((n - 1, n - 1), dtype=bool), 1), different_arcs, np.inf)
+    # pickup and delivery on the same arc
+    pickup_pos = np.arange(1, n)
+    deltas[pickup_pos, pickup_pos + 1] = distance_matrix[i_vertices, pickup] + \
+                                         distance_matrix[pickup, delivery] + \
+                                         distance_matrix[delivery, k_vertices] - arc_distance
+    return deltas
+
+
+def pickup_delivery_removal_distance_deltas(routing_sequence: Sequence[int],
+                                            distance_matrix: np.ndarray,
+                                            pickup_positions: Sequence[int],
+                                            delivery_positions: Sequence[int]) -> np.ndarray:
+    """
+    the distance delta of removing a pickup and its delivery from the routing_sequence, for multiple (pickup_pos,
+    delivery_pos) pairs at once, computed with vectorized lookups in the distance matrix.
+
+    :return: array of the (non-positive) deltas, one per pair
+    """
+    routing_sequence = np.asarray(routing_sequence)
+    p = np.asarray(pickup_positions, dtype=int)
+    d = np.asarray(delivery_positions, dtype=int)
+    pred_p, pickup, succ_p = routing_sequence[p - 1], routing_sequence[p], routing_sequence[p + 1]
+    pred_d, delivery, succ_d = routing_sequence[d - 1], routing_sequence[d], routing_sequence[d + 1]
+
+    # pickup and delivery are removed from separate arcs
+    separate = distance_matrix[pred_p, succ_p] - distance_matrix[pred_p, pickup] - distance_matrix[pickup, succ_p] + \
+               distance_matrix[pred_d, succ_d] - distance_matrix[pred_d, delivery] - distance_matrix[delivery, succ_d]
+    # the delivery immediately follows the pickup
+    adjacent = distance_matrix[pred_p, succ_d] - distance_matrix[pred_p, pickup] - distance_matrix[pickup, delivery] - \
+               distance_matrix[delivery, succ_d]
+    return np.where(d == p + 1, adjacent, separate)
+
+
+def reversal_distance_deltas(routing_sequence: Sequence[int], distance_matrix: np.ndarray) -> np.ndarray:
+    """
+    the distance surplus of the 2-opt moves that reverse the section i+1, ..., j of the routing_sequence, i.e. that
+    replace the arcs (i, i+1) and (j, j+1) with (i, j) and (i+1, j+1), for all combinations of i and j. Computed
+    with vectorized lookups in the distance matrix. Assumes symmetric distances.
+
+    :return: matrix of shape (len(routing_sequence), len(routing_sequence)). Element [i, j] is the delta of
+    reversing the section i+1, ..., j. Elements of invalid index combinations (all but 0 <= i < j-1 < n-2) are np.inf
+    """
+    n = len(routing_sequence)
+    routing_sequence = np.asarray(routing_sequence)
+    i_vertices, k_vertices = routing_sequence[:-1], routing_sequence[1:]
+    arc_distance = distance_matrix[i_vertices, k_vertices]
+
+    # rows: arc (i, i+1), columns: arc (j, j+1)
+    added = distance_matrix[np.ix_(i_vertices, i_vertices)] + distance_matrix[np.ix_(k_vertices, k_vertices)]
+    removed = arc_distance[:, None] + arc_distance[None, :]
+
+    deltas = np.full((n, n), np.inf)
+    # reversing a single vertex (j = i+1) does not change the tour
+    deltas[:n - 1, :n - 1] = np.where(np.triu(np.ones((n - 1, n - 1), dtype=bool), 2), added - removed, np.inf)
+    return deltas
+
+
+def vertex_segment(instance, vertex: int) -> Segment:
+    """the Segment data of a sequence that consists of a single vertex"""
+    return Segment(first=vertex,
+                   last=vertex,
+                   earliest=instance.tw_open[vertex],
+                   latest=instance.tw_close[vertex],
+                   duration=instance.vertex_service_duration[vertex],
+                   distance=0,
+                   load=instance.vertex_load[vertex],
+                   max_load=max(0, instance.vertex_load[vertex]))
+
+
+def concatenate_segments(instance, segment_1: Union[None, Segment], segment_2: Union[None, Segment]):
+    """
+    the Segment data of visiting the sequence of segment_1 and then the sequence of segment_2, in constant time.
+    Time windows must not be violated (no time warp). Precedence constraints are NOT checked.
+
+    :return: the concatenated Segment or None if the concatenation violates time windows (or one of the segments is
+    None)
+    """
+    if segment_1 is None or segment_2 is None:
+        return None
+
+    shift = segment_1.duration + instance.travel_duration([segment_1.last], [segment_2.first])
+    # infeasible if segment_2 cannot be started even when starting segment_1 as early as possible
+    if segment_1.earliest + shift > segment_2.latest:
+        return None
+
+    # waiting is unavoidable if segment_2 cannot be started even when starting segment_1 as late as possible.
+    # (datetime differences are compared to avoid leaving the datetime range)
+    wait = max(dt.timedelta(0), segment_2.earliest - segment_1.latest - shift)
+    if wait > dt.timedelta(0):
+        earliest = segment_1.latest
+    elif segment_2.earliest - segment_1.earliest > shift:
+        earliest = segment_2.earliest - shift
+    else:
+        earliest = segment_1.earliest
+
+    if segment_2.latest - segment_1.latest < shift:
+        latest = segment_2.latest - shift
+    else:
+        latest = segment_1.latest
+
+    return Segment(first=segment_1.first,
+                   last=segment_2.last,
+                   earliest=earliest,
+                   latest=latest,
+                   duration=shift + segment_2.duration + wait,
+                   distance=segment_1.distance + instance.distance([segment_1.last], [segment_2.first]) +
+                            segment_2.distance,
+                   load=segment_1.load + segment_2.load,
+                   max_load=max(segment_1.max_load, segment_1.load + segment_2.max_load))
@@ -0,0 +1,96 @@
+import logging
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from core_module import instance as it, solution as slt
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================================================================================
+# LOWER BOUNDS ON THE TRAVEL DISTANCE OF A CARRIER
+# =====================================================================================================================
+def travel_distance_lower_bound(instance: it.MDPDPTWInstance, carrier: slt.AHDSolution) -> float:
+    """
+    lower bound on the travel distance of any feasible routing of the carrier's routed requests, the maximum of the
+    minimum spanning tree bound and the assignment bound. Both are computed in polynomial time and take less than a
+    millisecond for carriers of the typical size.
+    """
+    if not carrier.routed_requests:
+        return 0
+    return max(minimum_spanning_tree_bound(instance, carrier), assignment_bound(instance, carrier))
+
+
+def relative_gap(instance: it.MDPDPTWInstance, carrier: slt.AHDSolution) -> float:
+    """relative gap of the carrier's travel distance to its lower bound (see travel_distance_lower_bound)"""
+    distance = carrier.sum_travel_distance()
+    if distance <= 0:
+        return 0
+    return (distance - travel_distance_lower_bound(instance, carrier)) / distance
+
+
+def minimum_spanning_tree_bound(instance: it.MDPDPTWInstance, carrier: slt.AHDSolution) -> float:
+    """
+    The tours of a carrier all contain its depot, i.e. together they form a connected graph that spans the depot and
+    the vertices of all routed requests. Thus, their travel distance is at least the weight of a minimum spanning tree
+    of these vertices, using the shorter direction of each edge. Computed with Prim's algorithm, which is O(n^2) on a
+    dense distance matrix.
+    """
+    vertices = _carrier_vertices(instance, carrier)
+    distances = instance.distance_matrix[np.ix_(vertices, vertices)]
+    distances = np.minimum(distances, distances.T).astype(float)
+
+    in_tree = np.zeros(len(vertices), dtype=bool)
+    in_tree[0] = True
+    connection_cost = distances[0].copy()  # cheapest edge of each vertex to the tree
+    weight = 0.
+    for _ in range(len(vertices) - 1):
+        connection_cost[in_tree] = np.inf
+        vertex = int(np.argmin(connection_cost))
+        weight += connection_cost[vertex]
+        in_tree[vertex] = True
+        connection_cost = np.minimum(connection_cost, distances[vertex])
+    return weight
+
+
+def assignment_bound(instance: it.MDPDPTWInstance, carrier: slt.AHDSolution) -> float:
+    """
+    Assignment relaxation: every vertex has exactly one successor. The depot is represented by one copy per tour that
+    the carrier may use, copies are connected at no cost (a copy that is its own successor is an unused tour). Any
+    routing is an assignment: the successor of the last vertex of a tour is the depot copy of the next tour. Arcs that
+    no feasible routing uses are excluded, which tightens the bound for pickup and delivery problems:
+
+    - depot -> delivery: the first vertex of a tour is a pickup
+    - pickup -> depot: the last vertex of a tour is a delivery
+    - delivery -> its own pickup: the pickup precedes the delivery in the same tour
+
+    The minimum cost assignment is found with the Hungarian method (scipy's linear_sum_assignment) in O(n^3).
+    """
+    requests = sorted(carrier.routed_requests)
+    num_depots = instance.carriers_max_num_tours
+    num_requests = len(requests)
+    vertices = _carrier_vertices(instance, carrier, num_depots)
+    cost = instance.distance_matrix[np.ix_(vertices, vertices)].astype(float)
+
+    depots = slice(0, num_depots)
+    pickups = slice(num_depots, num_depots + num_requests)
+    deliveries = slice(num_depots + num_requests, num_depots + 2 * num_requests)
+    forbidden = cost.sum() + 1  # more expensive than any assignment that uses allowed arcs only
+    cost[depots, depots] = 0
+    cost[depots, deliveries] = forbidden
+    cost[pickups, depots] = forbidden
+    customers = np.arange(num_depots, len(vertices))
+    cost[customers, customers] = forbidden
+    own_pickups = np.arange(num_depots, num_depots + num_requests)
+    cost[own_pickups + num_requests, own_pickups] = forbidden
+
+    rows, columns = linear_sum_assignment(cost)
+    return float(cost[rows, columns].sum())
+
+
+def _carrier_vertices(instance: it.MDPDPTWInstance, carrier: slt.AHDSolution, num_depots: int = 1) -> np.ndarray:
+    """num_depots copies of the carrier's depot, followed by the pickups and then the deliveries of its routed
+    requests, both in ascending order of the requests"""
+    pickups, deliveries = zip(*(instance.pickup_delivery_pair(request) for request in sorted(carrier.routed_requests)))
+    return np.array([carrier.id_] * num_depots + list(pickups) + list(deliveries))
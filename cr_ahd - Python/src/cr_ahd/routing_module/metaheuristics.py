@@ -1,27 +1,110 @@
 import logging
+import multiprocessing
+import queue
 import random
 import time
 from abc import abstractmethod, ABC
 from copy import deepcopy
-from math import exp, log
-from typing import Sequence, List, Union
+from math import exp, log, ceil
+from pathlib import Path
+from typing import Sequence, List, Union, Dict, Hashable, Tuple
+
+import numpy as np
 
 from core_module import instance as it, solution as slt, tour as tr
-from routing_module import neighborhoods as nh, shakes as sh, tour_construction as cns
+from routing_module import neighborhoods as nh, shakes as sh, stopping_rules as sr, tour_construction as cns
 from utility_module import utils as ut, profiling as pr
 
 logger = logging.getLogger(__name__)
 
 
+class Trajectory:
+    """
+    Fixed-size ring buffer of compact records of a search trajectory: operator id, ids of the relocated requests,
+    delta in travel distance and whether the move was accepted. Records are stored in preallocated NumPy columns, i.e.
+    recording neither allocates nor holds references to tours or solutions. Operator names are mapped to small integer
+    ids (see operators).
+
+    Once the buffer is full, the oldest records are overwritten, unless a directory is given: then, the buffer is
+    flushed to a new file in that directory whenever it is full.
+    """
+
+    def __init__(self, capacity: int = 10000, max_requests_per_record: int = 4, directory: Path = None):
+        """
+        :param max_requests_per_record: moves that relocate more requests (e.g. long 2-opt reversals) are recorded by
+         their first max_requests_per_record requests
+        :param directory: if not None, full buffers are flushed to this directory instead of being overwritten
+        """
+        self.capacity = capacity
+        self.directory = directory
+        self.operators: List[str] = []  # operator id -> operator name
+        self._operator_ids: Dict[str, int] = dict()
+        self._index = np.empty(capacity, dtype=np.int64)  # position of the record in the complete trajectory
+        self._operator = np.empty(capacity, dtype=np.int16)
+        self._requests = np.empty((capacity, max_requests_per_record), dtype=np.int32)  # padded with -1
+        self._delta = np.empty(capacity)
+        self._accepted = np.empty(capacity, dtype=bool)
+        self._num_records = 0  # since the creation of the trajectory
+        self._num_flushed = 0  # number of records that have been flushed or overwritten
+
+    def __len__(self):
+        """the number of buffered records"""
+        return self._num_records - self._num_flushed
+
+    def append(self, operator: str, requests: Sequence[int], delta: float, accepted: bool):
+        if len(self) == self.capacity:
+            if self.directory is not None:
+                self.flush(ut.unique_path(self.directory, 'trajectory_#{:03d}.npz'))
+            else:
+                self._num_flushed += 1
+        operator_id = self._operator_ids.get(operator)
+        if operator_id is None:
+            operator_id = self._operator_ids[operator] = len(self.operators)
+            self.operators.append(operator)
+
+        slot = self._num_records % self.capacity
+        requests = requests[:self._requests.shape[1]]
+        self._index[slot] = self._num_records
+        self._operator[slot] = operator_id
+        self._requests[slot, :len(requests)] = requests
+        self._requests[slot, len(requests):] = -1
+        self._delta[slot] = delta
+        self._accepted[slot] = accepted
+        self._num_records += 1
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """the buffered records in chronological order, one array per column"""
+        slots = np.arange(self._num_flushed, self._num_records) % self.capacity
+        return dict(index=self._index[slots], operator=self._operator[slots], requests=self._requests[slots],
+                    delta=self._delta[slots], accepted=self._accepted[slots])
+
+    def flush(self, path: Path):
+        """writes the buffered records in columnar form (one array per column, see columns) to an .npz file and clears
+        the buffer. The operator names are stored in the 'operators' array, indexed by the 'operator' column"""
+        np.savez_compressed(path, operators=np.array(self.operators, dtype=str), **self.columns())
+        self._num_flushed = self._num_records
+
+
 class PDPTWMetaHeuristic(ABC):
     def __init__(self, neighborhoods: Sequence[nh.Neighborhood], time_limit_per_carrier: float):
         self.neighborhoods = neighborhoods
         self.improved = False
         self.start_time = None
         self.time_limit_per_carrier = time_limit_per_carrier
+        # the search of each carrier stops once the budget is spent, by default the time limit in wall-clock seconds.
+        # see set_budget
+        self.budget_unit = 'wall_time'
+        self.budget_per_carrier = time_limit_per_carrier
+        self._budget_start = None
+        # convergence-based early termination before the budget is spent, see add_stopping_rule
+        self.stopping_rules: List[sr.StoppingRule] = []
+        # insertion heuristics that repair destroyed solutions. Their insertion checks are move evaluations, too
+        self.repair_operators: Sequence[cns.PDPParallelInsertionConstruction] = []
+        # feasibility checks of the metaheuristic itself, i.e. not of its neighborhoods or repair operators
+        self.num_move_evaluations = 0
         self.iter_count = None
         self.parameters = dict()
-        self.trajectory = []  # collection of all accepted & executed moves
+        self.trajectory: Union[None, Trajectory] = None  # not recorded by default, see record_trajectory
 
         self.name = f'{self.__class__.__name__}'
 
@@ -42,9 +125,94 @@ class PDPTWMetaHeuristic(ABC):
     def stopping_criterion(self):
         pass
 
-    def update_trajectory(self, name: str, move: tuple, accepted: bool):
-        self.trajectory.append((name, move, accepted))
-        pass
+    def record_trajectory(self, capacity: int = 10000, directory: Path = None):
+        """
+        starts recording the accepted (and some of the rejected) moves in a Trajectory, which replaces any previously
+        recorded one. The metaheuristic may be reused for many instances, thus the records are compact and bounded
+
+        :param directory: if not None, full buffers are flushed to this directory instead of being overwritten
+        """
+        self.trajectory = Trajectory(capacity, directory=directory)
+
+    def update_trajectory(self, name: str, delta: float, accepted: bool, requests: Sequence[int] = ()):
+        if self.trajectory is not None:
+            self.trajectory.append(name, requests, delta, accepted)
+
+    def move_requests(self, instance: it.MDPDPTWInstance, neighborhood: nh.Neighborhood, move: tuple) -> List[int]:
+        """
+        the ids of the requests that are relocated by the neighborhood move, for update_trajectory. Must be called
+        before the move is executed. Free if no trajectory is recorded
+        """
+        if self.trajectory is None:
+            return []
+        return [request for request, _, _, _, _ in neighborhood.move_attributes(instance, move)]
+
+    def set_budget(self, budget_per_carrier: float, unit: str = 'wall_time'):
+        """
+        replaces the time limit per carrier by a budget in one of the following units:
+
+        - 'wall_time': seconds of wall-clock time. Results depend on the machine and on its load
+        - 'cpu_time': seconds of CPU time of the process. Independent of the load, but not of the machine
+        - 'move_evaluations': number of candidate moves whose feasibility was checked by the metaheuristic's
+          neighborhoods (see Neighborhood.num_move_evaluations), repair operators and the metaheuristic itself
+        - 'kernel_calls': number of schedule-kernel calls, i.e. of feasibility checks and schedule updates of tours
+          (see tour.kernel_calls)
+
+        The latter two are deterministic, i.e. seeded runs give the same results on any machine, no matter how many
+        other processes are running. Metaheuristics that embed other metaheuristics pass on the respective share of
+        the budget.
+        """
+        assert unit in ('wall_time', 'cpu_time', 'move_evaluations', 'kernel_calls'), f'Unknown budget unit {unit}'
+        self.budget_unit = unit
+        self.budget_per_carrier = budget_per_carrier
+        if unit == 'wall_time':
+            self.time_limit_per_carrier = budget_per_carrier
+
+    def work(self) -> float:
+        """the current reading of the clock or counter of the budget unit, see set_budget"""
+        if self.budget_unit == 'wall_time':
+            return time.time()
+        elif self.budget_unit == 'cpu_time':
+            return time.process_time()
+        elif self.budget_unit == 'move_evaluations':
+            return sum(neighborhood.num_move_evaluations for neighborhood in self.neighborhoods) + \
+                   sum(repair.num_move_evaluations for repair in self.repair_operators) + self.num_move_evaluations
+        else:
+            return tr.kernel_calls
+
+    def start_budget(self):
+        """starts spending the budget of a carrier"""
+        self.start_time = time.time()
+        self._budget_start = self.work()
+
+    def spent_budget(self) -> float:
+        return self.work() - self._budget_start
+
+    def budget_exhausted(self) -> bool:
+        return self.spent_budget() >= self.budget_per_carrier
+
+    def add_stopping_rule(self, rule: sr.StoppingRule):
+        """
+        the search of a carrier stops as soon as any of the stopping rules is met (or the budget is spent). Only the
+        iterative metaheuristics report their progress to the rules, descents stop at their local optimum anyway
+        """
+        self.stopping_rules.append(rule)
+
+    def start_stopping_rules(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution):
+        for rule in self.stopping_rules:
+            rule.start(instance, carrier)
+
+    def update_stopping_rules(self, objective: float):
+        """reports the carrier objective of the current solution after an iteration"""
+        for rule in self.stopping_rules:
+            rule.update(objective)
+
+    def stopping_rule_met(self) -> bool:
+        for rule in self.stopping_rules:
+            if rule.stop():
+                logger.debug(f'{self.name}: {rule.name} met after {rule.iteration} iterations')
+                return True
+        return False
 
 
 class NoMetaheuristic(PDPTWMetaHeuristic):
@@ -87,29 +255,42 @@ class LocalSearchFirst(PDPTWMetaHeuristic):
     def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
                 carrier_ids: List[int] = None) -> slt.CAHDSolution:
         assert len(self.neighborhoods) == 1, 'Local Search can use a single neighborhood only!'
-        best_solution = deepcopy(solution)
+        solution = deepcopy(solution)
         if carrier_ids is None:
-            carrier_ids = [x.id_ for x in best_solution.carriers]
+            carrier_ids = [x.id_ for x in solution.carriers]
 
+        self.neighborhoods[0].reset_dont_look_bits()
         for carrier_id in carrier_ids:
-            carrier = solution.carriers[carrier_id]
-            neighborhood = self.neighborhoods[0]
-            self.improved = True
-            self.start_time = time.time()
-            while not self.stopping_criterion():
-                self.improved = False
-                move_gen = neighborhood.feasible_move_generator_for_carrier(instance, carrier)
-                try:
-                    move = next(move_gen)  # may be feasible but not improving
-                    while not self.acceptance_criterion(instance, move):
-                        self.update_trajectory(neighborhood.__class__.__name__, move, False)
-                        move = next(move_gen)
-                    neighborhood.execute_move(instance, move)
-                    self.update_trajectory(neighborhood.__class__.__name__, move, True)
-                    self.improved = True
-                except StopIteration:
-                    break  # exit the while loop (while-condition is false anyway)
-        return best_solution
+            self.improve(instance, solution, carrier_id)
+        return solution
+
+    def improve(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_id: int):
+        """
+        improves the carrier's routing in place. The neighborhood's don't-look bits are kept between calls, i.e. when
+        the local search is embedded in another metaheuristic, a call after a perturbation only re-scans the requests
+        whose tours were modified by that perturbation
+        """
+        carrier = solution.carriers[carrier_id]
+        neighborhood = self.neighborhoods[0]
+        self.improved = True
+        self.start_budget()
+        while not self.stopping_criterion():
+            self.improved = False
+            # resumes the scan at the last improvement and skips requests that have not improved since
+            # only improving moves can be accepted
+            move_gen = neighborhood.dont_look_move_generator_for_carrier(instance, carrier, threshold=0)
+            try:
+                move = next(move_gen)  # may be feasible but not improving
+                while not self.acceptance_criterion(instance, move):
+                    self.update_trajectory(neighborhood.name, move[0], False,
+                                           self.move_requests(instance, neighborhood, move))
+                    move = next(move_gen)
+                self.update_trajectory(neighborhood.name, move[0], True,
+                                       self.move_requests(instance, neighborhood, move))
+                neighborhood.execute_move(instance, move)
+                self.improved = True
+            except StopIteration:
+                break  # exit the while loop (while-condition is false anyway)
 
     def acceptance_criterion(self, instance: it.MDPDPTWInstance, move: tuple):
         if move[0] < 0:
@@ -118,7 +299,7 @@ class LocalSearchFirst(PDPTWMetaHeuristic):
             return False
 
     def stopping_criterion(self):
-        if self.improved and time.time() - self.start_time < self.time_limit_per_carrier:
+        if self.improved and not self.budget_exhausted():
             return False
         else:
             return True
@@ -130,25 +311,35 @@ class LocalSearchBest(PDPTWMetaHeuristic):
     def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
                 carrier_ids: List[int] = None) -> slt.CAHDSolution:
         assert len(self.neighborhoods) == 1, 'Local Search must have a single neighborhood only!'
-        best_solution = deepcopy(solution)
+        solution = deepcopy(solution)
         if carrier_ids is None:
-            carrier_ids = [x.id_ for x in best_solution.carriers]
+            carrier_ids = [x.id_ for x in solution.carriers]
 
+        self.neighborhoods[0].clear_move_cache()
         for carrier_id in carrier_ids:
-            carrier = solution.carriers[carrier_id]
-            neighborhood = self.neighborhoods[0]
-            self.improved = True
-            self.start_time = time.time()
-            while not self.stopping_criterion():
-                self.improved = False
-                all_moves = [move for move in neighborhood.feasible_move_generator_for_carrier(instance, carrier)]
-                if any(all_moves):
-                    best_move = min(all_moves, key=lambda x: x[0])
-                    if self.acceptance_criterion(instance, best_move):
-                        self.update_trajectory(neighborhood.__class__.__name__, best_move, True)
-                        neighborhood.execute_move(instance, best_move)
-                        self.improved = True
-        return best_solution
+            self.improve(instance, solution, carrier_id)
+        self.neighborhoods[0].clear_move_cache()
+        return solution
+
+    def improve(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_id: int):
+        """
+        improves the carrier's routing in place. The neighborhood's move cache is kept between calls, i.e. only the
+        moves involving tours that were modified since the previous call are re-evaluated
+        """
+        carrier = solution.carriers[carrier_id]
+        neighborhood = self.neighborhoods[0]
+        self.improved = True
+        self.start_budget()
+        while not self.stopping_criterion():
+            self.improved = False
+            # only the moves involving tours that were modified by the previous move are re-evaluated
+            best_move = neighborhood.best_feasible_move_for_carrier(instance, carrier, threshold=0)
+            if best_move is not None:
+                if self.acceptance_criterion(instance, best_move):
+                    self.update_trajectory(neighborhood.name, best_move[0], True,
+                                           self.move_requests(instance, neighborhood, best_move))
+                    neighborhood.execute_move(instance, best_move)
+                    self.improved = True
 
     def acceptance_criterion(self, instance: it.MDPDPTWInstance, move: tuple):
         if move[0] < 0:
@@ -157,7 +348,7 @@ class LocalSearchBest(PDPTWMetaHeuristic):
             return False
 
     def stopping_criterion(self):
-        if self.improved and time.time() - self.start_time < self.time_limit_per_carrier:
+        if self.improved and not self.budget_exhausted():
             return False
         else:
             return True
@@ -171,31 +362,42 @@ class PDPTWSequentialLocalSearch(PDPTWMetaHeuristic):
 
     def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
                 carrier_ids: List[int] = None) -> slt.CAHDSolution:
-        best_solution = deepcopy(solution)
+        solution = deepcopy(solution)
         if carrier_ids is None:
-            carrier_ids = [x.id_ for x in best_solution.carriers]
+            carrier_ids = [x.id_ for x in solution.carriers]
 
+        for neighborhood in self.neighborhoods:
+            neighborhood.reset_dont_look_bits()
         for carrier_id in carrier_ids:
-            carrier = solution.carriers[carrier_id]
-            for k in range(len(self.neighborhoods)):
-                neighborhood = self.neighborhoods[k]
-                move_generator = neighborhood.feasible_move_generator_for_carrier(instance, carrier)
-                self.start_time = time.time()
-                self.improved = True
-                while not self.stopping_criterion():
-                    self.improved = False
-                    while self.improved is False:
-                        try:
-                            move = next(move_generator)
-                            if self.acceptance_criterion(instance, move):
-                                neighborhood.execute_move(instance, move)
-                                self.improved = True
-                                self.update_trajectory(neighborhood.__class__.__name__, move, True)
-                                move_generator = neighborhood.feasible_move_generator_for_carrier(instance, carrier)
-                        except StopIteration:
-                            # StopIteration occurs if there are no neighbors that can be returned by the move_generator
-                            break
-        return best_solution
+            self.improve(instance, solution, carrier_id)
+        return solution
+
+    def improve(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_id: int):
+        """
+        improves the carrier's routing in place. The neighborhoods' don't-look bits are kept between calls
+        """
+        carrier = solution.carriers[carrier_id]
+        for k in range(len(self.neighborhoods)):
+            neighborhood = self.neighborhoods[k]
+            move_generator = neighborhood.dont_look_move_generator_for_carrier(instance, carrier, threshold=0)
+            self.start_budget()
+            self.improved = True
+            while not self.stopping_criterion():
+                self.improved = False
+                while self.improved is False:
+                    try:
+                        move = next(move_generator)
+                        if self.acceptance_criterion(instance, move):
+                            self.update_trajectory(neighborhood.name, move[0], True,
+                                                   self.move_requests(instance, neighborhood, move))
+                            neighborhood.execute_move(instance, move)
+                            self.improved = True
+                            move_generator = neighborhood.dont_look_move_generator_for_carrier(instance,
+                                                                                               carrier,
+                                                                                               threshold=0)
+                    except StopIteration:
+                        # StopIteration occurs if there are no neighbors that can be returned by the move_generator
+                        break
 
     def acceptance_criterion(self, instance: it.MDPDPTWInstance, move: tuple):
         if move is None:
@@ -206,7 +408,7 @@ class PDPTWSequentialLocalSearch(PDPTWMetaHeuristic):
             return False
 
     def stopping_criterion(self):
-        if self.improved and time.time() - self.start_time < self.time_limit_per_carrier:
+        if self.improved and not self.budget_exhausted():
             return False
         else:
             return True
@@ -227,23 +429,30 @@ class PDPTWVariableNeighborhoodDescent(PDPTWMetaHeuristic):
 
         for carrier_id in carrier_ids:
             carrier = best_solution.carriers[carrier_id]
+            for neighborhood in self.neighborhoods:
+                neighborhood.clear_move_cache()
             self.parameters['k'] = 0
-            self.start_time = time.time()
+            self.start_budget()
+            self.start_stopping_rules(instance, carrier)
             while not self.stopping_criterion():
                 neighborhood = self.neighborhoods[self.parameters['k']]
-                all_moves = [move for move in neighborhood.feasible_move_generator_for_carrier(instance, carrier)]
-                if any(all_moves):
-                    best_move = min(all_moves, key=lambda x: x[0])
+                # cached per (request, target tour): only moves involving tours modified since the last call of this
+                # neighborhood are re-evaluated
+                best_move = neighborhood.best_feasible_move_for_carrier(instance, carrier, threshold=0)
+                if best_move is not None:
+                    requests = self.move_requests(instance, neighborhood, best_move)
                     if self.acceptance_criterion(instance, best_move):
+                        self.update_trajectory(neighborhood.name, best_move[0], True, requests)
                         neighborhood.execute_move(instance, best_move)
                         # ut.validate_solution(instance, best_solution)
-                        self.update_trajectory(self.parameters['k'], best_move, True)
                         self.parameters['k'] = 0
                     else:
-                        self.update_trajectory(self.parameters['k'], best_move, False)
+                        self.update_trajectory(neighborhood.name, best_move[0], False, requests)
                         self.parameters['k'] += 1
                 else:
                     self.parameters['k'] += 1
+            for neighborhood in self.neighborhoods:
+                neighborhood.clear_move_cache()
         return best_solution
 
     def execute_on_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour):
@@ -256,18 +465,20 @@ class PDPTWVariableNeighborhoodDescent(PDPTWMetaHeuristic):
         self.parameters['k'] = 0
         while self.parameters['k'] < len(intra_tour_neighborhoods):
             neighborhood = intra_tour_neighborhoods[self.parameters['k']]
-            all_moves = [move for move in neighborhood.feasible_move_generator_for_tour(instance, tour)]
-            if any(all_moves):
-                best_move = min(all_moves, key=lambda x: x[0])
+            best_move = neighborhood.best_feasible_move_for_tour(instance, tour, threshold=0)
+            if best_move is not None:
+                requests = self.move_requests(instance, neighborhood, best_move)
                 if self.acceptance_criterion_tour(best_move):
+                    self.update_trajectory(neighborhood.name, best_move[0], True, requests)
                     neighborhood.execute_move(instance, best_move)
-                    self.update_trajectory(self.parameters['k'], best_move, True)
                     self.parameters['k'] = 0
                 else:
-                    self.update_trajectory(self.parameters['k'], best_move, False)
+                    self.update_trajectory(neighborhood.name, best_move[0], False, requests)
                     self.parameters['k'] += 1
             else:
                 self.parameters['k'] += 1
+        for neighborhood in intra_tour_neighborhoods:
+            neighborhood.clear_move_cache()
 
     def acceptance_criterion(self, instance: it.MDPDPTWInstance, move: tuple):
         if move[0] < 0:
@@ -282,8 +493,8 @@ class PDPTWVariableNeighborhoodDescent(PDPTWMetaHeuristic):
             return False
 
     def stopping_criterion(self):
-        if self.parameters['k'] < len(
-                self.neighborhoods) and time.time() - self.start_time < self.time_limit_per_carrier:
+        if self.parameters['k'] < len(self.neighborhoods) and not self.budget_exhausted() and \
+                not self.stopping_rule_met():
             return False
         else:
             return True
@@ -305,20 +516,21 @@ class PDPTWReducedVariableNeighborhoodSearch(PDPTWVariableNeighborhoodDescent):
         for carrier_id in carrier_ids:
             carrier = solution.carriers[carrier_id]
             self.parameters['k'] = 0
-            self.start_time = time.time()
+            self.start_budget()
+            self.start_stopping_rules(instance, carrier)
             while not self.stopping_criterion():
                 neighborhood = self.neighborhoods[self.parameters['k']]
-                all_moves = [move for move in neighborhood.feasible_move_generator_for_carrier(instance, carrier)]
-                if any(all_moves):
-                    random_move = random.choice(all_moves)
+                random_move = neighborhood.sample_feasible_move(instance, carrier)
+                if random_move is not None:
+                    requests = self.move_requests(instance, neighborhood, random_move)
                     if self.acceptance_criterion(instance, random_move):
                         neighborhood.execute_move(instance, random_move)  # in place
                         # ut.validate_solution(instance, best_solution)
                         best_solution = deepcopy(solution)
-                        self.update_trajectory(self.parameters['k'], random_move, True)
+                        self.update_trajectory(neighborhood.name, random_move[0], True, requests)
                         self.parameters['k'] = 0
                     else:
-                        self.update_trajectory(self.parameters['k'], random_move, False)
+                        self.update_trajectory(neighborhood.name, random_move[0], False, requests)
                         self.parameters['k'] += 1
                 else:
                     self.parameters['k'] += 1
@@ -331,46 +543,67 @@ class PDPTWReducedVariableNeighborhoodSearch(PDPTWVariableNeighborhoodDescent):
 class PDPTWVariableNeighborhoodSearch(PDPTWVariableNeighborhoodDescent):
     """
     VNS. a random neighbor from the current neighborhood is drawn and local search is applied. then, the acceptance
-    decision is made
+    decision is made. Rejected neighbors are undone by restoring a checkpoint of the carrier
 
     """
 
+    def __init__(self, neighborhoods: Sequence[nh.Neighborhood], time_limit_per_carrier: float):
+        super().__init__(neighborhoods, time_limit_per_carrier)
+        # TODO neighborhood should be a parameter instead of an arbitrary choice
+        # persistent, in-place local search: its don't-look bits survive the shaking, such that only the tours that
+        # were modified by the shaking are re-scanned
+        self._local_search = LocalSearchFirst([self.neighborhoods[0]], self.time_limit_per_carrier / 10)
+
+    def set_budget(self, budget_per_carrier: float, unit: str = 'wall_time'):
+        super().set_budget(budget_per_carrier, unit)
+        self._local_search.set_budget(budget_per_carrier / 10, unit)
+
     def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
                 carrier_ids: List[int] = None) -> slt.CAHDSolution:
         solution = deepcopy(solution)
-        best_solution = deepcopy(solution)
         if carrier_ids is None:
-            carrier_ids = [x.id_ for x in best_solution.carriers]
+            carrier_ids = [x.id_ for x in solution.carriers]
 
+        self._local_search.neighborhoods[0].reset_dont_look_bits()
         for carrier_id in carrier_ids:
+            carrier = solution.carriers[carrier_id]
+            best_objective = solution.objective()
+            best_checkpoint = solution.carrier_checkpoint(carrier_id)
             self.parameters['k'] = 0
-            self.start_time = time.time()
+            self.start_budget()
+            self.start_stopping_rules(instance, carrier)
             while not self.stopping_criterion():
                 neighborhood = self.neighborhoods[self.parameters['k']]
-                all_moves = [move for move in
-                             neighborhood.feasible_move_generator_for_carrier(instance, solution.carriers[carrier_id])]
-                if any(all_moves):
-                    random_move = random.choice(all_moves)
+                random_move = neighborhood.sample_feasible_move(instance, carrier)
+                if random_move is not None:
+                    checkpoint = solution.carrier_checkpoint(carrier_id)
+                    dont_look_checkpoint = self._local_search.neighborhoods[0].dont_look_checkpoint()
+                    requests = self.move_requests(instance, neighborhood, random_move)
                     neighborhood.execute_move(instance, random_move)
-                    solution_improved = self.local_search(instance, solution, [carrier_id])
-                    if self.acceptance_criterion(instance, (solution_improved, best_solution)):
-                        # ut.validate_solution(instance, best_solution)
-                        solution = solution_improved
-                        self.update_trajectory(self.parameters['k'], random_move, True)
+                    self.local_search(instance, solution, carrier_id)
+                    new_objective = solution.objective()
+                    if self.acceptance_criterion(instance, (new_objective, best_objective)):
+                        # ut.validate_solution(instance, solution)
+                        self.update_trajectory(neighborhood.name, random_move[0], True, requests)
                         self.parameters['k'] = 0
-                        if solution_improved.objective() > best_solution.objective():
-                            best_solution = deepcopy(solution_improved)
+                        if new_objective > best_objective:
+                            best_objective = new_objective
+                            best_checkpoint = solution.carrier_checkpoint(carrier_id)
                     else:
-                        self.update_trajectory(self.parameters['k'], random_move, False)
+                        solution.restore_carrier(checkpoint)
+                        self._local_search.neighborhoods[0].restore_dont_look_bits(dont_look_checkpoint)
+                        self.update_trajectory(neighborhood.name, random_move[0], False, requests)
                         self.parameters['k'] += 1
+                    self.update_stopping_rules(carrier.objective())
                 else:
                     self.parameters['k'] += 1
-        return best_solution
+            solution.restore_carrier(best_checkpoint)
+        return solution
 
     def acceptance_criterion(self, instance, move: tuple):
         # accept slight degradations: Threshold acceptance
-        solution_improved, best_solution = move
-        if solution_improved.objective() >= best_solution.objective() * 0.9:
+        new_objective, best_objective = move
+        if new_objective >= best_objective * 0.9:
             return True
         else:
             return False
@@ -378,14 +611,11 @@ class PDPTWVariableNeighborhoodSearch(PDPTWVariableNeighborhoodDescent):
     def execute_on_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour):
         raise NotImplementedError()
 
-    def local_search(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_ids: List[int]):
+    def local_search(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_id: int):
         """
         improves the solution in place
         """
-        # TODO neighborhood should be a parameter instead of an arbitrary choice
-        arbitrary_neighborhood = self.neighborhoods[0]
-        solution = LocalSearchFirst([arbitrary_neighborhood], self.time_limit_per_carrier/10).execute(instance, solution, carrier_ids)
-        return solution
+        self._local_search.improve(instance, solution, carrier_id)
 
 
 class PDPTWSimulatedAnnealing(PDPTWMetaHeuristic):
@@ -394,6 +624,8 @@ class PDPTWSimulatedAnnealing(PDPTWMetaHeuristic):
         self.parameters['initial_temperature'] = 0
         self.parameters['temperature'] = 0
         self.parameters['cooling_factor'] = 0.85
+        # source of randomness of the acceptance criterion, e.g. a random.Random instance. The random module if None
+        self.rng: Union[None, random.Random] = None
 
     def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
                 carrier_ids: List[int] = None) -> slt.CAHDSolution:
@@ -407,7 +639,8 @@ class PDPTWSimulatedAnnealing(PDPTWMetaHeuristic):
             self.parameters['initial_temperature'] = self.compute_start_temperature(carrier)
             self.parameters['temperature'] = self.parameters['initial_temperature']
 
-            self.start_time = time.time()
+            self.start_budget()
+            self.start_stopping_rules(instance, carrier)
 
             i = 0
             while not self.stopping_criterion():
@@ -415,21 +648,21 @@ class PDPTWSimulatedAnnealing(PDPTWMetaHeuristic):
                 self.parameters['temperature'] = \
                     self.parameters['initial_temperature'] * self.parameters['cooling_factor'] ** i
 
-                # random neighbor
+                # random neighbor. If the neighborhood has no feasible move, the iteration is spent anyway, such that
+                # the temperature cools down even if the sample does not cost any budget
                 neighborhood = random.choice(self.neighborhoods)
-                all_moves = list(neighborhood.feasible_move_generator_for_carrier(instance, carrier))
-                if any(all_moves):
-                    move = random.choice(all_moves)
+                move = neighborhood.sample_feasible_move(instance, carrier)
+                if move is not None:
 
                     if self.acceptance_criterion(instance, move):
+                        self.update_trajectory(neighborhood.name, move[0], True,
+                                               self.move_requests(instance, neighborhood, move))
                         neighborhood.execute_move(instance, move)
-                        self.update_trajectory(neighborhood.__class__.__name__, move, True)
                         # update the best solution
                         if solution.objective() > best_solution.objective():
                             best_solution = deepcopy(solution)
-                else:
-                    continue
                 i += 1
+                self.update_stopping_rules(carrier.objective())
         return best_solution
 
     def acceptance_criterion(self, instance: it.MDPDPTWInstance, move: tuple):
@@ -442,8 +675,8 @@ class PDPTWSimulatedAnnealing(PDPTWMetaHeuristic):
             # improving move is always accepted
             elif move[0] <= 0:
                 return True
-            # degrading move is accepted with certain probability
-            elif random.random() < exp(-move[0] / self.parameters['temperature']):  # might raise OverflowError
+            # degrading move is accepted with certain probability (exp might raise an OverflowError)
+            elif (self.rng or random).random() < exp(-move[0] / self.parameters['temperature']):
                 return True
             else:
                 return False
@@ -453,7 +686,7 @@ class PDPTWSimulatedAnnealing(PDPTWMetaHeuristic):
             return False
 
     def stopping_criterion(self):
-        if time.time() - self.start_time < self.time_limit_per_carrier and self.parameters['temperature'] > 1:
+        if not self.budget_exhausted() and self.parameters['temperature'] > 1 and not self.stopping_rule_met():
             return False
         else:
             return True
@@ -472,93 +705,1016 @@ class PDPTWSimulatedAnnealing(PDPTWMetaHeuristic):
         return temperature
 
 
+class PDPTWParallelTempering(PDPTWSimulatedAnnealing):
+    """
+    Parallel tempering (replica exchange): num_replicas Metropolis chains run at a fixed ladder of temperatures
+    between the start temperature (see compute_start_temperature) and min_temperature_ratio times the start
+    temperature. The chains run in parallel worker processes. After every exchange_interval iterations, the states of
+    chains at adjacent temperatures are swapped with probability min(1, exp((f_j - f_i) * (1/T_i - 1/T_j))), such that
+    good states migrate to the cold chains while the hot chains keep exploring. The states are exchanged as compact
+    carrier encodings (see CAHDSolution.carrier_encoding) rather than as pickled solutions.
+
+    Daemonic processes (e.g. the workers of workflow.solve_instances_multiprocessing) are not allowed to have children
+    and run the replicas sequentially.
+
+    Budgets other than wall-clock time (see set_budget) are spent by each replica, i.e. the budget is the work of a
+    single replica, as if all replicas ran in parallel. Thus, the result does not depend on whether they actually do.
+    All randomness is drawn from random.Random instances derived from the seed parameter, i.e. the global random
+    state of the calling process is neither used nor modified.
+    """
+
+    def __init__(self, neighborhoods: Sequence[nh.Neighborhood], time_limit_per_carrier: float,
+                 num_replicas: int = 4):
+        super().__init__(neighborhoods, time_limit_per_carrier)
+        self.parameters['num_replicas'] = num_replicas
+        self.parameters['exchange_interval'] = 100  # iterations of each replica between two exchange attempts
+        self.parameters['min_temperature_ratio'] = 0.01
+        self.parameters['seed'] = 0
+        self._exchange_rng: Union[None, random.Random] = None  # exchanges and the seeds of the chains, see execute
+
+    def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
+                carrier_ids: List[int] = None) -> slt.CAHDSolution:
+        solution = deepcopy(solution)
+        if carrier_ids is None:
+            carrier_ids = [x.id_ for x in solution.carriers]
+
+        num_replicas = self.parameters['num_replicas']
+        self._exchange_rng = random.Random(self.parameters['seed'])
+        if multiprocessing.current_process().daemon:
+            # a copy, since the replicas start their own budgets
+            _init_replica(deepcopy(self), instance, solution)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(num_replicas, initializer=_init_replica, initargs=(self, instance, solution))
+        try:
+            for carrier_id in carrier_ids:
+                carrier = solution.carriers[carrier_id]
+                if not carrier.tours or not self.has_feasible_move(instance, carrier):
+                    continue
+                temperatures = self.temperature_ladder(carrier)
+                states = [(solution.carrier_encoding(carrier_id), carrier.objective())] * num_replicas
+                best_encoding, best_objective = states[0]
+
+                self.iter_count = 0
+                self.start_budget()
+                self.start_stopping_rules(instance, carrier)
+                replica_work = 0  # work spent by each replica so far
+                while not self.stopping_criterion(replica_work):
+                    if self.budget_unit == 'wall_time':
+                        remaining_budget = self.budget_per_carrier - self.spent_budget()
+                    else:
+                        remaining_budget = self.budget_per_carrier - replica_work
+                    tasks = [(carrier_id, states[i][0], temperatures[i], self._exchange_rng.getrandbits(64),
+                              self.parameters['exchange_interval'], remaining_budget)
+                             for i in range(num_replicas)]
+                    if pool is None:
+                        chains = [_replica_chain(*task) for task in tasks]
+                    else:
+                        chains = pool.starmap(_replica_chain, tasks, chunksize=1)
+                    states = [(encoding, objective) for encoding, objective, _, _, _ in chains]
+                    for _, _, encoding, objective, _ in chains:
+                        if objective > best_objective:
+                            best_encoding, best_objective = encoding, objective
+                    epoch_work = max(work for _, _, _, _, work in chains)
+                    if epoch_work == 0 and self.budget_unit != 'wall_time':
+                        # none of the replicas has evaluated a single move, thus their states cannot change anymore
+                        break
+                    replica_work += epoch_work
+                    self.exchange(states, temperatures)
+                    self.iter_count += 1
+                    self.update_stopping_rules(states[0][1])  # the coldest replica
+
+                solution.decode_carrier(instance, carrier_id, best_encoding)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return solution
+
+    def has_feasible_move(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution) -> bool:
+        """whether any of the neighborhoods has a feasible move for the carrier, e.g. not for a single request"""
+        return any(next(neighborhood.feasible_move_generator_for_carrier(instance, carrier), None) is not None
+                   for neighborhood in self.neighborhoods)
+
+    def temperature_ladder(self, carrier: slt.AHDSolution) -> List[float]:
+        """geometrically spaced temperatures, coldest first"""
+        start_temperature = self.compute_start_temperature(carrier)
+        num_replicas = self.parameters['num_replicas']
+        if num_replicas == 1:
+            return [start_temperature]
+        ratio = self.parameters['min_temperature_ratio']
+        return [start_temperature * ratio ** ((num_replicas - 1 - i) / (num_replicas - 1))
+                for i in range(num_replicas)]
+
+    def exchange(self, states: List[tuple], temperatures: List[float]):
+        """
+        attempt to swap the (encoding, objective) states of adjacent temperatures in place. Even and odd pairs are
+        attempted alternately
+        """
+        for i in range(self.iter_count % 2, len(states) - 1, 2):
+            j = i + 1
+            exponent = (states[j][1] - states[i][1]) * (1 / temperatures[i] - 1 / temperatures[j])
+            if exponent >= 0 or self._exchange_rng.random() < exp(exponent):
+                # delta in travel distance of the colder replica
+                self.update_trajectory('Replica Exchange', states[i][1] - states[j][1], True)
+                states[i], states[j] = states[j], states[i]
+
+    def stopping_criterion(self, replica_work: float = 0):
+        if self.budget_unit == 'wall_time':
+            exhausted = self.budget_exhausted()
+        else:
+            exhausted = replica_work >= self.budget_per_carrier
+        if not exhausted and not self.stopping_rule_met():
+            return False
+        else:
+            return True
+
+
+# state of a replica worker process of PDPTWParallelTempering, see _init_replica
+_replica = dict()
+
+
+def _init_replica(metaheuristic: PDPTWParallelTempering, instance: it.MDPDPTWInstance,
+                  solution: slt.CAHDSolution):
+    """pool initializer: the instance and solution are sent to each worker process only once"""
+    _replica['metaheuristic'] = metaheuristic
+    _replica['instance'] = instance
+    _replica['solution'] = deepcopy(solution)
+
+
+def _replica_chain(carrier_id: int, encoding, temperature: float, seed: int, num_iterations: int, budget: float):
+    """
+    runs num_iterations of the Metropolis chain at the given temperature, starting from the encoded carrier routing.
+    Stops early once the budget (in the metaheuristic's budget unit) is spent
+
+    :return: encoding and objective of the final state and of the best state that was visited, the spent budget
+    """
+    rng = random.Random(seed)
+    metaheuristic, instance, solution = _replica['metaheuristic'], _replica['instance'], _replica['solution']
+    metaheuristic.parameters['temperature'] = temperature
+    metaheuristic.rng = rng
+    solution.decode_carrier(instance, carrier_id, encoding)
+    # the budget is spent on the chain's moves only, not on decoding its state
+    metaheuristic.start_budget()
+    carrier = solution.carriers[carrier_id]
+
+    objective = best_objective = carrier.objective()
+    best_encoding = encoding
+    for _ in range(num_iterations):
+        if metaheuristic.spent_budget() >= budget:
+            break
+        neighborhood = rng.choice(metaheuristic.neighborhoods)
+        move = neighborhood.sample_feasible_move(instance, carrier, rng)
+        if metaheuristic.acceptance_criterion(instance, move):
+            neighborhood.execute_move(instance, move)
+            objective = carrier.objective()
+            if objective > best_objective:
+                best_encoding, best_objective = solution.carrier_encoding(carrier_id), objective
+    return solution.carrier_encoding(carrier_id), objective, best_encoding, best_objective, metaheuristic.spent_budget()
+
+
 class PDPTWIteratedLocalSearch(PDPTWMetaHeuristic):
     """
-    Uses a perturbation function to explore different regions of the solution space
+    Uses a perturbation function to explore different regions of the solution space. Perturbation and local search
+    operate in place; rejected perturbations are undone by restoring a checkpoint of the carrier
     """
 
+    def __init__(self, neighborhoods: Sequence[nh.Neighborhood], time_limit_per_carrier: float):
+        super().__init__(neighborhoods, time_limit_per_carrier)
+        # TODO neighborhood should be a parameter instead of an arbitrary choice
+        # persistent, in-place local search: its don't-look bits survive the perturbation, such that only the tours
+        # that were modified by the perturbation are re-scanned
+        self._local_search = LocalSearchFirst([self.neighborhoods[0]], self.time_limit_per_carrier / 10)
+        self.repair_operators = [cns.MinTravelDistanceInsertion()]
+        # to ensure same perturbations in (a) post-acceptance and (b) bidding improvement
+        self.parameters['seed'] = 99
+
+    def set_budget(self, budget_per_carrier: float, unit: str = 'wall_time'):
+        super().set_budget(budget_per_carrier, unit)
+        self._local_search.set_budget(budget_per_carrier / 10, unit)
+
     def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
                 carrier_ids: List[int] = None) -> slt.CAHDSolution:
         solution = deepcopy(solution)
-        best_best_solution = solution
 
         perturbation_num_requests = 2
-        random.seed(99)  # to ensure same perturbations in (a) post-acceptance and (b) bidding improvement
+        random.seed(self.parameters['seed'])
 
         if carrier_ids is None:
             carrier_ids = [x.id_ for x in solution.carriers]
 
+        self._local_search.neighborhoods[0].reset_dont_look_bits()
         for carrier_id in carrier_ids:
+            carrier = solution.carriers[carrier_id]
 
-            self.local_search(instance, solution, [carrier_id])
-            best_solution = solution
+            self.local_search(instance, solution, carrier_id)
+            current_objective = best_objective = solution.objective()
+            current_distance = carrier.sum_travel_distance()
+            best_checkpoint = solution.carrier_checkpoint(carrier_id)
             self.iter_count = 0
-            self.start_time = time.time()
+            self.start_budget()
+            self.start_stopping_rules(instance, carrier)
 
             while not self.stopping_criterion():
-                solution_new = self.perturbation(instance, solution, carrier_id, perturbation_num_requests)
-                solution_new = self.local_search(instance, solution_new, [carrier_id])
-
-                if solution_new.objective() > best_solution.objective():
-                    best_solution = solution_new
-
-                delta = solution_new.sum_travel_distance() - solution.sum_travel_distance()
-                move = (delta, solution, solution_new)
+                checkpoint = solution.carrier_checkpoint(carrier_id)
+                dont_look_checkpoint = self._local_search.neighborhoods[0].dont_look_checkpoint()
+                try:
+                    self.perturbation(instance, solution, carrier_id, perturbation_num_requests)
+                except ut.ConstraintViolationError:
+                    # sometimes the perturbation cannot be repaired with the given method. in that case, the local
+                    # search continues from the unperturbed solution
+                    solution.restore_carrier(checkpoint)
+                    self._local_search.neighborhoods[0].restore_dont_look_bits(dont_look_checkpoint)
+                self.local_search(instance, solution, carrier_id)
+                new_objective = solution.objective()
+
+                if new_objective > best_objective:
+                    best_objective = new_objective
+                    best_checkpoint = solution.carrier_checkpoint(carrier_id)
+
+                delta = carrier.sum_travel_distance() - current_distance
+                move = (delta, current_objective, new_objective)
                 if self.acceptance_criterion(instance, move):
-                    self.update_trajectory('ILS Perturbation', move, True)
-                    solution = solution_new  # equivalent to execute_move
+                    self.update_trajectory('ILS Perturbation', delta, True)
+                    current_objective = new_objective
+                    current_distance += delta
+                else:
+                    solution.restore_carrier(checkpoint)
+                    self._local_search.neighborhoods[0].restore_dont_look_bits(dont_look_checkpoint)
                 self.iter_count += 1
+                self.update_stopping_rules(carrier.objective())
 
-            if best_solution.objective() > best_best_solution.objective():
-                best_best_solution = best_solution
+            solution.restore_carrier(best_checkpoint)
 
-        return best_best_solution
+        return solution
 
     def acceptance_criterion(self, instance: it.MDPDPTWInstance, move: tuple):
         """
         accept slight degradations: Threshold acceptance
 
         :param instance:
-        :param move:
+        :param move: (delta, current_objective, new_objective)
         :return:
         """
-        delta, solution, solution_new = move
-        if solution_new.objective() >= solution.objective() * 0.9:
+        delta, current_objective, new_objective = move
+        if new_objective >= current_objective * 0.9:
             return True
         else:
             return False
 
     def perturbation(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_id: int,
-                     num_requests: int) -> slt.CAHDSolution:
-        solution_copy = deepcopy(solution)
-        carrier_copy = solution_copy.carriers[carrier_id]
+                     num_requests: int):
+        """
+        perturbs the carrier's routing in place. Raises a ConstraintViolationError if the shaken routing cannot be
+        repaired, in which case the carrier is left partially destroyed and must be restored by the caller
+        """
+        carrier = solution.carriers[carrier_id]
+        # destroy/shake
+        # TODO test different shakes
+        sh.RandomRemovalShake().execute(instance, carrier, num_requests)
+
+        # repair
+        # TODO test different repairs
+        self.repair_operators[0].insert_all_unrouted_statically(instance, solution, carrier_id)
+
+    def local_search(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_id: int):
+        """
+        improves the solution in place
+        """
+        self._local_search.improve(instance, solution, carrier_id)
+
+    def stopping_criterion(self):
+        if not self.budget_exhausted() and not self.stopping_rule_met():
+            return False
+        else:
+            return True
+
+
+class PDPTWAdaptiveLargeNeighborhoodSearch(PDPTWMetaHeuristic):
+    """
+    ALNS according to Ropke,S., & Pisinger,D. (2006). An Adaptive Large Neighborhood Search Heuristic for the Pickup
+    and Delivery Problem with Time Windows. Transportation Science, 40(4), 455–472.
+    https://doi.org/10.1287/trsc.1050.0135
+
+    In each iteration, a destroy operator (a Shake) and a repair operator (a tour construction) are selected by
+    roulette wheel selection. Their weights are adapted at the end of every segment of iterations based on the scores
+    that the operators collected in that segment. The repaired solution is accepted based on simulated annealing or
+    threshold acceptance. Rejected solutions are undone by restoring a checkpoint of the carrier (see
+    CAHDSolution.carrier_checkpoint), i.e. the solution is never copied as a whole.
+
+    As in most LNS variants for routing, each repaired solution is improved by a first-improvement descent over the
+    neighborhoods (see PDPTWSequentialLocalSearch.improve) before the acceptance decision: the insertion heuristics
+    alone leave cheap intra- and inter-tour improvements behind. The don't-look bits of the neighborhoods are kept
+    across iterations, such that the descent only re-scans the requests around the destroyed and repaired tours.
+    """
+
+    def __init__(self, neighborhoods: Sequence[nh.Neighborhood], time_limit_per_carrier: float,
+                 destroy_operators: Sequence[sh.Shake] = None,
+                 repair_operators: Sequence[cns.PDPParallelInsertionConstruction] = None,
+                 acceptance: str = 'simulated_annealing'):
+        """
+        :param destroy_operators: defaults to all available shakes
+        :param repair_operators: defaults to MinTravelDistanceInsertion and MinTimeShiftInsertion
+        :param acceptance: 'simulated_annealing' or 'threshold'
+        """
+        super().__init__(neighborhoods, time_limit_per_carrier)
+        assert acceptance in ('simulated_annealing', 'threshold')
+        if destroy_operators is None:
+            destroy_operators = [sh.RandomRemovalShake(), sh.ShawRemovalShake(), sh.WorstRemovalShake(),
+                                 sh.ClusterRemovalShake()]
+        if repair_operators is None:
+            repair_operators = [cns.MinTravelDistanceInsertion(), cns.MinTimeShiftInsertion()]
+        self.destroy_operators = destroy_operators
+        self.repair_operators = repair_operators
+        self.acceptance = acceptance
+        self._local_search = PDPTWSequentialLocalSearch(neighborhoods, time_limit_per_carrier / 20)
+
+        # scores for finding a new global best solution, a new improving solution and a new accepted solution
+        self.parameters['scores'] = (33, 9, 13)
+        self.parameters['reaction_factor'] = 0.1
+        self.parameters['segment_length'] = 100
+        # maximum share of the carrier's requests that is removed per iteration
+        self.parameters['max_removal_share'] = 0.4
+        self.parameters['initial_temperature'] = 0
+        self.parameters['temperature'] = 0
+        self.parameters['cooling_factor'] = 0.99975
+
+    def set_budget(self, budget_per_carrier: float, unit: str = 'wall_time'):
+        super().set_budget(budget_per_carrier, unit)
+        self._local_search.set_budget(budget_per_carrier / 20, unit)
+
+    def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
+                carrier_ids: List[int] = None) -> slt.CAHDSolution:
+        solution = deepcopy(solution)
+        if carrier_ids is None:
+            carrier_ids = [x.id_ for x in solution.carriers]
+
+        for neighborhood in self.neighborhoods:
+            neighborhood.reset_dont_look_bits()
+        for carrier_id in carrier_ids:
+            carrier = solution.carriers[carrier_id]
+            if not carrier.tours:
+                continue
+            self.parameters['initial_temperature'] = PDPTWSimulatedAnnealing.compute_start_temperature(carrier)
+            self.parameters['temperature'] = self.parameters['initial_temperature']
+
+            destroy_weights = [1.0] * len(self.destroy_operators)
+            repair_weights = [1.0] * len(self.repair_operators)
+            destroy_scores, destroy_uses = [0] * len(self.destroy_operators), [0] * len(self.destroy_operators)
+            repair_scores, repair_uses = [0] * len(self.repair_operators), [0] * len(self.repair_operators)
+
+            current_objective = best_objective = carrier.objective()
+            current_distance = carrier.sum_travel_distance()
+            best_checkpoint = solution.carrier_checkpoint(carrier_id)
+            visited = {self._fingerprint(carrier)}
+
+            self.iter_count = 0
+            self.start_budget()
+            self.start_stopping_rules(instance, carrier)
+            while not self.stopping_criterion():
+                destroy = random.choices(range(len(self.destroy_operators)), destroy_weights)[0]
+                repair = random.choices(range(len(self.repair_operators)), repair_weights)[0]
+                destroy_uses[destroy] += 1
+                repair_uses[repair] += 1
+
+                checkpoint = solution.carrier_checkpoint(carrier_id)
+                try:
+                    self.destroy_operators[destroy].execute(instance, carrier, self._num_removal_requests(carrier))
+                    self.repair_operators[repair].insert_all_unrouted_statically(instance, solution, carrier_id)
+                    self._local_search.improve(instance, solution, carrier_id)
+                except ut.ConstraintViolationError:
+                    # sometimes the destroyed solution cannot be repaired with the given method
+                    solution.restore_carrier(checkpoint)
+                    self._next_iteration(destroy_weights, destroy_scores, destroy_uses,
+                                         repair_weights, repair_scores, repair_uses)
+                    self.update_stopping_rules(current_objective)
+                    continue
+
+                new_objective = carrier.objective()
+                fingerprint = self._fingerprint(carrier)
+                score = 0
+                if self.acceptance_criterion(instance, (new_objective, current_objective)):
+                    delta = carrier.sum_travel_distance() - current_distance
+                    self.update_trajectory(f'{self.destroy_operators[destroy].__class__.__name__}, '
+                                           f'{self.repair_operators[repair].name}', delta, True)
+                    if new_objective > best_objective:
+                        score = self.parameters['scores'][0]
+                        best_objective = new_objective
+                        best_checkpoint = solution.carrier_checkpoint(carrier_id)
+                    elif fingerprint not in visited:
+                        score = self.parameters['scores'][1 if new_objective > current_objective else 2]
+                    visited.add(fingerprint)
+                    current_objective = new_objective
+                    current_distance += delta
+                else:
+                    solution.restore_carrier(checkpoint)
+                destroy_scores[destroy] += score
+                repair_scores[repair] += score
+
+                self._next_iteration(destroy_weights, destroy_scores, destroy_uses,
+                                     repair_weights, repair_scores, repair_uses)
+                self.update_stopping_rules(current_objective)
+
+            solution.restore_carrier(best_checkpoint)
+        return solution
+
+    def _next_iteration(self, destroy_weights: List[float], destroy_scores: List[int], destroy_uses: List[int],
+                        repair_weights: List[float], repair_scores: List[int], repair_uses: List[int]):
+        """cool down and, at the end of a segment, adapt the operator weights and reset the scores"""
+        self.parameters['temperature'] *= self.parameters['cooling_factor']
+        self.iter_count += 1
+        if self.iter_count % self.parameters['segment_length'] == 0:
+            reaction_factor = self.parameters['reaction_factor']
+            for weights, scores, uses in ((destroy_weights, destroy_scores, destroy_uses),
+                                          (repair_weights, repair_scores, repair_uses)):
+                for i in range(len(weights)):
+                    if uses[i] > 0:
+                        weights[i] = (1 - reaction_factor) * weights[i] + reaction_factor * scores[i] / uses[i]
+                    scores[i], uses[i] = 0, 0
+
+    def _num_removal_requests(self, carrier: slt.AHDSolution) -> int:
+        """
+        a random number of requests between 1 and max_removal_share of the carrier's requests is drawn for the carrier
+        as a whole. Shakes take the number of requests per tour (see Shake.execute), thus it is returned per tour
+        """
+        num_requests = random.randint(1, max(1, int(len(carrier.routed_requests) *
+                                                     self.parameters['max_removal_share'])))
+        return max(1, round(num_requests / len(carrier.tours)))
+
+    @staticmethod
+    def _fingerprint(carrier: slt.AHDSolution):
+        """identifies the carrier's routing, independent of the order and ids of its tours"""
+        return frozenset(tuple(tour.routing_sequence) for tour in carrier.tours)
+
+    def acceptance_criterion(self, instance: it.MDPDPTWInstance, move: tuple):
+        """
+        simulated annealing or threshold acceptance, depending on self.acceptance
+
+        :param move: (new_objective, current_objective)
+        """
+        new_objective, current_objective = move
+        if new_objective >= current_objective:
+            return True
+        if self.acceptance == 'threshold':
+            return new_objective >= current_objective * 0.9
         try:
-            # destroy/shake
-            # TODO test different shakes
-            sh.RandomRemovalShake().execute(instance, carrier_copy, num_requests)
+            return random.random() < exp((new_objective - current_objective) / self.parameters['temperature'])
+        except ZeroDivisionError:
+            return False
 
-            # repair
-            # TODO test different repairs
-            cns.MinTravelDistanceInsertion().insert_all_unrouted_statically(instance, solution_copy, carrier_copy.id_)
+    def stopping_criterion(self):
+        if not self.budget_exhausted() and not self.stopping_rule_met():
+            return False
+        else:
+            return True
 
-            return solution_copy
 
-        except ut.ConstraintViolationError:
-            # sometimes the shaking cannot be repaired with the given method and will raise a ConstraintViolationError
-            # in that case, simply returning the original solution
-            return solution
+class TabuList:
+    """
+    Attributes that are tabu until an expiry iteration. The expiry of each attribute is stored in a hash map, i.e. the
+    lookup is O(1). A ring buffer of max_tenure slots holds the attributes by their expiry iteration, such that
+    advancing to the next iteration only touches the attributes that expire in that iteration.
+    """
+
+    def __init__(self, max_tenure: int):
+        self.max_tenure = max_tenure
+        self.iteration = 0
+        self._expiry: Dict[Hashable, int] = dict()
+        self._ring: List[List[Hashable]] = [[] for _ in range(max_tenure)]
+
+    def __contains__(self, attribute: Hashable):
+        return self._expiry.get(attribute, 0) > self.iteration
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def add(self, attribute: Hashable, tenure: int):
+        """the attribute is tabu for the next tenure iterations (at most max_tenure)"""
+        expiry = self.iteration + max(1, min(tenure, self.max_tenure))
+        if self._expiry.get(attribute, 0) < expiry:
+            self._expiry[attribute] = expiry
+            self._ring[expiry % self.max_tenure].append(attribute)
+
+    def next_iteration(self):
+        self.iteration += 1
+        slot = self._ring[self.iteration % self.max_tenure]
+        for attribute in slot:
+            # the attribute may have been added again with a later expiry in the meantime
+            if self._expiry.get(attribute) == self.iteration:
+                del self._expiry[attribute]
+        slot.clear()
+
+
+class PDPTWTabuSearch(PDPTWMetaHeuristic):
+    """
+    Tabu search (Glover, F. (1989). Tabu Search—Part I. ORSA Journal on Computing, 1(3), 190–206.
+    https://doi.org/10.1287/ijoc.1.3.190): in each iteration, the best admissible move over all neighborhoods is
+    executed, even if it is not improving. A move destroys attributes (request, tour, position bucket) of the routing,
+    see Neighborhood.move_attributes. These become tabu, i.e. moves that re-create them are not admissible for the
+    tenure, unless they lead to a new best solution (aspiration). The objective is maintained incrementally from the
+    move deltas.
+
+    Cycling is detected by fingerprints of the visited routings and counteracted by increasing the tenure, which
+    decreases again if no cycle occurs for max_tenure iterations (Battiti,R., & Tecchiolli,G. (1994). The Reactive
+    Tabu Search. ORSA Journal on Computing, 6(2), 126–140. https://doi.org/10.1287/ijoc.6.2.126).
+
+    Move evaluations are cached per (request, target tour), see Neighborhood.best_admissible_move_for_carrier, i.e.
+    each iteration only re-evaluates the combinations involving the tours that were modified by the previous move.
+    """
+
+    def __init__(self, neighborhoods: Sequence[nh.Neighborhood], time_limit_per_carrier: float):
+        super().__init__(neighborhoods, time_limit_per_carrier)
+        self.tabu_list: Union[None, TabuList] = None
+        self.parameters['bucket_size'] = 3  # number of consecutive routing positions that form one attribute
+        self.parameters['min_tenure'] = 5
+        self.parameters['max_tenure'] = 50
+        self.parameters['tenure'] = 0
+        self.parameters['tenure_increase'] = 1.2
+        self.parameters['tenure_decrease'] = 0.9
+        self.parameters['max_iterations_without_improvement'] = 200
+        self.parameters['iterations_without_improvement'] = 0
+        self.parameters['current_objective'] = 0
+        self.parameters['best_objective'] = 0
+
+    def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
+                carrier_ids: List[int] = None) -> slt.CAHDSolution:
+        solution = deepcopy(solution)
+        if carrier_ids is None:
+            carrier_ids = [x.id_ for x in solution.carriers]
 
-    def local_search(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_ids: List[int]):
+        for carrier_id in carrier_ids:
+            carrier = solution.carriers[carrier_id]
+            for neighborhood in self.neighborhoods:
+                neighborhood.clear_move_cache()
+            self.tabu_list = TabuList(self.parameters['max_tenure'])
+            self.parameters['tenure'] = self.parameters['min_tenure']
+            self.parameters['current_objective'] = self.parameters['best_objective'] = carrier.objective()
+            self.parameters['iterations_without_improvement'] = 0
+            best_checkpoint = solution.carrier_checkpoint(carrier_id)
+            visited = {self._fingerprint(carrier)}
+            last_tenure_change = 0
+
+            self.iter_count = 0
+            self.start_budget()
+            self.start_stopping_rules(instance, carrier)
+            while not self.stopping_criterion():
+                best_move, best_neighborhood = None, None
+                for neighborhood in self.neighborhoods:
+                    threshold = best_move[0] if best_move is not None else float('inf')
+                    move = neighborhood.best_admissible_move_for_carrier(
+                        instance, carrier, lambda m: self.acceptance_criterion(instance, (neighborhood, m)), threshold)
+                    if move is not None:
+                        best_move, best_neighborhood = move, neighborhood
+                if best_move is None:
+                    break  # no admissible move
+
+                attributes = best_neighborhood.move_attributes(instance, best_move)
+                best_neighborhood.execute_move(instance, best_move)
+                self.update_trajectory(best_neighborhood.name, best_move[0], True,
+                                       [request for request, _, _, _, _ in attributes])
+                self.tabu_list.next_iteration()
+                for request, old_tour, old_pickup_pos, new_tour, new_pickup_pos in attributes:
+                    self.tabu_list.add((request, old_tour.id_, old_pickup_pos // self.parameters['bucket_size']),
+                                       self.parameters['tenure'])
+                self.parameters['current_objective'] -= best_move[0]
+                self.iter_count += 1
+                self.update_stopping_rules(self.parameters['current_objective'])
+
+                if self.parameters['current_objective'] > self.parameters['best_objective']:
+                    self.parameters['best_objective'] = self.parameters['current_objective']
+                    self.parameters['iterations_without_improvement'] = 0
+                    best_checkpoint = solution.carrier_checkpoint(carrier_id)
+                else:
+                    self.parameters['iterations_without_improvement'] += 1
+
+                # reactive tenure
+                fingerprint = self._fingerprint(carrier)
+                if fingerprint in visited:
+                    self.parameters['tenure'] = min(self.parameters['max_tenure'],
+                                                    ceil(self.parameters['tenure'] * self.parameters['tenure_increase']))
+                    last_tenure_change = self.iter_count
+                elif self.iter_count - last_tenure_change > self.parameters['max_tenure']:
+                    self.parameters['tenure'] = max(self.parameters['min_tenure'],
+                                                    int(self.parameters['tenure'] * self.parameters['tenure_decrease']))
+                    last_tenure_change = self.iter_count
+                visited.add(fingerprint)
+
+            solution.restore_carrier(best_checkpoint)
+            for neighborhood in self.neighborhoods:
+                neighborhood.clear_move_cache()
+        return solution
+
+    @staticmethod
+    def _fingerprint(carrier: slt.AHDSolution) -> int:
+        """hash of the carrier's routing, independent of the order and ids of its tours"""
+        return hash(frozenset(tuple(tour.routing_sequence) for tour in carrier.tours))
+
+    def acceptance_criterion(self, instance: it.MDPDPTWInstance, move: tuple):
         """
-        improves the solution in place
+        admissibility of a neighborhood move: it must not re-create a tabu attribute, unless it leads to a new best
+        solution (aspiration)
+
+        :param move: (neighborhood, neighborhood move)
         """
-        # TODO neighborhood should be a parameter instead of an arbitrary choice
-        arbitrary_neighborhood = self.neighborhoods[0]
-        improved_solution = LocalSearchFirst([arbitrary_neighborhood], self.time_limit_per_carrier/10).execute(instance, solution, carrier_ids)
-        return improved_solution
+        neighborhood, move = move
+        if self.parameters['current_objective'] - move[0] > self.parameters['best_objective']:
+            return True
+        bucket_size = self.parameters['bucket_size']
+        for request, _, _, new_tour, new_pickup_pos in neighborhood.move_attributes(instance, move):
+            if (request, new_tour.id_, new_pickup_pos // bucket_size) in self.tabu_list:
+                return False
+        return True
+
+    def stopping_criterion(self):
+        if not self.budget_exhausted() and not self.stopping_rule_met() and \
+                self.parameters['iterations_without_improvement'] < \
+                self.parameters['max_iterations_without_improvement']:
+            return False
+        else:
+            return True
+
+
+class PDPTWHybridGeneticSearch(PDPTWMetaHeuristic):
+    """
+    Hybrid genetic search (Vidal,T., Crainic,T.G., Gendreau,M., Lahrichi,N., & Rei,W. (2012). A Hybrid Genetic
+    Algorithm for Multidepot and Periodic Vehicle Routing Problems. Operations Research, 60(3), 611–624.
+    https://doi.org/10.1287/opre.1120.1048) for the carriers' PDPTW:
+
+    - An individual is a giant tour: the vertices of all tours of the carrier, separated by the depot. The population
+      is stored as a single integer array with one (padded) giant tour per row. The chromosome is the permutation of
+      requests in the order of their pickups.
+    - Offspring are created by order crossover (OX) of two parents selected by binary tournament and decoded by split:
+      each tour serves a consecutive part of the permutation, whose requests are inserted one after the other at
+      their cheapest feasible position. The split points are chosen by dynamic programming over the number of tours.
+    - Offspring are educated by the neighborhoods (see PDPTWSequentialLocalSearch.improve).
+    - Survivors are selected by biased fitness, i.e. by the ranks of the travel distance and of the contribution to
+      the population's diversity, which is measured by the broken-pairs distance of the tours' request successors.
+      Clones are removed first.
+
+    The objective is equivalent to the travel distance, since the routed requests (and thus the revenue) are fixed.
+    """
+
+    def __init__(self, neighborhoods: Sequence[nh.Neighborhood], time_limit_per_carrier: float):
+        super().__init__(neighborhoods, time_limit_per_carrier)
+        self._education = PDPTWSequentialLocalSearch(neighborhoods, time_limit_per_carrier / 20)
+        self.parameters['population_size'] = 12  # minimum population size, mu
+        self.parameters['generation_size'] = 12  # number of offspring before survivor selection, lambda
+        self.parameters['num_elite'] = 4
+        self.parameters['num_close'] = 3  # number of closest individuals that define the diversity contribution
+
+        # population of the current carrier
+        self._giant_tours: Union[None, np.ndarray] = None  # (capacity, 2 * num requests + max num tours), -1 padded
+        self._successors: Union[None, np.ndarray] = None  # (capacity, num requests), see _add_individual
+        self._distances: Union[None, np.ndarray] = None  # (capacity,)
+        self._size = 0
+        self._request_index: Dict[int, int] = dict()  # request -> column of self._successors
+        self._num_carriers = 0
+        self._num_requests = 0
+
+    def set_budget(self, budget_per_carrier: float, unit: str = 'wall_time'):
+        super().set_budget(budget_per_carrier, unit)
+        self._education.set_budget(budget_per_carrier / 20, unit)
+
+    def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
+                carrier_ids: List[int] = None) -> slt.CAHDSolution:
+        solution = deepcopy(solution)
+        if carrier_ids is None:
+            carrier_ids = [x.id_ for x in solution.carriers]
+
+        for neighborhood in self.neighborhoods:
+            neighborhood.reset_dont_look_bits()
+        for carrier_id in carrier_ids:
+            carrier = solution.carriers[carrier_id]
+            if len(carrier.routed_requests) < 2:
+                continue
+            self.start_budget()
+            self.start_stopping_rules(instance, carrier)
+            self.iter_count = 0
+            self._initialize_population(instance, solution, carrier_id)
+
+            while not self.stopping_criterion():
+                first_parent, second_parent = self._binary_tournament(), self._binary_tournament()
+                permutation = self.order_crossover(self._permutation(first_parent), self._permutation(second_parent))
+                self._add_offspring(instance, solution, carrier_id, permutation)
+                self.iter_count += 1
+                # the revenue of the routed requests is the same for all individuals
+                self.update_stopping_rules(carrier.sum_revenue() - self._distances[:self._size].min())
+
+            best = int(np.argmin(self._distances[:self._size]))
+            solution.decode_carrier(instance, carrier_id, self._encoding(best))
+        return solution
+
+    def _initialize_population(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_id: int):
+        """the educated current routing and educated random permutations"""
+        carrier = solution.carriers[carrier_id]
+        requests = sorted(carrier.routed_requests)
+        capacity = self.parameters['population_size'] + self.parameters['generation_size']
+        self._giant_tours = np.full((capacity, 2 * len(requests) + instance.carriers_max_num_tours), -1,
+                                    dtype=np.int32)
+        self._successors = np.empty((capacity, len(requests)), dtype=np.int32)
+        self._distances = np.empty(capacity)
+        self._size = 0
+        self._request_index = {request: index for index, request in enumerate(requests)}
+        self._num_carriers, self._num_requests = instance.num_carriers, instance.num_requests
+
+        self._education.improve(instance, solution, carrier_id)
+        self._add_individual(carrier.id_, solution.carrier_encoding(carrier_id), carrier.sum_travel_distance())
+        for _ in range(4 * self.parameters['population_size']):
+            if self._size >= self.parameters['population_size'] or self.stopping_criterion():
+                break
+            self._add_offspring(instance, solution, carrier_id, np.array(random.sample(requests, len(requests))))
+
+    def _add_offspring(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_id: int,
+                       permutation: np.ndarray):
+        """split, educate and add to the population. Permutations that cannot be split feasibly are discarded"""
+        carrier = solution.carriers[carrier_id]
+        encoding = self.split(instance, carrier, permutation)
+        if encoding is None:
+            return
+        solution.decode_carrier(instance, carrier_id, encoding)
+        self._education.improve(instance, solution, carrier_id)
+        self._add_individual(carrier.id_, solution.carrier_encoding(carrier_id), carrier.sum_travel_distance())
+        if self._size == len(self._giant_tours):
+            self._select_survivors()
+
+    @staticmethod
+    def order_crossover(first_parent: np.ndarray, second_parent: np.ndarray) -> np.ndarray:
+        """
+        OX: the child inherits a random slice of the first parent. The remaining positions are filled (starting after
+        the slice and wrapping around) with the missing requests in the order of the second parent
+        """
+        n = len(first_parent)
+        start, end = sorted(random.sample(range(n + 1), 2))
+        child = np.empty(n, dtype=first_parent.dtype)
+        child[start:end] = first_parent[start:end]
+        rotated = np.roll(second_parent, -end)
+        rest = rotated[~np.isin(rotated, first_parent[start:end])]
+        child[end:] = rest[:n - end]
+        child[:start] = rest[n - end:]
+        return child
+
+    def split(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+              permutation: np.ndarray) -> Union[None, Tuple[Tuple[int, ...], ...]]:
+        """
+        decode a permutation of the carrier's requests into tours. Each tour serves a consecutive part of the
+        permutation, the requests of a part are inserted one after the other at their cheapest feasible position.
+        Among all such partitions into at most instance.carriers_max_num_tours tours, the one with the minimal total
+        travel distance is found by dynamic programming over the parts' end positions and the number of tours.
+
+        The insertions are checked without copying the tour (see Tour.pop_insert_feasibility_check), in ascending order
+        of their distance delta, and each check counts as a move evaluation.
+
+        :return: the routing as a carrier encoding (see CAHDSolution.carrier_encoding) or None if no feasible partition
+        exists
+        """
+        n = len(permutation)
+        # segments[i][j] = (travel distance, routing sequence without depots) of the tour serving permutation[i:j]
+        segments: List[Dict[int, Tuple[float, Tuple[int, ...]]]] = [dict() for _ in range(n)]
+        for i in range(n):
+            tour = tr.Tour('tmp', depot_index=carrier.id_)
+            for j in range(i, n):
+                pickup, delivery = instance.pickup_delivery_pair(int(permutation[j]))
+                deltas = tr.pickup_delivery_insertion_distance_deltas(tour.routing_sequence, instance.distance_matrix,
+                                                                      pickup, delivery)
+                pickup_positions, delivery_positions = np.nonzero(deltas < np.inf)
+                for idx in np.argsort(deltas[pickup_positions, delivery_positions], kind='stable'):
+                    insertion = [int(pickup_positions[idx]), int(delivery_positions[idx])]
+                    self.num_move_evaluations += 1
+                    if tour.pop_insert_feasibility_check(instance, [], insertion, [pickup, delivery]):
+                        tour.insert_and_update(instance, insertion, [pickup, delivery])
+                        break
+                else:
+                    break  # the tour cannot be extended any further
+                segments[i][j + 1] = (tour.sum_travel_distance, tuple(tour.routing_sequence[1:-1]))
+
+        # distance[k][j]: minimal travel distance of serving permutation[:j] with k tours
+        max_num_tours = instance.carriers_max_num_tours
+        distance = [[float('inf')] * (n + 1) for _ in range(max_num_tours + 1)]
+        predecessor = [[None] * (n + 1) for _ in range(max_num_tours + 1)]
+        distance[0][0] = 0
+        for k in range(1, max_num_tours + 1):
+            for i in range(n):
+                if distance[k - 1][i] == float('inf'):
+                    continue
+                for j, (segment_distance, _) in segments[i].items():
+                    if distance[k - 1][i] + segment_distance < distance[k][j]:
+                        distance[k][j] = distance[k - 1][i] + segment_distance
+                        predecessor[k][j] = i
+
+        num_tours = min(range(1, max_num_tours + 1), key=lambda k: distance[k][n])
+        if distance[num_tours][n] == float('inf'):
+            return None
+        encoding = []
+        j = n
+        for k in range(num_tours, 0, -1):
+            i = predecessor[k][j]
+            encoding.append(segments[i][j][1])
+            j = i
+        return tuple(reversed(encoding))
+
+    def _is_pickup(self, vertices: np.ndarray) -> np.ndarray:
+        return (vertices >= self._num_carriers) & (vertices < self._num_carriers + self._num_requests)
+
+    def _add_individual(self, depot: int, encoding: Tuple[Tuple[int, ...], ...], distance: float):
+        """
+        store the individual as its giant tour, as well as the successor of each request among the pickups of its
+        tour (len(requests) for the last request of a tour), which defines the broken-pairs distance
+        """
+        row = self._size
+        giant_tour = [vertex for routing_sequence in encoding for vertex in (depot, *routing_sequence)][1:]
+        self._giant_tours[row] = -1
+        self._giant_tours[row, :len(giant_tour)] = giant_tour
+
+        self._successors[row] = len(self._request_index)
+        for routing_sequence in encoding:
+            pickups = [self._request_index[vertex - self._num_carriers] for vertex in routing_sequence
+                       if self._is_pickup(vertex)]
+            self._successors[row, pickups[:-1]] = pickups[1:]
+        self._distances[row] = distance
+        self._size += 1
+
+    def _permutation(self, row: int) -> np.ndarray:
+        """the requests in the order of their pickups in the giant tour"""
+        giant_tour = self._giant_tours[row]
+        return giant_tour[self._is_pickup(giant_tour)] - self._num_carriers
+
+    def _encoding(self, row: int) -> Tuple[Tuple[int, ...], ...]:
+        """the giant tour as carrier encoding, see CAHDSolution.carrier_encoding"""
+        giant_tour = self._giant_tours[row]
+        giant_tour = giant_tour[giant_tour != -1]
+        depots, = np.nonzero(giant_tour < self._num_carriers)
+        return tuple(tuple(int(vertex) for vertex in part[part >= self._num_carriers])
+                     for part in np.split(giant_tour, depots))
+
+    def _broken_pairs_distances(self) -> np.ndarray:
+        """(size, size) matrix of the share of requests whose successors differ, vectorized over all pairs"""
+        successors = self._successors[:self._size]
+        return (successors[:, None, :] != successors[None, :, :]).mean(axis=2)
+
+    def _biased_fitness(self, distances: np.ndarray) -> np.ndarray:
+        """
+        rank of the travel distance plus the weighted rank of the diversity contribution (average broken-pairs
+        distance to the num_close closest individuals), both normalized to [0, 1]. Lower is better
+        """
+        size = self._size
+        if size == 1:
+            return np.zeros(1)
+        num_close = min(self.parameters['num_close'], size - 1)
+        # the distance of each individual to itself is 0 and thus always the smallest one
+        contribution = np.sort(distances, axis=1)[:, 1:num_close + 1].mean(axis=1)
+        cost_rank = np.argsort(np.argsort(self._distances[:size], kind='stable'), kind='stable') / (size - 1)
+        diversity_rank = np.argsort(np.argsort(-contribution, kind='stable'), kind='stable') / (size - 1)
+        return cost_rank + (1 - self.parameters['num_elite'] / size) * diversity_rank
+
+    def _binary_tournament(self) -> int:
+        first, second = random.randrange(self._size), random.randrange(self._size)
+        fitness = self._biased_fitness(self._broken_pairs_distances())
+        return first if fitness[first] <= fitness[second] else second
+
+    def _select_survivors(self):
+        """remove individuals until population_size remain, clones first and otherwise the worst biased fitness"""
+        while self._size > self.parameters['population_size']:
+            distances = self._broken_pairs_distances()
+            fitness = self._biased_fitness(distances)
+            np.fill_diagonal(distances, np.inf)
+            clones, = np.nonzero(distances.min(axis=1) == 0)
+            candidates = clones if len(clones) > 0 else np.arange(self._size)
+            worst = int(candidates[np.argmax(fitness[candidates])])
+            # move the last individual into the freed row
+            last = self._size - 1
+            self._giant_tours[worst] = self._giant_tours[last]
+            self._successors[worst] = self._successors[last]
+            self._distances[worst] = self._distances[last]
+            self._size -= 1
+
+    def acceptance_criterion(self, instance: it.MDPDPTWInstance, move: tuple):
+        pass
 
     def stopping_criterion(self):
-        if time.time() - self.start_time < self.time_limit_per_carrier:
+        if not self.budget_exhausted() and not self.stopping_rule_met():
             return False
         else:
             return True
+
+
+class PDPTWParallelMultiStart(PDPTWMetaHeuristic):
+    """
+    Runs num_starts independent trajectories of the given metaheuristic per carrier with different seeds in parallel
+    worker processes and keeps the best carrier solution. All trajectories have the same budget (see set_budget).
+
+    Island model: if num_epochs > 1, the budget is split into epochs. After each epoch, every island sends its
+    elite carrier solution (as a checkpoint, see CAHDSolution.carrier_checkpoint) to its successor in a ring of
+    shared queues and continues from the received solution if that one is better than its own.
+
+    Daemonic processes (e.g. the workers of workflow.solve_instances_multiprocessing) are not allowed to have children
+    and run a single trajectory instead. It runs on a copy of the metaheuristic and leaves the random state of the
+    process as it was.
+    """
+
+    def __init__(self, neighborhoods: Sequence[nh.Neighborhood], time_limit_per_carrier: float,
+                 metaheuristic_class=PDPTWIteratedLocalSearch, num_starts: int = 4, num_epochs: int = 1):
+        """
+        :param metaheuristic_class: the PDPTWMetaHeuristic that is run on each island
+        :param num_starts: number of islands, i.e. of parallel trajectories and worker processes
+        :param num_epochs: number of migrations + 1. 1 means independent multi-start without migration
+        """
+        super().__init__(neighborhoods, time_limit_per_carrier)
+        self.metaheuristic = metaheuristic_class(neighborhoods, time_limit_per_carrier / num_epochs)
+        self.parameters['num_starts'] = num_starts
+        self.parameters['num_epochs'] = num_epochs
+        self.name = f'{self.__class__.__name__}{metaheuristic_class.__name__}'
+
+    def set_budget(self, budget_per_carrier: float, unit: str = 'wall_time'):
+        super().set_budget(budget_per_carrier, unit)
+        self.metaheuristic.set_budget(budget_per_carrier / self.parameters['num_epochs'], unit)
+
+    def add_stopping_rule(self, rule: sr.StoppingRule):
+        """the rule applies to each epoch of each island"""
+        super().add_stopping_rule(rule)
+        self.metaheuristic.add_stopping_rule(rule)
+
+    def execute(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
+                carrier_ids: List[int] = None) -> slt.CAHDSolution:
+        if multiprocessing.current_process().daemon:
+            # the island seeds the random module and the seed parameter of the metaheuristic, which must not affect
+            # the caller
+            random_state = random.getstate()
+            try:
+                return _island(deepcopy(self.metaheuristic), instance, solution, carrier_ids, 0,
+                               self.parameters['num_epochs'], 1, None, None)
+            finally:
+                random.setstate(random_state)
+
+        solution = deepcopy(solution)
+        if carrier_ids is None:
+            carrier_ids = [x.id_ for x in solution.carriers]
+
+        num_starts, num_epochs = self.parameters['num_starts'], self.parameters['num_epochs']
+        with multiprocessing.Manager() as manager, multiprocessing.Pool(num_starts) as pool:
+            for carrier_id in carrier_ids:
+                if num_epochs > 1:
+                    inboxes = [manager.Queue() for _ in range(num_starts)]
+                    outboxes = inboxes[1:] + inboxes[:1]
+                else:
+                    inboxes = outboxes = [None] * num_starts
+                # chunksize=1 makes sure that all islands of the carrier run concurrently and can exchange solutions
+                tasks = [(self.metaheuristic, instance, solution, [carrier_id], seed, num_epochs, num_starts,
+                          inboxes[seed], outboxes[seed]) for seed in range(num_starts)]
+                islands = pool.starmap(_island, tasks, chunksize=1)
+                best = max(islands, key=lambda x: x.carriers[carrier_id].objective())
+                solution.merge_carrier(best.carrier_checkpoint(carrier_id))
+        return solution
+
+    def acceptance_criterion(self, instance: it.MDPDPTWInstance, move: tuple):
+        pass
+
+    def stopping_criterion(self):
+        pass
+
+
+def _island(metaheuristic: PDPTWMetaHeuristic, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution,
+            carrier_ids: List[int], seed: int, num_epochs: int, num_islands: int, inbox, outbox) -> slt.CAHDSolution:
+    """
+    a single trajectory of PDPTWParallelMultiStart. Between two epochs, each carrier's solution is sent to the outbox
+    as (epoch, carrier_id, objective, checkpoint) and replaced by the neighboring island's solution of the same epoch
+    from the inbox if that one is better. The neighbor's epoch takes about as long as this island's epoch, so the
+    island waits at most twice as long for it (e.g. if the neighbor has failed) and continues without migration.
+    Solutions of earlier epochs that arrive after that are dropped.
+
+    The metaheuristic is modified and the random module is seeded, i.e. the caller must pass a copy and restore the
+    random state if the island runs in the calling process.
+
+    :param inbox: multiprocessing queue, None if the islands do not migrate
+    :param outbox: multiprocessing queue, None if the islands do not migrate
+    """
+    # most metaheuristics draw from the random module
+    random.seed(seed)
+    early_migrants = dict()  # (epoch, carrier_id) -> (objective, checkpoint) that arrived before they were awaited
+    for epoch in range(num_epochs):
+        if 'seed' in metaheuristic.parameters:  # metaheuristics that re-seed on every execution
+            metaheuristic.parameters['seed'] = seed + epoch * num_islands
+        epoch_start = time.time()
+        solution = metaheuristic.execute(instance, solution, carrier_ids)
+
+        if outbox is None or epoch == num_epochs - 1:
+            continue
+        for carrier_id in carrier_ids:
+            outbox.put((epoch, carrier_id, solution.carriers[carrier_id].objective(),
+                        solution.carrier_checkpoint(carrier_id)))
+        deadline = time.time() + max(10., 2 * (time.time() - epoch_start))
+        for carrier_id in carrier_ids:
+            migrant = early_migrants.pop((epoch, carrier_id), None)
+            while migrant is None:
+                try:
+                    message = inbox.get(timeout=max(0., deadline - time.time()))
+                except queue.Empty:
+                    break
+                if message[:2] == (epoch, carrier_id):
+                    migrant = message[2:]
+                elif message[:2] > (epoch, carrier_id):
+                    # the neighbor has sent its solutions in order, i.e. the awaited one is not going to arrive
+                    early_migrants[message[:2]] = message[2:]
+                    break
+            if migrant is not None and migrant[0] > solution.carriers[carrier_id].objective():
+                solution.merge_carrier(migrant[1])
+    return solution
@@ -1,7 +1,11 @@
+import heapq
+import itertools
 import logging
+import random
 from abc import ABC, abstractmethod
-from copy import deepcopy
-from typing import final
+from typing import final, List, Union, Dict, Tuple, Callable
+
+import numpy as np
 
 from core_module import instance as it, solution as slt, tour as tr
 
@@ -12,23 +16,353 @@ class Neighborhood(ABC):
     def __init__(self):
         self.name = self.__class__.__name__
 
-    @abstractmethod
-    def feasible_move_generator_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution):
+        # don't-look bits (Bentley, J.J. (1992). Fast Algorithms for Geometric Traveling Salesman Problems. ORSA
+        # Journal on Computing, 4(4), 387–411. https://doi.org/10.1287/ijoc.4.4.387): requests for which the last scan
+        # did not find a move that was accepted, stamped with the tours of the request's neighborhood (its own tour and
+        # the target tours) and their versions at that time, see _dont_look_stamp. A bit is only valid as long as the
+        # request is still routed in the same tour and none of these tours has been modified, i.e. bits are invalidated
+        # by any modification (moves of other neighborhoods, perturbations, ...) without any bookkeeping
+        self.dont_look_bits: Dict[int, Tuple[Tuple[tr.Tour, int], ...]] = dict()
+        self._scan_request: Union[None, int] = None  # request that is currently being scanned
+        self._resume_request: Union[None, int] = None  # request in whose scan the last move was executed
+
+        # best move per (request, target tour id), stored together with the two tours and their versions at the time
+        # of evaluation and the bound that was used for pruning the evaluation:
+        # (tour, tour_version, target_tour, target_tour_version, best_move, bound). If best_move is None, there is no
+        # feasible move with a delta below bound
+        self._move_cache: Dict[Tuple[int, int], Tuple[tr.Tour, int, tr.Tour, int, Union[None, tuple], float]] = dict()
+
+        # number of candidate moves whose feasibility has been checked, a machine-independent measure of the work of a
+        # search (see PDPTWMetaHeuristic.set_budget). Partial checks within the candidate generation, e.g. of single
+        # insertions, are not counted
+        self.num_move_evaluations = 0
+
+    def feasible_move_generator_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                            threshold: float = float('inf')):
         """
+        using a generator (i.e. "yield" instead of "return") avoids unnecessary move evaluations. E.g., in a first
+        improvement scenario, it is not necessary to evaluate (or even define) the complete neighborhood, finding a
+        single, feasible and improving move is sufficient here.
+
+        :param threshold: only moves with a delta strictly smaller than the threshold are generated, e.g. 0 if only
+        improving moves can be accepted. Candidates are discarded based on their delta before checking feasibility
         :return: generator that returns the next found move upon calling the next() method on it. Each move is a
         tuple containing all necessary information to see whether to accept that move and the information to execute
         a move. The first element of that tuple is always the delta *IN TRAVEL DISTANCE*.
         """
+        for tour in carrier.tours:
+            for request in self._requests_in_routing_order(instance, tour):
+                yield from self.feasible_move_generator_for_request(instance, carrier, tour, request, threshold)
+
+    @final
+    def feasible_move_generator_for_request(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                            tour: tr.Tour, request: int, threshold: float = float('inf')):
+        """
+        generator for all feasible moves that are anchored at the given request, which is currently routed in tour.
+        The neighborhood of a carrier is the union of the neighborhoods of all its requests.
+
+        :param carrier: the carrier owning the tour. May be None for intra-tour neighborhoods
+        :param threshold: only moves with a delta strictly smaller than the threshold are generated
+        """
+        for target_tour in self._target_tours(carrier, tour):
+            yield from self.feasible_move_generator_for_request_and_target(instance, carrier, tour, request,
+                                                                           target_tour, threshold)
+
+    @final
+    def feasible_move_generator_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                                       tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                                       threshold: float = float('inf')):
+        """
+        generator for all feasible moves that are anchored at the given request (currently routed in tour) and that
+        alter the target_tour.
+
+        :param threshold: only moves with a delta strictly smaller than the threshold are generated
+        """
+        for move in self.move_generator_for_request_and_target(instance, carrier, tour, request, target_tour,
+                                                               threshold):
+            self.num_move_evaluations += 1
+            if self.feasibility_check(instance, move):
+                yield move
+
+    @abstractmethod
+    def move_generator_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                              tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                              threshold: float = float('inf')):
+        """
+        generator for all candidate moves that are anchored at the given request (currently routed in tour) and that
+        alter the target_tour. Candidates carry their distance delta but have NOT been checked for feasibility yet,
+        such that callers can skip the (expensive) check for candidates that cannot be accepted anyway. The moves must
+        not depend on any tour other than tour and target_tour, which allows caching them based on the tours' versions.
+
+        :param threshold: only candidates with a delta strictly smaller than the threshold must be generated.
+        Implementations should use lower bounds on the delta to skip groups of candidates that cannot beat it.
+        """
         pass
 
     @abstractmethod
+    def _target_tours(self, carrier: slt.AHDSolution, tour: tr.Tour) -> List[tr.Tour]:
+        """
+        :return: the tours that are considered as targets for moves of requests that are currently routed in tour
+        """
+        pass
+
+    @final
+    def best_feasible_move_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                                  tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                                  bound: float = float('inf')):
+        """
+        running minimum over the candidate moves, without materializing them. The feasibility check is skipped for all
+        candidates whose delta is not smaller than the best feasible delta found so far (initially: bound).
+
+        :return: the best feasible move with a delta smaller than bound or None if no such move exists
+        """
+        best_move = None
+        for move in self.move_generator_for_request_and_target(instance, carrier, tour, request, target_tour, bound):
+            if move[0] < bound:
+                self.num_move_evaluations += 1
+                if self.feasibility_check(instance, move):
+                    best_move = move
+                    bound = move[0]
+        return best_move
+
+    def best_feasible_move_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                       threshold: float = float('inf')):
+        """
+        The best feasible move of the carrier's neighborhood, or None if there is no feasible move with a delta
+        smaller than threshold (e.g. 0 for steepest descent). For every (request,
+        target tour) combination, the best move is cached together with the versions of the request's tour and the
+        target tour. Thus, after executing a move, only the combinations that involve one of the modified tours must be
+        re-evaluated. Combinations that must be evaluated are pruned by the best delta that has been found so far.
+
+        The cache only holds references to tours that have been evaluated. clear_move_cache should be called once the
+        search is finished to release them.
+        """
+        best_move = None
+        for tour in carrier.tours:
+            for request in self._requests_in_routing_order(instance, tour):
+                for target_tour in self._target_tours(carrier, tour):
+                    bound = best_move[0] if best_move is not None else threshold
+                    move = self._cached_best_move(instance, carrier, tour, request, target_tour, bound)
+                    if move is not None and move[0] < bound:
+                        best_move = move
+        return best_move
+
+    def clear_move_cache(self):
+        self._move_cache.clear()
+
+    @final
+    def _cached_best_move(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution, tour: tr.Tour, request: int,
+                          target_tour: tr.Tour, bound: float = float('inf')):
+        """
+        :return: the best feasible move of the (request, target tour) combination if its delta is smaller than bound.
+        Otherwise, either None or a move that is not better than bound is returned.
+        """
+        key = (request, target_tour.id_)
+        entry = self._move_cache.get(key)
+        if entry is not None:
+            cached_tour, cached_version, cached_target_tour, cached_target_version, move, cached_bound = entry
+            # compare the identity, too: copies of a tour share the id and the version
+            if cached_tour is tour and cached_version == tour.version and \
+                    cached_target_tour is target_tour and cached_target_version == target_tour.version:
+                # a cached move is the true best move. If none was cached, there is no move below the cached bound
+                if move is not None or bound <= cached_bound:
+                    return move
+
+        move = self.best_feasible_move_for_request_and_target(instance, carrier, tour, request, target_tour, bound)
+        self._move_cache[key] = (tour, tour.version, target_tour, target_tour.version, move, bound)
+        return move
+
+    def best_admissible_move_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                         admissible: Callable[[tuple], bool], threshold: float = float('inf')):
+        """
+        same as best_feasible_move_for_carrier, but only moves for which admissible(move) is True are considered,
+        e.g. moves that are not tabu. The cached best move of a (request, target tour) combination is used whenever it
+        is admissible. Only combinations whose best move is not admissible are searched again, which is expected to
+        be rare, i.e. the cost is comparable to that of best_feasible_move_for_carrier.
+        """
+        best_move = None
+        for tour in carrier.tours:
+            for request in self._requests_in_routing_order(instance, tour):
+                for target_tour in self._target_tours(carrier, tour):
+                    bound = best_move[0] if best_move is not None else threshold
+                    move = self._cached_best_move(instance, carrier, tour, request, target_tour, bound)
+                    if move is None or move[0] >= bound:
+                        continue  # no feasible move beats the bound, admissible or not
+                    if not admissible(move):
+                        move = self._best_admissible_move_for_request_and_target(instance, carrier, tour, request,
+                                                                                 target_tour, admissible, bound)
+                    if move is not None:
+                        best_move = move
+        return best_move
+
+    @final
+    def _best_admissible_move_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                                     tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                                     admissible: Callable[[tuple], bool],
+                                                     bound: float = float('inf')):
+        """same as best_feasible_move_for_request_and_target, restricted to moves for which admissible(move) is True"""
+        best_move = None
+        for move in self.move_generator_for_request_and_target(instance, carrier, tour, request, target_tour, bound):
+            if move[0] < bound and admissible(move):
+                self.num_move_evaluations += 1
+                if self.feasibility_check(instance, move):
+                    best_move = move
+                    bound = move[0]
+        return best_move
+
+    def random_feasible_move_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution, rng=random):
+        """
+        a uniformly random feasible move of the carrier's neighborhood (or None if there is no feasible move). Uses
+        reservoir sampling (Vitter, J.S. (1985). Random sampling with a reservoir. ACM Transactions on Mathematical
+        Software, 11(1), 37–57. https://doi.org/10.1145/3147.3165), i.e. moves are not materialized.
+
+        :param rng: source of randomness, e.g. a random.Random instance. Defaults to the random module
+        """
+        sampled_move = None
+        num_feasible_moves = 0
+        for move in self.feasible_move_generator_for_carrier(instance, carrier):
+            num_feasible_moves += 1
+            # replace the sampled move with probability 1/num_feasible_moves
+            if rng.random() * num_feasible_moves < 1:
+                sampled_move = move
+        return sampled_move
+
+    def sample_feasible_move(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution, rng=random):
+        """
+        a random feasible move of the carrier's neighborhood (or None if there is no feasible move), drawn by
+        rejection sampling: a random (request, target tour) anchor is drawn, then one of its candidate moves (which
+        are generated without feasibility checks). Infeasible candidates are rejected. If a fraction p of the draws
+        yields a feasible candidate, 1/p draws are expected, each costing one candidate generation and one feasibility
+        check. Enumerating the neighborhood costs one candidate generation per anchor and one check per candidate. Once
+        the rejections have cost as much as an enumeration (with the number of candidates estimated from the anchors
+        drawn so far), the sample is drawn from the enumerated feasible neighborhood instead, see
+        random_feasible_move_for_carrier. Thus, sampling costs at most about twice as much as enumerating, and
+        neighborhoods without any feasible move are handled, too.
+
+        Contrary to random_feasible_move_for_carrier, moves are not sampled uniformly: each anchor is equally likely,
+        regardless of its number of moves.
+
+        :param rng: source of randomness, e.g. a random.Random instance. Defaults to the random module
+        """
+        anchors = [(tour, request, target_tour)
+                   for tour in carrier.tours
+                   for request in tour.requests
+                   for target_tour in self._target_tours(carrier, tour)]
+        if not anchors:
+            return None
+
+        num_rejections = 0
+        num_candidates = 0  # total number of candidates of the drawn anchors
+        while True:
+            tour, request, target_tour = rng.choice(anchors)
+            candidates = list(self.move_generator_for_request_and_target(instance, carrier, tour, request,
+                                                                          target_tour))
+            if candidates:
+                move = rng.choice(candidates)
+                self.num_move_evaluations += 1
+                if self.feasibility_check(instance, move):
+                    return move
+            num_rejections += 1
+            num_candidates += len(candidates)
+            # num_rejections >= len(anchors) * (1 + estimated number of candidates per anchor)
+            if num_rejections * num_rejections >= len(anchors) * (num_rejections + num_candidates):
+                break
+
+        return self.random_feasible_move_for_carrier(instance, carrier, rng)
+
+    @final
+    def dont_look_move_generator_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                             threshold: float = float('inf')):
+        """
+        Same moves as feasible_move_generator_for_carrier but for first improvement search: requests are scanned in a
+        circular fashion, starting at the request in whose scan the last move was executed, i.e. a new generator
+        resumes where the previous one found its improvement. Requests with a valid don't-look bit are skipped. Once
+        all moves of a request are exhausted without any of them being executed, the request's don't-look bit is set.
+
+        The bits remain valid across calls (and across modifications of tours outside the requests' neighborhoods),
+        which allows resuming the search after e.g. a perturbation. They may be reset (see reset_dont_look_bits) to
+        start a search from scratch.
+
+        :param threshold: only moves with a delta strictly smaller than the threshold are generated
+        """
+        scan = [(tour, request)
+                for tour in carrier.tours
+                for request in self._requests_in_routing_order(instance, tour)]
+        start = next((idx for idx, (_, request) in enumerate(scan) if request == self._resume_request), 0)
+
+        for idx in range(len(scan)):
+            tour, request = scan[(start + idx) % len(scan)]
+            stamp = self.dont_look_bits.get(request)
+            if stamp is not None and stamp == self._dont_look_stamp(carrier, tour):
+                continue
+            self._scan_request = request
+            yield from self.feasible_move_generator_for_request(instance, carrier, tour, request, threshold)
+            # the caller kept asking for moves, i.e. none of this request's moves were executed
+            self.dont_look_bits[request] = self._dont_look_stamp(carrier, tour)
+
+    def _dont_look_stamp(self, carrier: slt.AHDSolution, tour: tr.Tour) -> Tuple[Tuple[tr.Tour, int], ...]:
+        """
+        the tours on which the moves of a request that is routed in tour depend, i.e. the tour itself and the target
+        tours, together with their versions. Tours are compared by identity (Tour does not define __eq__), since copies
+        of a tour share the id and the version. A different set of target tours, e.g. after a tour has been dropped,
+        gives a different stamp, too
+        """
+        return ((tour, tour.version),) + tuple((target_tour, target_tour.version)
+                                              for target_tour in self._target_tours(carrier, tour)
+                                              if target_tour is not tour)
+
+    def reset_dont_look_bits(self):
+        self.dont_look_bits.clear()
+        self._scan_request = None
+        self._resume_request = None
+
+    def dont_look_checkpoint(self) -> Dict[int, Tuple[Tuple[tr.Tour, int], ...]]:
+        """a snapshot of the don't-look bits, to be taken together with a carrier checkpoint, see
+        restore_dont_look_bits"""
+        return self.dont_look_bits.copy()
+
+    def restore_dont_look_bits(self, checkpoint: Dict[int, Tuple[Tuple[tr.Tour, int], ...]]):
+        """
+        brings back the bits of a dont_look_checkpoint after the carrier has been restored to the state of the same
+        time (see CAHDSolution.restore_carrier), e.g. after a rejected perturbation. The tours are restored in place and
+        with their versions, thus these bits are valid again, while the bits that were set since refer to versions that
+        do not exist anymore. Only the requests that had no valid bit at the time of the checkpoint are re-scanned.
+        """
+        self.dont_look_bits.update(checkpoint)
+
+    @final
     def execute_move(self, instance: it.MDPDPTWInstance, move: tuple):
         """
-        Executes the neighbourhood move in place.
+        Executes the neighbourhood move in place. The don't-look bits of all requests whose neighborhood contains a
+        modified tour become invalid since the tours' versions change.
 
         :param move: tuple containing all necessary information to execute a move. The first element of that tuple is
          always the delta in travel distance. the remaining ones are e.g. current positions and new insertion positions.
         """
+        self._execute_move(instance, move)
+        self._resume_request = self._scan_request
+
+    @abstractmethod
+    def _execute_move(self, instance: it.MDPDPTWInstance, move: tuple):
+        pass
+
+    @abstractmethod
+    def modified_tours(self, move: tuple) -> List[tr.Tour]:
+        """
+        :return: the tours that are altered when executing the move
+        """
+        pass
+
+    @abstractmethod
+    def move_attributes(self, instance: it.MDPDPTWInstance,
+                        move: tuple) -> List[Tuple[int, tr.Tour, int, tr.Tour, int]]:
+        """
+        the requests that are relocated by the move, e.g. for attribute-based memories such as a tabu list. Must be
+        called before the move is executed. Positions are approximate: they may refer to the tours before or after
+        the removal of the move's requests.
+
+        :return: (request, old tour, old pickup position, new tour, new pickup position) for each relocated request
+        """
         pass
 
     @abstractmethod
@@ -44,48 +378,78 @@ class Neighborhood(ABC):
         """
         pass
 
+    @staticmethod
+    def _requests_in_routing_order(instance: it.MDPDPTWInstance, tour: tr.Tour) -> List[int]:
+        """the tour's requests in the order in which their pickup vertices are visited"""
+        return [instance.request_from_vertex(vertex) for vertex in tour.routing_sequence[1:-1]
+                if instance.vertex_type(vertex) == 'pickup']
+
+    @staticmethod
+    def _cheapest_feasible_insertion(deltas: np.ndarray, bound: float, feasibility_check):
+        """
+        the cheapest insertion of an insertion-delta matrix (see tr.pickup_delivery_insertion_distance_deltas) that is
+        cheaper than bound and that passes feasibility_check(pickup_pos, delivery_pos). Candidates are checked in
+        ascending order of their delta, i.e. the search stops at the first feasible one.
+
+        :return: (delta, pickup_pos, delivery_pos) or None if no such insertion exists
+        """
+        pickup_positions, delivery_positions = np.nonzero(deltas < bound)
+        candidate_deltas = deltas[pickup_positions, delivery_positions]
+        for idx in np.argsort(candidate_deltas, kind='stable'):
+            pickup_pos, delivery_pos = int(pickup_positions[idx]), int(delivery_positions[idx])
+            if feasibility_check(pickup_pos, delivery_pos):
+                return candidate_deltas[idx], pickup_pos, delivery_pos
+        return None
+
 
 # =====================================================================================================================
 # INTRA-TOUR NEIGHBORHOOD
 # =====================================================================================================================
 class IntraTourNeighborhood(Neighborhood, ABC):
     @final
-    def feasible_move_generator_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution):
-        """
-        using a generator (i.e. "yield" instead of "return") avoids unnecessary move evaluations. E.g., in a first
-        improvement scenario, it is not necessary to evaluate (or even define) the complete neighborhood, finding a
-        single, feasible and improving move is sufficient here.
-
-        :param instance:
-        :param carrier:
-        :return:
-        """
-        for tour in carrier.tours:
-            yield from self.feasible_move_generator_for_tour(instance, tour)  # delegated generator
-
-    @abstractmethod
     def feasible_move_generator_for_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour):
         """
+        generator for all feasible moves of a single tour that does not necessarily belong to a carrier
 
         :param instance:
         :param tour:
         :return:
         """
-        pass
+        for request in self._requests_in_routing_order(instance, tour):
+            yield from self.feasible_move_generator_for_request(instance, None, tour, request)
 
     @abstractmethod
     def feasibility_check(self, instance: it.MDPDPTWInstance, move):
         pass
 
+    @final
+    def _target_tours(self, carrier: slt.AHDSolution, tour: tr.Tour) -> List[tr.Tour]:
+        return [tour]
+
+    @final
+    def modified_tours(self, move: tuple) -> List[tr.Tour]:
+        # moves of intra-tour neighborhoods always store the tour as their second element
+        return [move[1]]
+
     @final
     def first_feasible_move_for_tour(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, tour_: tr.Tour):
         raise NotImplementedError
         pass
 
     @final
-    def best_feasible_move_for_tour(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, tour_: tr.Tour):
-        raise NotImplementedError
-        pass
+    def best_feasible_move_for_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour,
+                                    threshold: float = float('inf')):
+        """
+        the best feasible move of a single tour (that does not necessarily belong to a carrier), or None if there is
+        no feasible move with a delta smaller than threshold. Uses the same cache as best_feasible_move_for_carrier
+        """
+        best_move = None
+        for request in self._requests_in_routing_order(instance, tour):
+            bound = best_move[0] if best_move is not None else threshold
+            move = self._cached_best_move(instance, None, tour, request, tour, bound)
+            if move is not None and move[0] < bound:
+                best_move = move
+        return best_move
 
 
 class PDPMove(IntraTourNeighborhood):
@@ -94,60 +458,46 @@ class PDPMove(IntraTourNeighborhood):
     move = (delta, tour_, old_pickup_pos, old_delivery_pos, pickup, delivery, new_pickup_pos, new_delivery_pos)
     """
 
-    def feasible_move_generator_for_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour):
-        tour_copy = deepcopy(tour)
-        # test all requests
-        for old_pickup_pos in range(1, len(tour_copy) - 2):
-            vertex = tour_copy.routing_sequence[old_pickup_pos]
-
-            # skip if its a delivery vertex
-            if instance.vertex_type(vertex) == "delivery":
-                continue
-
-            pickup, delivery = instance.pickup_delivery_pair(instance.request_from_vertex(vertex))
-            old_delivery_pos = tour_copy.vertex_pos[delivery]
-
-            delta = 0
-
-            # savings of removing the pickup and delivery
-            delta += tour_copy.pop_distance_delta(instance, (old_pickup_pos, old_delivery_pos))
-
-            # pop
-            tour_copy.pop_and_update(instance, (old_pickup_pos, old_delivery_pos))
-
-            # check all possible new insertions for pickup and delivery vertex of the request
-            for new_pickup_pos in range(1, len(tour_copy)):
-                for new_delivery_pos in range(new_pickup_pos + 1, len(tour_copy) + 1):
-                    if new_pickup_pos == old_pickup_pos and new_delivery_pos == old_delivery_pos:
-                        continue
-
-                    # cost for inserting request vertices in the new positions
-                    insertion_distance_delta = tour_copy.insert_distance_delta(instance,
-                                                                                [new_pickup_pos, new_delivery_pos],
-                                                                                [pickup, delivery])
-                    delta += insertion_distance_delta
-
-                    move = (delta, tour_copy, old_pickup_pos, old_delivery_pos, pickup, delivery, new_pickup_pos,
-                            new_delivery_pos)
-
-                    # yield move (with the original tour_, not the copy) if it's feasible
-                    if self.feasibility_check(instance, move):
-                        move = (delta, tour, old_pickup_pos, old_delivery_pos, pickup, delivery, new_pickup_pos,
-                                new_delivery_pos)
-                        yield move
-
-                    # restore delta before checking the next insertion positions
-                    delta -= insertion_distance_delta
-
-            # repair the copy before checking the next request for repositioning
-            tour_copy.insert_and_update(instance, (old_pickup_pos, old_delivery_pos), (pickup, delivery))
+    def move_generator_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                              tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                              threshold: float = float('inf')):
+        pickup, delivery = instance.pickup_delivery_pair(request)
+        old_pickup_pos = tour.vertex_pos[pickup]
+        old_delivery_pos = tour.vertex_pos[delivery]
+
+        # savings of removing the pickup and delivery. Since distances satisfy the triangle inequality, insertion
+        # deltas are non-negative, i.e. the removal delta is a lower bound for all moves of this request
+        removal_delta = tour.pop_distance_delta(instance, (old_pickup_pos, old_delivery_pos))
+        if removal_delta >= threshold:
+            return
+
+        # cost for inserting request vertices in all possible positions of the routing sequence without the request.
+        # The tour itself is neither copied nor modified
+        routing_sequence = [vertex for vertex in tour.routing_sequence if vertex != pickup and vertex != delivery]
+        deltas = removal_delta + tr.pickup_delivery_insertion_distance_deltas(routing_sequence,
+                                                                              instance.distance_matrix,
+                                                                              pickup, delivery)
+        # re-inserting at the current positions is no move
+        deltas[old_pickup_pos, old_delivery_pos] = np.inf
+
+        # row-major order, i.e. the same order as looping over pickup positions and then delivery positions
+        for new_pickup_pos, new_delivery_pos in zip(*np.nonzero(deltas < threshold)):
+            yield deltas[new_pickup_pos, new_delivery_pos], tour, old_pickup_pos, old_delivery_pos, pickup, delivery, \
+                  int(new_pickup_pos), int(new_delivery_pos)
 
     def feasibility_check(self, instance: it.MDPDPTWInstance, move: tuple):
         delta, tour, old_pickup_pos, old_delivery_pos, pickup, delivery, new_pickup_pos, new_delivery_pos = move
         assert delivery == pickup + instance.num_requests
-        return tour.insertion_feasibility_check(instance, [new_pickup_pos, new_delivery_pos], [pickup, delivery])
+        return tour.pop_insert_feasibility_check(instance,
+                                                 [old_pickup_pos, old_delivery_pos],
+                                                 [new_pickup_pos, new_delivery_pos],
+                                                 [pickup, delivery])
+
+    def move_attributes(self, instance: it.MDPDPTWInstance, move: tuple):
+        delta, tour, old_pickup_pos, old_delivery_pos, pickup, delivery, new_pickup_pos, new_delivery_pos = move
+        return [(instance.request_from_vertex(pickup), tour, old_pickup_pos, tour, new_pickup_pos)]
 
-    def execute_move(self, instance: it.MDPDPTWInstance, move):
+    def _execute_move(self, instance: it.MDPDPTWInstance, move):
         delta, tour, old_pickup_pos, old_delivery_pos, pickup, delivery, new_pickup_pos, new_delivery_pos = move
 
         # remove
@@ -165,41 +515,59 @@ class PDPMove(IntraTourNeighborhood):
 
 class PDPTwoOpt(IntraTourNeighborhood):
     """
-    The classic 2-opt neighborhood by Croes (1958)
+    The classic 2-opt neighborhood by Croes (1958). A move (delta, tour, i, j) reverses the section i+1 ... j. Moves
+    are anchored at the request whose pickup or delivery vertex is the first one of the reversed section.
     """
 
-    def feasible_move_generator_for_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour):
-        # iterate over all moves
-        for i in range(0, len(tour) - 3):
-            for j in range(i + 2, len(tour) - 1):
-                # computing the distance delta assumes symmetric distances
-                delta = 0
-
-                # savings of removing the edges (i, i+1) and (j, j+1)
-                delta -= instance.distance([tour.routing_sequence[i], tour.routing_sequence[j]],
-                                           [tour.routing_sequence[i + 1], tour.routing_sequence[j + 1]])
-
-                # cost of adding the edges (i, j) and (i+1, j+1)
-                delta += instance.distance([tour.routing_sequence[i], tour.routing_sequence[i + 1]],
-                                           [tour.routing_sequence[j], tour.routing_sequence[j + 1]])
-
-                move = (delta, tour, i, j)
-
-                if self.feasibility_check(instance, move):
-                    yield move
+    def __init__(self):
+        super().__init__()
+        # (tour, tour_version, i, summaries of the reversed sections i+1, ..., j) of the most recently checked i. All
+        # candidates of an anchor share i, thus the summaries are extended incrementally up to the largest checked j
+        self._reversed_sections: Union[None, Tuple[tr.Tour, int, int, List[tuple]]] = None
+        # (tour, tour_version, distance deltas of all reversals, see tr.reversal_distance_deltas)
+        self._reversal_deltas: Union[None, Tuple[tr.Tour, int, np.ndarray]] = None
+
+    def move_generator_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                              tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                              threshold: float = float('inf')):
+        deltas = self._reversal_delta_matrix(instance, tour)
+        for vertex in instance.pickup_delivery_pair(request):
+            i = tour.vertex_pos[vertex] - 1
+            # only candidates below the threshold, in ascending order of their delta
+            candidate_j, = np.nonzero(deltas[i] < threshold)
+            for j in candidate_j[np.argsort(deltas[i, candidate_j], kind='stable')]:
+                yield deltas[i, j], tour, i, int(j)
+
+    def _reversal_delta_matrix(self, instance: it.MDPDPTWInstance, tour: tr.Tour):
+        """the distance deltas of all reversals of the tour. Computed once per tour version"""
+        memo = self._reversal_deltas
+        if memo is None or memo[0] is not tour or memo[1] != tour.version:
+            memo = (tour, tour.version, tour.reversal_distance_deltas(instance))
+            self._reversal_deltas = memo
+        return memo[2]
+
+    def clear_move_cache(self):
+        super().clear_move_cache()
+        self._reversed_sections = None
+        self._reversal_deltas = None
 
     def feasibility_check(self, instance: it.MDPDPTWInstance, move):
         tour: tr.Tour
         delta, tour, i, j = move
 
-        # create a copy to check feasibility
-        pop_indices = list(range(i + 1, j + 1))
-        popped = tour.pop_and_update(instance, pop_indices)
-        feasibility = tour.insertion_feasibility_check(instance, range(i + 1, j + 1), list(reversed(popped)))
-        tour.insert_and_update(instance, pop_indices, popped)
-        return feasibility
+        memo = self._reversed_sections
+        if memo is None or memo[0] is not tour or memo[1] != tour.version or memo[2] != i:
+            memo = (tour, tour.version, i, [])
+            self._reversed_sections = memo
+        return tour.reversal_feasibility_check(instance, i, j, memo[3])
 
-    def execute_move(self, instance: it.MDPDPTWInstance, move):
+    def move_attributes(self, instance: it.MDPDPTWInstance, move: tuple):
+        # each request has at most one vertex in the reversed section, which is mirrored
+        delta, tour, i, j = move
+        return [(instance.request_from_vertex(tour.routing_sequence[pos]), tour, pos, tour, i + 1 + j - pos)
+                for pos in range(i + 1, j + 1)]
+
+    def _execute_move(self, instance: it.MDPDPTWInstance, move):
         delta, tour, i, j = move
 
         logger.debug(f'PDPTwoOpt: [{delta}] Reverse section between {i} and {j}')
@@ -213,66 +581,111 @@ class PDPTwoOpt(IntraTourNeighborhood):
 # INTER-TOUR NEIGHBORHOOD
 # =====================================================================================================================
 class InterTourNeighborhood(Neighborhood, ABC):
+    def __init__(self):
+        super().__init__()
+        # memoized distance deltas, stored with the tour and its version at the time of computation:
+        # request -> (tour, tour_version, removal delta),
+        # (request, target tour id) -> (target_tour, target_tour_version, matrix of insertion deltas) and
+        # (request, tour id, ejected request) -> (tour, tour_version, insertion deltas of the request into the tour
+        # without the ejected request)
+        self._removal_deltas: Dict[int, Tuple[tr.Tour, int, float]] = dict()
+        self._insertion_deltas: Dict[Tuple[int, int], Tuple[tr.Tour, int, np.ndarray]] = dict()
+        self._ejection_insertion_deltas: Dict[Tuple[int, int, int], Tuple[tr.Tour, int, np.ndarray]] = dict()
+
     @abstractmethod
-    def feasible_move_generator_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution):
+    def move_generator_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                              tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                              threshold: float = float('inf')):
         """
         :return: tuple containing all necessary information to see whether to accept a move and the information to
         execute a move. The first element must be the delta in travel distance.
         """
         pass
 
+    def _target_tours(self, carrier: slt.AHDSolution, tour: tr.Tour) -> List[tr.Tour]:
+        # skip the current tour, there are intra-tour neighborhoods for that option
+        return [target_tour for target_tour in carrier.tours if target_tour is not tour]
+
     @abstractmethod
     def feasibility_check(self, instance: it.MDPDPTWInstance, move):
         pass
 
+    def clear_move_cache(self):
+        super().clear_move_cache()
+        self._removal_deltas.clear()
+        self._insertion_deltas.clear()
+        self._ejection_insertion_deltas.clear()
+
+    def _removal_delta(self, instance: it.MDPDPTWInstance, tour: tr.Tour, request: int):
+        """the (memoized) distance delta of removing the request from its tour"""
+        memo = self._removal_deltas.get(request)
+        if memo is None or memo[0] is not tour or memo[1] != tour.version:
+            pop_indices = [tour.vertex_pos[vertex] for vertex in instance.pickup_delivery_pair(request)]
+            memo = (tour, tour.version, tour.pop_distance_delta(instance, pop_indices))
+            self._removal_deltas[request] = memo
+        return memo[2]
+
+    def _insertion_delta_matrix(self, instance: it.MDPDPTWInstance, tour: tr.Tour, request: int):
+        """
+        the (memoized) distance deltas of inserting the request into the tour, see
+        Tour.insert_pickup_delivery_distance_deltas
+        """
+        key = (request, tour.id_)
+        memo = self._insertion_deltas.get(key)
+        if memo is None or memo[0] is not tour or memo[1] != tour.version:
+            pickup, delivery = instance.pickup_delivery_pair(request)
+            memo = (tour, tour.version, tour.insert_pickup_delivery_distance_deltas(instance, pickup, delivery))
+            self._insertion_deltas[key] = memo
+        return memo[2]
+
+    def _ejection_insertion_delta_matrix(self, instance: it.MDPDPTWInstance, tour: tr.Tour, request: int,
+                                         ejected: Union[None, int]):
+        """
+        the (memoized) distance deltas of inserting the request into the tour after the ejected request has been
+        removed from it, see tr.pickup_delivery_insertion_distance_deltas
+        """
+        if ejected is None:
+            return self._insertion_delta_matrix(instance, tour, request)
+        key = (request, tour.id_, ejected)
+        memo = self._ejection_insertion_deltas.get(key)
+        if memo is None or memo[0] is not tour or memo[1] != tour.version:
+            ejected_vertices = instance.pickup_delivery_pair(ejected)
+            routing_sequence = [vertex for vertex in tour.routing_sequence if vertex not in ejected_vertices]
+            memo = (tour, tour.version, tr.pickup_delivery_insertion_distance_deltas(
+                routing_sequence, instance.distance_matrix, *instance.pickup_delivery_pair(request)))
+            self._ejection_insertion_deltas[key] = memo
+        return memo[2]
+
 
 class PDPRelocate(InterTourNeighborhood):
     """
     Take one PD request at a time and see whether inserting it into another tour is cheaper.
     """
 
-    def feasible_move_generator_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution):
-        # raise NotImplementedError
-
-        for old_tour in carrier.tours:
-
-            # check all requests of the old tour
-            for old_pickup_pos in range(1, len(old_tour) - 2):
-                vertex = old_tour.routing_sequence[old_pickup_pos]
-
-                # skip if its a delivery vertex
-                if instance.vertex_type(vertex) == "delivery":
-                    continue  # skip if its a delivery vertex
-
-                pickup, delivery = instance.pickup_delivery_pair(instance.request_from_vertex(vertex))
-                old_delivery_pos = old_tour.vertex_pos[delivery]
-
-                # check all new tours for re-insertion
-                for new_tour in carrier.tours:
-
-                    # skip the current tour, there is PDPMove for that option
-                    if new_tour is old_tour:
-                        continue
-
-                    # check all possible new insertions for pickup and delivery vertex of the request
-                    for new_pickup_pos in range(1, len(new_tour)):
-                        for new_delivery_pos in range(new_pickup_pos + 1, len(new_tour) + 1):
-
-                            delta = 0
-                            # savings of removing the pickup and delivery
-                            delta += old_tour.pop_distance_delta(instance, (old_pickup_pos, old_delivery_pos))
-                            # cost for inserting request vertices in the new positions
-                            delta += new_tour.insert_distance_delta(instance,
-                                                                     [new_pickup_pos, new_delivery_pos],
-                                                                     [pickup, delivery])
-
-                            move = (
-                                delta, carrier, old_tour, old_pickup_pos, old_delivery_pos, new_tour, new_pickup_pos,
-                                new_delivery_pos)
-
-                            # is the improving move feasible?
-                            if self.feasibility_check(instance, move):
-                                yield move
+    def move_generator_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                              tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                              threshold: float = float('inf')):
+        old_tour, new_tour = tour, target_tour
+        pickup, delivery = instance.pickup_delivery_pair(request)
+        old_pickup_pos = old_tour.vertex_pos[pickup]
+        old_delivery_pos = old_tour.vertex_pos[delivery]
+
+        # savings of removing the pickup and delivery. Insertion deltas are non-negative (triangle inequality), i.e.
+        # the removal delta is a lower bound for all moves of this request
+        removal_delta = self._removal_delta(instance, old_tour, request)
+        if removal_delta >= threshold:
+            return
+
+        # cost for inserting request vertices in all possible positions. Skip the target tour if even the cheapest
+        # insertion does not beat the threshold
+        deltas = removal_delta + self._insertion_delta_matrix(instance, new_tour, request)
+        if deltas.min() >= threshold:
+            return
+
+        # row-major order, i.e. the same order as looping over pickup positions and then delivery positions
+        for new_pickup_pos, new_delivery_pos in zip(*np.nonzero(deltas < threshold)):
+            yield deltas[new_pickup_pos, new_delivery_pos], carrier, old_tour, old_pickup_pos, old_delivery_pos, \
+                  new_tour, int(new_pickup_pos), int(new_delivery_pos)
 
     def feasibility_check(self, instance: it.MDPDPTWInstance, move):
         delta, carrier, old_tour, old_pickup_pos, old_delivery_pos, new_tour, new_pickup_pos, new_delivery_pos = move
@@ -280,7 +693,16 @@ class PDPRelocate(InterTourNeighborhood):
         delivery = old_tour.routing_sequence[old_delivery_pos]
         return new_tour.insertion_feasibility_check(instance, [new_pickup_pos, new_delivery_pos], [pickup, delivery])
 
-    def execute_move(self, instance: it.MDPDPTWInstance, move):
+    def modified_tours(self, move: tuple) -> List[tr.Tour]:
+        delta, carrier, old_tour, old_pickup_pos, old_delivery_pos, new_tour, new_pickup_pos, new_delivery_pos = move
+        return [old_tour, new_tour]
+
+    def move_attributes(self, instance: it.MDPDPTWInstance, move: tuple):
+        delta, carrier, old_tour, old_pickup_pos, old_delivery_pos, new_tour, new_pickup_pos, new_delivery_pos = move
+        request = instance.request_from_vertex(old_tour.routing_sequence[old_pickup_pos])
+        return [(request, old_tour, old_pickup_pos, new_tour, new_pickup_pos)]
+
+    def _execute_move(self, instance: it.MDPDPTWInstance, move):
         delta, carrier, old_tour, old_pickup_pos, old_delivery_pos, new_tour, new_pickup_pos, new_delivery_pos = move
 
         pickup, delivery = old_tour.pop_and_update(instance, [old_pickup_pos, old_delivery_pos])
@@ -299,126 +721,596 @@ class PDPRelocate(InterTourNeighborhood):
         pass
 
 
-'''
-class PDPRelocate2(InterTourLocalSearchBehavior):
+class PDPOrOpt(Neighborhood):
+    """
+    Or-opt (Or, I. (1976). Traveling salesman-type combinatorial problems and their relation to the logistics of
+    regional blood banking. PhD thesis, Northwestern University) for the PDP: relocate a block of consecutive vertices
+    that is closed under precedence (i.e. that contains either both or none of the vertices of each request) to another
+    position of the same tour or of another tour of the carrier. Blocks keep their internal order and start with the
+    pickup of the request at which the move is anchored.
+
+    Feasibility is checked in constant time by concatenating the Segment data of the block and of the remaining parts
+    of the tours. The removal is always feasible, only the receiving tour is checked.
+
+    move = (delta, carrier, old_tour, block_start, block_end, new_tour, insertion_index), where the block
+    old_tour[block_start ... block_end] is inserted between new_tour[insertion_index - 1] and new_tour[insertion_index]
+    (indices before the removal)
+    """
+
+    def __init__(self, max_block_requests: int = 3):
+        """
+        :param max_block_requests: maximum number of requests in a block
+        """
+        super().__init__()
+        self.max_block_requests = max_block_requests
+        # tour id -> (tour, tour_version, segment table of the tour)
+        self._segment_tables: Dict[int, Tuple[tr.Tour, int, List[List[tr.Segment]]]] = dict()
+
+    def _target_tours(self, carrier: slt.AHDSolution, tour: tr.Tour) -> List[tr.Tour]:
+        # intra- and inter-tour relocations. Tours that do not belong to a carrier can only be searched internally
+        return [tour] if carrier is None else list(carrier.tours)
+
+    def move_generator_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                              tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                              threshold: float = float('inf')):
+        old_tour, new_tour = tour, target_tour
+        routing_sequence = old_tour.routing_sequence
+        distance_matrix = instance.distance_matrix
+        block_start = old_tour.vertex_pos[instance.pickup_delivery_pair(request)[0]]
+
+        new_sequence = np.array(new_tour.routing_sequence)
+        i_vertices, k_vertices = new_sequence[:-1], new_sequence[1:]
+        arc_distance = distance_matrix[i_vertices, k_vertices]
+
+        # extend the block vertex by vertex and consider it whenever it is closed under precedence
+        open_pickups = set()
+        num_block_requests = 0
+        for block_end in range(block_start, len(old_tour) - 1):
+            vertex = routing_sequence[block_end]
+            if instance.vertex_type(vertex) == 'pickup':
+                if num_block_requests == self.max_block_requests:
+                    break
+                open_pickups.add(vertex)
+                num_block_requests += 1
+            elif vertex - instance.num_requests in open_pickups:
+                open_pickups.remove(vertex - instance.num_requests)
+            else:
+                break  # the block contains a delivery whose pickup precedes the block
+            if open_pickups:
+                continue
+
+            first, last = routing_sequence[block_start], routing_sequence[block_end]
+            pred, succ = routing_sequence[block_start - 1], routing_sequence[block_end + 1]
+            # savings of removing the block. Insertion deltas are non-negative (triangle inequality)
+            removal_delta = distance_matrix[pred, succ] - distance_matrix[pred, first] - distance_matrix[last, succ]
+            if removal_delta >= threshold:
+                continue
+
+            # cost for inserting the block on each arc (insertion_index - 1, insertion_index) of the new tour
+            deltas = (removal_delta + distance_matrix[i_vertices, first] + distance_matrix[last, k_vertices] -
+                      arc_distance).astype(float)
+            if new_tour is old_tour:
+                # inserting next to or inside the block itself is no move
+                deltas[block_start - 1:block_end + 1] = np.inf
+
+            for insertion_index in np.nonzero(deltas < threshold)[0] + 1:
+                yield deltas[insertion_index - 1], carrier, old_tour, block_start, block_end, new_tour, \
+                      int(insertion_index)
+
+    def feasibility_check(self, instance: it.MDPDPTWInstance, move: tuple):
+        delta, carrier, old_tour, block_start, block_end, new_tour, insertion_index = move
+        old_segments = self._segment_table(instance, old_tour)
+        block = old_segments[block_start][block_end]
+
+        if new_tour is old_tour:
+            last_index = len(old_tour) - 1
+            if insertion_index < block_start:
+                segments = (old_segments[0][insertion_index - 1],
+                            block,
+                            old_segments[insertion_index][block_start - 1],
+                            old_segments[block_end + 1][last_index])
+            else:
+                segments = (old_segments[0][block_start - 1],
+                            old_segments[block_end + 1][insertion_index - 1],
+                            block,
+                            old_segments[insertion_index][last_index])
+        else:
+            new_segments = self._segment_table(instance, new_tour)
+            segments = (new_segments[0][insertion_index - 1],
+                        block,
+                        new_segments[insertion_index][len(new_tour) - 1])
+
+        route = segments[0]
+        for segment in segments[1:]:
+            route = tr.concatenate_segments(instance, route, segment)
+        return route is not None and \
+               route.distance <= instance.vehicles_max_travel_distance and \
+               route.max_load <= instance.vehicles_max_load
+
+    def modified_tours(self, move: tuple) -> List[tr.Tour]:
+        delta, carrier, old_tour, block_start, block_end, new_tour, insertion_index = move
+        return [old_tour] if new_tour is old_tour else [old_tour, new_tour]
+
+    def move_attributes(self, instance: it.MDPDPTWInstance, move: tuple):
+        delta, carrier, old_tour, block_start, block_end, new_tour, insertion_index = move
+        return [(instance.request_from_vertex(old_tour.routing_sequence[pos]), old_tour, pos, new_tour,
+                 insertion_index + pos - block_start)
+                for pos in range(block_start, block_end + 1)
+                if instance.vertex_type(old_tour.routing_sequence[pos]) == 'pickup']
+
+    def clear_move_cache(self):
+        super().clear_move_cache()
+        self._segment_tables.clear()
+
+    def _segment_table(self, instance: it.MDPDPTWInstance, tour: tr.Tour):
+        """the (memoized) segment table of the tour, see Tour.segment_table"""
+        memo = self._segment_tables.get(tour.id_)
+        if memo is None or memo[0] is not tour or memo[1] != tour.version:
+            memo = (tour, tour.version, tour.segment_table(instance))
+            self._segment_tables[tour.id_] = memo
+        return memo[2]
+
+    def _execute_move(self, instance: it.MDPDPTWInstance, move):
+        delta, carrier, old_tour, block_start, block_end, new_tour, insertion_index = move
+
+        block = old_tour.pop_and_update(instance, list(range(block_start, block_end + 1)))
+        logger.debug(f'PDPOrOpt: [{delta}] Relocate block {block} of Tour {old_tour.id_} to '
+                     f'Tour {new_tour.id_} at index {insertion_index}')
+
+        if new_tour is old_tour:
+            if insertion_index > block_end:
+                insertion_index -= len(block)
+        else:
+            requests = {instance.request_from_vertex(vertex) for vertex in block}
+            old_tour.requests.difference_update(requests)
+            new_tour.requests.update(requests)
+            # if it is now empty (i.e. depot -> depot), drop the old tour
+            if len(old_tour) <= 2:
+                carrier.tours.remove(old_tour)
+
+        new_tour.insert_and_update(instance, list(range(insertion_index, insertion_index + len(block))), block)
+        pass
+
+
+class PDPExchange(InterTourNeighborhood):
     """
-    relocate two requests at once
+    Swap two PD requests between two tours, see SBR in Nanry,W.P., & Barnes,J.W. (2000). Solving the pickup and
+    delivery problem with time windows using reactive tabu search. Transportation Research Part B: Methodological,
+    34(2), 107–121. https://doi.org/10.1016/S0191-2615(99)00016-8
+    Each request is inserted at its cheapest feasible position of the other tour (from which the other request has
+    been removed). The two insertions are independent of each other, such that they can be searched separately. The
+    removal deltas and the insertion-delta matrices of each pair are memoized per tour version, i.e. they are computed
+    once per (request, target tour) combination as long as neither tour is modified.
+
+    move = (delta, carrier, tour_1, old_pickup_pos_1, old_delivery_pos_1, tour_2, old_pickup_pos_2,
+    old_delivery_pos_2, new_pickup_pos_1, new_delivery_pos_1, new_pickup_pos_2, new_delivery_pos_2), where the new
+    positions of request 1 refer to tour_2 and vice versa
     """
-    def feasible_move_generator(self, instance: it.PDPInstance, solution: slt.CAHDSolution, carrier: int):
-        solution = deepcopy(solution)
-        carrier_ = solution.carriers[carrier]
-
-        for old_tour in range(carrier_.num_tours()):
-
-            old_tour_ = carrier_.tours[old_tour]
-
-            # check all requests of the old tour
-            # a pickup_1 can be at most at index n-2 (n is depot, n-1 must be delivery_1)
-            for old_pickup_pos_1 in range(1, len(old_tour_) - 2):
-                vertex_1 = old_tour_.routing_sequence[old_pickup_pos_1]
-
-                # skip if its a delivery_1 vertex_1
-                if instance.vertex_type(vertex_1) == "delivery":
-                    continue  # skip if its a delivery_1 vertex_1
-
-                pickup_1, delivery_1 = instance.pickup_delivery_pair(instance.request_from_vertex(vertex_1))
-                old_delivery_pos_1 = old_tour_.routing_sequence.index(delivery_1)
-
-                for old_pickup_pos_2 in range(old_pickup_pos_1 + 1, len(old_tour_) - 2):
-                    vertex_2 = old_tour_.routing_sequence[old_pickup_pos_2]
-
-                    # skip if its a delivery_1 vertex_1
-                    if instance.vertex_type(vertex_2) == "delivery":
-                        continue  # skip if its a delivery_2 vertex_2
-
-                    pickup_2, delivery_2 = instance.pickup_delivery_pair(instance.request_from_vertex(vertex_2))
-                    old_delivery_pos_2 = old_tour_.routing_sequence.index(delivery_2)
-
-                    # check all new tours for re-insertion
-                    for new_tour_1 in range(carrier_.num_tours()):
-                        new_tour_1_: tr.Tour = carrier_.tours[new_tour_1]
-
-                        # skip the current tour, there is the PDPMove local search for that option
-                        if new_tour_1 == old_tour:
-                            continue
-
-                        # check all possible new insertions for pickup_1 and delivery_1
-                        for new_pickup_pos_1 in range(1, len(new_tour_1_)):
-                            for new_delivery_pos_1 in range(new_pickup_pos_1 + 1, len(new_tour_1_) + 1):
-
-                                # check first relocation and execute if feasible
-                                if new_tour_1_.insertion_feasibility_check(instance, solution,
-                                                                           [new_pickup_pos_1, new_delivery_pos_1],
-                                                                           [pickup_1, delivery_1]):
-                                    new_tour_1_.insert_and_update(instance, solution,
-                                                                  [new_pickup_pos_1, new_delivery_pos_1],
-                                                                  [pickup_1, delivery_1])
-                                else:
-                                    continue
-
-                                for new_tour_2 in range(carrier_.num_tours()):
-                                    new_tour_2_: tr.Tour = carrier_.tours[new_tour_2]
-                                    if new_tour_2 == old_tour:
-                                        continue
-                                    for new_pickup_pos_2 in range(1, len(new_tour_2_)):
-                                        for new_delivery_pos_2 in range(new_pickup_pos_2 + 1, len(new_tour_2_) + 1):
-
-                                            delta = 0
-                                            # savings of removing the pickup_1, delivery_1, pickup_2 & delivery_2
-                                            delta += old_tour_.pop_distance_delta(instance, sorted(
-                                                (old_pickup_pos_1, old_delivery_pos_1, old_pickup_pos_2,
-                                                 old_delivery_pos_2)))
-                                            # cost for inserting them at their potential new positions
-                                            delta += new_tour_1_.insert_distance_delta(instance,
-                                                                                       [new_pickup_pos_1,
-                                                                                        new_delivery_pos_1],
-                                                                                       [pickup_1, delivery_1])
-                                            delta += new_tour_2_.insert_distance_delta(instance,
-                                                                                       [new_pickup_pos_2,
-                                                                                        new_delivery_pos_2],
-                                                                                       [pickup_2, delivery_2])
-
-                                            if new_tour_2_.insertion_feasibility_check(instance, solution,
-                                                                                       [new_pickup_pos_2,
-                                                                                        new_delivery_pos_2],
-                                                                                       [pickup_2, delivery_2]):
-                                                move = (
-                                                    delta, old_tour, old_pickup_pos_1, old_delivery_pos_1, new_tour_1,
-                                                    new_pickup_pos_1, new_delivery_pos_1, old_pickup_pos_2,
-                                                    old_delivery_pos_2, new_tour_2, new_pickup_pos_2,
-                                                    new_delivery_pos_2)
-
-                                                yield move
-                                            else:
-                                                continue
-
-                                # restore the initial state
-                                new_tour_1_.pop_and_update(instance, solution, [new_pickup_pos_1, new_delivery_pos_1])
-
-    def _execute_move(self, instance: it.PDPInstance, solution: slt.CAHDSolution, carrier: int, move):
-        delta, old_tour, old_pickup_pos_1, old_delivery_pos_1, new_tour_1, new_pickup_pos_1, new_delivery_pos_1, \
-        old_pickup_pos_2, old_delivery_pos_2, new_tour_2, new_pickup_pos_2, new_delivery_pos_2 = move
-
-        old_tour_ = solution.carriers[carrier].tours[old_tour]
-
-        pickup_1 = old_tour_.routing_sequence[old_pickup_pos_1]
-        delivery_1 = old_tour_.routing_sequence[old_delivery_pos_1]
-        pickup_2 = old_tour_.routing_sequence[old_pickup_pos_2]
-        delivery_2 = old_tour_.routing_sequence[old_delivery_pos_2]
-
-        old_tour_.pop_and_update(instance, solution,
-                                 sorted((old_pickup_pos_1, old_delivery_pos_1, old_pickup_pos_2, old_delivery_pos_2)))
-        solution.carriers[carrier].tours[new_tour_1].insert_and_update(instance, solution,
-                                                                       [new_pickup_pos_1, new_delivery_pos_1],
-                                                                       [pickup_1, delivery_1])
-        solution.carriers[carrier].tours[new_tour_2].insert_and_update(instance, solution,
-                                                                       [new_pickup_pos_2, new_delivery_pos_2],
-                                                                       [pickup_2, delivery_2])
 
+    def _target_tours(self, carrier: slt.AHDSolution, tour: tr.Tour) -> List[tr.Tour]:
+        # swaps are symmetric, consider each pair of tours once only
+        return [target_tour for target_tour in carrier.tours if target_tour.id_ > tour.id_]
+
+    def move_generator_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                              tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                              threshold: float = float('inf')):
+        pickup_1, delivery_1 = instance.pickup_delivery_pair(request)
+        old_pickup_pos_1 = tour.vertex_pos[pickup_1]
+        old_delivery_pos_1 = tour.vertex_pos[delivery_1]
+        removal_delta_1 = self._removal_delta(instance, tour, request)
+
+        for request_2 in self._requests_in_routing_order(instance, target_tour):
+            pickup_2, delivery_2 = instance.pickup_delivery_pair(request_2)
+            old_pickup_pos_2 = target_tour.vertex_pos[pickup_2]
+            old_delivery_pos_2 = target_tour.vertex_pos[delivery_2]
+
+            # savings of removing both requests. Insertion deltas are non-negative (triangle inequality)
+            removal_delta = removal_delta_1 + self._removal_delta(instance, target_tour, request_2)
+            if removal_delta >= threshold:
+                continue
+
+            # cost for inserting each request into the other tour without the other request
+            deltas_1 = self._ejection_insertion_delta_matrix(instance, target_tour, request, request_2)
+            deltas_2 = self._ejection_insertion_delta_matrix(instance, tour, request_2, request)
+
+            insertion_1 = self._cheapest_feasible_insertion(
+                deltas_1, threshold - removal_delta - deltas_2.min(),
+                lambda pickup_pos, delivery_pos: target_tour.pop_insert_feasibility_check(
+                    instance, [old_pickup_pos_2, old_delivery_pos_2], [pickup_pos, delivery_pos],
+                    [pickup_1, delivery_1]))
+            if insertion_1 is None:
+                continue
+
+            insertion_2 = self._cheapest_feasible_insertion(
+                deltas_2, threshold - removal_delta - insertion_1[0],
+                lambda pickup_pos, delivery_pos: tour.pop_insert_feasibility_check(
+                    instance, [old_pickup_pos_1, old_delivery_pos_1], [pickup_pos, delivery_pos],
+                    [pickup_2, delivery_2]))
+            if insertion_2 is None:
+                continue
+
+            yield removal_delta + insertion_1[0] + insertion_2[0], carrier, \
+                  tour, old_pickup_pos_1, old_delivery_pos_1, target_tour, old_pickup_pos_2, old_delivery_pos_2, \
+                  insertion_1[1], insertion_1[2], insertion_2[1], insertion_2[2]
+
+    def feasibility_check(self, instance: it.MDPDPTWInstance, move):
+        delta, carrier, tour_1, old_pickup_pos_1, old_delivery_pos_1, tour_2, old_pickup_pos_2, old_delivery_pos_2, \
+        new_pickup_pos_1, new_delivery_pos_1, new_pickup_pos_2, new_delivery_pos_2 = move
+        pickup_1, delivery_1 = tour_1.routing_sequence[old_pickup_pos_1], tour_1.routing_sequence[old_delivery_pos_1]
+        pickup_2, delivery_2 = tour_2.routing_sequence[old_pickup_pos_2], tour_2.routing_sequence[old_delivery_pos_2]
+        return tour_2.pop_insert_feasibility_check(instance,
+                                                   [old_pickup_pos_2, old_delivery_pos_2],
+                                                   [new_pickup_pos_1, new_delivery_pos_1],
+                                                   [pickup_1, delivery_1]) and \
+               tour_1.pop_insert_feasibility_check(instance,
+                                                   [old_pickup_pos_1, old_delivery_pos_1],
+                                                   [new_pickup_pos_2, new_delivery_pos_2],
+                                                   [pickup_2, delivery_2])
+
+    def modified_tours(self, move: tuple) -> List[tr.Tour]:
+        return [move[2], move[5]]
+
+    def move_attributes(self, instance: it.MDPDPTWInstance, move: tuple):
+        delta, carrier, tour_1, old_pickup_pos_1, old_delivery_pos_1, tour_2, old_pickup_pos_2, old_delivery_pos_2, \
+        new_pickup_pos_1, new_delivery_pos_1, new_pickup_pos_2, new_delivery_pos_2 = move
+        return [(instance.request_from_vertex(tour_1.routing_sequence[old_pickup_pos_1]), tour_1, old_pickup_pos_1,
+                 tour_2, new_pickup_pos_1),
+                (instance.request_from_vertex(tour_2.routing_sequence[old_pickup_pos_2]), tour_2, old_pickup_pos_2,
+                 tour_1, new_pickup_pos_2)]
+
+    def _execute_move(self, instance: it.MDPDPTWInstance, move):
+        delta, carrier, tour_1, old_pickup_pos_1, old_delivery_pos_1, tour_2, old_pickup_pos_2, old_delivery_pos_2, \
+        new_pickup_pos_1, new_delivery_pos_1, new_pickup_pos_2, new_delivery_pos_2 = move
+
+        pickup_1, delivery_1 = tour_1.pop_and_update(instance, [old_pickup_pos_1, old_delivery_pos_1])
+        pickup_2, delivery_2 = tour_2.pop_and_update(instance, [old_pickup_pos_2, old_delivery_pos_2])
+        request_1 = instance.request_from_vertex(pickup_1)
+        request_2 = instance.request_from_vertex(pickup_2)
+        logger.debug(f'PDPExchange: [{delta}] Exchange request {request_1} of Tour {tour_1.id_} with request '
+                     f'{request_2} of Tour {tour_2.id_}')
+
+        tour_1.requests.remove(request_1)
+        tour_2.requests.remove(request_2)
+        tour_2.insert_and_update(instance, [new_pickup_pos_1, new_delivery_pos_1], [pickup_1, delivery_1])
+        tour_2.requests.add(request_1)
+        tour_1.insert_and_update(instance, [new_pickup_pos_2, new_delivery_pos_2], [pickup_2, delivery_2])
+        tour_1.requests.add(request_2)
         pass
 
-    def feasibility_check(self, instance: it.PDPInstance, solution: slt.CAHDSolution, carrier: int, move):
-        """for this local search, the feasibility check is incorporated in the feasible_move_generator"""
+
+class PDPRelocate2(InterTourNeighborhood):
+    """
+    Relocate two PD requests of the same tour into another tour at once. The first request (the one that is anchored
+    at, i.e. the one whose pickup is visited first) is inserted at its cheapest feasible position, the second one at
+    its cheapest feasible position of the resulting tour.
+
+    move = (delta, carrier, old_tour, old_indices, new_tour, new_indices, vertices), where old_indices are the sorted
+    indices of the four vertices in the old_tour and new_indices are the sorted indices of the inserted vertices in the
+    new_tour
+    """
+
+    def move_generator_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                              tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                              threshold: float = float('inf')):
+        old_tour, new_tour = tour, target_tour
+        pickup_1, delivery_1 = instance.pickup_delivery_pair(request)
+
+        # savings of removing both requests, for all potential second requests (routed after the first one)
+        requests_2 = self._requests_in_routing_order(instance, old_tour)
+        requests_2 = requests_2[requests_2.index(request) + 1:]
+        removals = []
+        for request_2 in requests_2:
+            old_indices = sorted(old_tour.vertex_pos[vertex] for vertex in (pickup_1, delivery_1,
+                                                                            *instance.pickup_delivery_pair(request_2)))
+            removal_delta = old_tour.pop_distance_delta(instance, old_indices)
+            # insertion deltas are non-negative (triangle inequality)
+            if removal_delta < threshold:
+                removals.append((request_2, old_indices, removal_delta))
+        if not removals:
+            return
+
+        # the insertion of the first request does not depend on the second one
+        insertion_1 = self._cheapest_feasible_insertion(
+            self._insertion_delta_matrix(instance, new_tour, request),
+            threshold - min(removal_delta for _, _, removal_delta in removals),
+            lambda pickup_pos, delivery_pos: new_tour.pop_insert_feasibility_check(
+                instance, [], [pickup_pos, delivery_pos], [pickup_1, delivery_1]))
+        if insertion_1 is None:
+            return
+        delta_1, new_pickup_pos_1, new_delivery_pos_1 = insertion_1
+        routing_sequence = list(new_tour.routing_sequence)
+        routing_sequence.insert(new_pickup_pos_1, pickup_1)
+        routing_sequence.insert(new_delivery_pos_1, delivery_1)
+
+        for request_2, old_indices, removal_delta in removals:
+            if removal_delta + delta_1 >= threshold:
+                continue
+            pickup_2, delivery_2 = instance.pickup_delivery_pair(request_2)
+            deltas_2 = tr.pickup_delivery_insertion_distance_deltas(routing_sequence, instance.distance_matrix,
+                                                                    pickup_2, delivery_2)
+
+            insertion_2 = self._cheapest_feasible_insertion(
+                deltas_2, threshold - removal_delta - delta_1,
+                lambda pickup_pos, delivery_pos: new_tour.pop_insert_feasibility_check(
+                    instance, [], *self._combined_insertion(new_pickup_pos_1, new_delivery_pos_1, pickup_1, delivery_1,
+                                                            pickup_pos, delivery_pos, pickup_2, delivery_2)))
+            if insertion_2 is None:
+                continue
+            delta_2, new_pickup_pos_2, new_delivery_pos_2 = insertion_2
+
+            new_indices, vertices = self._combined_insertion(new_pickup_pos_1, new_delivery_pos_1, pickup_1, delivery_1,
+                                                             new_pickup_pos_2, new_delivery_pos_2, pickup_2, delivery_2)
+            yield removal_delta + delta_1 + delta_2, carrier, old_tour, old_indices, new_tour, new_indices, vertices
+
+    @staticmethod
+    def _combined_insertion(pickup_pos_1: int, delivery_pos_1: int, pickup_1: int, delivery_1: int,
+                            pickup_pos_2: int, delivery_pos_2: int, pickup_2: int, delivery_2: int):
+        """
+        :return: the sorted final indices and the corresponding vertices of inserting the first request at
+        (pickup_pos_1, delivery_pos_1) and afterwards the second request at (pickup_pos_2, delivery_pos_2)
+        """
+        insertions = [(pickup_pos_2, pickup_2), (delivery_pos_2, delivery_2)]
+        for index, vertex in ((pickup_pos_1, pickup_1), (delivery_pos_1, delivery_1)):
+            # the second insertions shift the vertices of the first one
+            index += index >= pickup_pos_2
+            index += index >= delivery_pos_2
+            insertions.append((index, vertex))
+        insertions.sort()
+        return [index for index, _ in insertions], [vertex for _, vertex in insertions]
+
+    def feasibility_check(self, instance: it.MDPDPTWInstance, move):
+        # removing requests from the old tour is always feasible
+        delta, carrier, old_tour, old_indices, new_tour, new_indices, vertices = move
+        return new_tour.pop_insert_feasibility_check(instance, [], new_indices, vertices)
+
+    def modified_tours(self, move: tuple) -> List[tr.Tour]:
+        delta, carrier, old_tour, old_indices, new_tour, new_indices, vertices = move
+        return [old_tour, new_tour]
+
+    def move_attributes(self, instance: it.MDPDPTWInstance, move: tuple):
+        delta, carrier, old_tour, old_indices, new_tour, new_indices, vertices = move
+        return [(instance.request_from_vertex(vertex), old_tour, old_tour.vertex_pos[vertex], new_tour, new_index)
+                for new_index, vertex in zip(new_indices, vertices) if instance.vertex_type(vertex) == 'pickup']
+
+    def _execute_move(self, instance: it.MDPDPTWInstance, move):
+        delta, carrier, old_tour, old_indices, new_tour, new_indices, vertices = move
+
+        popped = old_tour.pop_and_update(instance, old_indices)
+        requests = {instance.request_from_vertex(vertex) for vertex in popped}
+        old_tour.requests.difference_update(requests)
+        logger.debug(f'PDPRelocate2: [{delta}] Relocate requests {requests} from Tour {old_tour.id_} to '
+                     f'Tour {new_tour.id_} {new_indices}')
+
+        # if it is now empty (i.e. depot -> depot), drop the old tour
+        if len(old_tour) <= 2:
+            carrier.tours.remove(old_tour)
+
+        new_tour.insert_and_update(instance, new_indices, vertices)
+        new_tour.requests.update(requests)
         pass
 
-'''
+
+class PDPLargeInterTourNeighborhood(InterTourNeighborhood):
+    """
+    Ejection chains (Glover, F. (1996). Ejection chains, reference structures and alternating path methods for
+    traveling salesman problems. Discrete Applied Mathematics, 65(1–3), 223–253.
+    https://doi.org/10.1016/0166-218X(94)00037-E): move a request into another tour, eject one of that tour's requests
+    into a third tour, and so on. The chain ends with an insertion that does not eject anything. Each tour is visited
+    at most once, and a tour whose only request is moved is dropped. This can free a vehicle even if all other tours
+    are too full for a plain relocation.
+
+    Chains are searched best-first (lowest lower bound on the total delta first), such that a request's moves are
+    generated in ascending order of their delta. Each request is inserted at its cheapest feasible position of the
+    receiving tour (from which the next request of the chain has been removed). A partial chain is pruned as soon as
+    its cumulative delta plus the largest savings that the remaining links could achieve does not beat the threshold.
+    The insertion deltas of a request into a tour without one of its requests are memoized per tour version.
+
+    move = (delta, carrier, links), where each link (request, from_tour, old_pickup_pos, old_delivery_pos, to_tour,
+    new_pickup_pos, new_delivery_pos) moves a request between two tours. The new positions refer to to_tour after the
+    next link's request has been removed from it
+    """
+
+    def __init__(self, max_depth: int = 3):
+        """
+        :param max_depth: maximum number of requests that are moved in a chain
+        """
+        super().__init__()
+        self.max_depth = max_depth
+        # (request, tour id, ejected request) -> (tour, tour_version, cheapest feasible insertion, bound). The cheapest
+        # insertion does not depend on the rest of the chain, i.e. it can be reused by all chains that contain the link
+        self._cheapest_insertions: Dict[Tuple[int, int, int], Tuple[tr.Tour, int, Union[None, tuple], float]] = dict()
+        # (the carrier's tours and their versions, tour id -> largest savings of removing a single request), see
+        # _max_savings
+        self._max_savings: Union[None, Tuple[Tuple[Tuple[tr.Tour, int], ...], Dict[int, float]]] = None
+
+    def best_feasible_move_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                       threshold: float = float('inf')):
+        """
+        same as Neighborhood.best_feasible_move_for_carrier, but without caching: chains may alter tours other than
+        the anchor's tour and the target tour, whose versions are not part of the cache entries
+        """
+        best_move = None
+        for tour in carrier.tours:
+            for request in self._requests_in_routing_order(instance, tour):
+                for target_tour in self._target_tours(carrier, tour):
+                    bound = best_move[0] if best_move is not None else threshold
+                    move = self.best_feasible_move_for_request_and_target(instance, carrier, tour, request,
+                                                                          target_tour, bound)
+                    if move is not None:
+                        best_move = move
+        return best_move
+
+    def best_admissible_move_for_carrier(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                         admissible: Callable[[tuple], bool], threshold: float = float('inf')):
+        """
+        same as Neighborhood.best_admissible_move_for_carrier, but without caching, see best_feasible_move_for_carrier
+        """
+        best_move = None
+        for tour in carrier.tours:
+            for request in self._requests_in_routing_order(instance, tour):
+                for target_tour in self._target_tours(carrier, tour):
+                    bound = best_move[0] if best_move is not None else threshold
+                    move = self._best_admissible_move_for_request_and_target(instance, carrier, tour, request,
+                                                                             target_tour, admissible, bound)
+                    if move is not None:
+                        best_move = move
+        return best_move
+
+    def move_generator_for_request_and_target(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution,
+                                              tour: tr.Tour, request: int, target_tour: tr.Tour,
+                                              threshold: float = float('inf')):
+        # insertion deltas are non-negative (triangle inequality), i.e. a partial chain can at most save the removal
+        # savings of the tours it has not visited yet
+        max_savings = self._max_savings_per_tour(instance, carrier)
+
+        def lower_bound(cumulative_delta, visited_tour_ids, num_links):
+            remaining = sorted(max_savings[t.id_] for t in carrier.tours if t.id_ not in visited_tour_ids)
+            return cumulative_delta + sum(remaining[:self.max_depth - num_links - 1])
+
+        # nodes of the search tree: (lower bound, tie breaker, stage, data). Stages: 'bound' - insertion into a tour
+        # (with or without ejection) with only the removal savings known, 'insert' - insertion with the cheapest
+        # insertion delta known, 'complete' - a complete, feasible chain
+        counter = itertools.count()
+        heap = []
+
+        def push_insertions(cumulative_delta, links, pending, from_tour, visited_tour_ids, to_tours):
+            for to_tour in to_tours:
+                if to_tour.id_ in visited_tour_ids:
+                    continue
+                ejections = [None]
+                if len(links) + 1 < self.max_depth:
+                    ejections += self._requests_in_routing_order(instance, to_tour)
+                visited = visited_tour_ids | {to_tour.id_}
+                for ejected in ejections:
+                    delta = cumulative_delta
+                    if ejected is not None:
+                        delta += self._removal_delta(instance, to_tour, ejected)
+                        bound = lower_bound(delta, visited, len(links) + 1)
+                    else:
+                        bound = delta
+                    if bound < threshold:
+                        heapq.heappush(heap, (bound, next(counter), 'bound',
+                                              (delta, links, pending, from_tour, to_tour, ejected, visited)))
+
+        push_insertions(self._removal_delta(instance, tour, request), (), request, tour, frozenset({tour.id_}),
+                        [target_tour])
+
+        while heap:
+            bound, _, stage, data = heapq.heappop(heap)
+            if bound >= threshold:
+                return
+
+            if stage == 'complete':
+                yield data
+                continue
+
+            delta, links, pending, from_tour, to_tour, ejected, visited = data
+            deltas = self._ejection_insertion_delta_matrix(instance, to_tour, pending, ejected)
+            if stage == 'bound':
+                # refine the bound by the cheapest (not necessarily feasible) insertion
+                heapq.heappush(heap, (bound + deltas.min(), next(counter), 'insert', data))
+                continue
+
+            insertion = self._cached_cheapest_insertion(instance, to_tour, pending, ejected,
+                                                        threshold - (bound - deltas.min()))
+            if insertion is None:
+                continue
+            insertion_delta, new_pickup_pos, new_delivery_pos = insertion
+            pickup, delivery = instance.pickup_delivery_pair(pending)
+            link = (pending, from_tour, from_tour.vertex_pos[pickup], from_tour.vertex_pos[delivery],
+                    to_tour, new_pickup_pos, new_delivery_pos)
+            delta += insertion_delta
+
+            if ejected is None:
+                heapq.heappush(heap, (delta, next(counter), 'complete', (delta, carrier, (*links, link))))
+            else:
+                push_insertions(delta, (*links, link), ejected, to_tour, visited, carrier.tours)
+
+    def _max_savings_per_tour(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution) -> Dict[int, float]:
+        """
+        the (memoized) largest savings of removing a single request from each of the carrier's tours, by tour id. The
+        savings are never positive: a chain does not have to visit a tour, e.g. an empty (depot -> depot) tour that
+        a perturbation left behind. Computed once per scan of the carrier, i.e. until one of its tours is modified,
+        added or dropped
+        """
+        stamp = tuple((tour, tour.version) for tour in carrier.tours)
+        if self._max_savings is None or self._max_savings[0] != stamp:
+            max_savings = {tour.id_: min([0, *(self._removal_delta(instance, tour, request)
+                                               for request in tour.requests)])
+                           for tour in carrier.tours}
+            self._max_savings = (stamp, max_savings)
+        return self._max_savings[1]
+
+    def _cached_cheapest_insertion(self, instance: it.MDPDPTWInstance, tour: tr.Tour, request: int,
+                                   ejected: Union[None, int], bound: float):
+        """
+        :return: the cheapest feasible insertion (delta, pickup_pos, delivery_pos) of the request into the tour
+        without the ejected request if its delta is smaller than bound, None otherwise
+        """
+        key = (request, tour.id_, ejected)
+        memo = self._cheapest_insertions.get(key)
+        if memo is not None and memo[0] is tour and memo[1] == tour.version:
+            insertion, cached_bound = memo[2], memo[3]
+            # a cached insertion is the true cheapest one. If none was cached, there is none below the cached bound
+            if insertion is not None:
+                return insertion if insertion[0] < bound else None
+            if bound <= cached_bound:
+                return None
+
+        pickup, delivery = instance.pickup_delivery_pair(request)
+        pop_indices = [] if ejected is None else \
+            sorted(tour.vertex_pos[vertex] for vertex in instance.pickup_delivery_pair(ejected))
+        insertion = self._cheapest_feasible_insertion(
+            self._ejection_insertion_delta_matrix(instance, tour, request, ejected), bound,
+            lambda pickup_pos, delivery_pos: tour.pop_insert_feasibility_check(
+                instance, pop_indices, [pickup_pos, delivery_pos], [pickup, delivery]))
+        self._cheapest_insertions[key] = (tour, tour.version, insertion, bound)
+        return insertion
+
+    def clear_move_cache(self):
+        super().clear_move_cache()
+        self._cheapest_insertions.clear()
+        self._max_savings = None
+
+    def feasibility_check(self, instance: it.MDPDPTWInstance, move):
+        # removing the first request from its tour is always feasible
+        delta, carrier, links = move
+        for link, next_link in zip(links, (*links[1:], None)):
+            request, from_tour, old_pickup_pos, old_delivery_pos, to_tour, new_pickup_pos, new_delivery_pos = link
+            pop_indices = [] if next_link is None else [next_link[2], next_link[3]]
+            if not to_tour.pop_insert_feasibility_check(instance, pop_indices, [new_pickup_pos, new_delivery_pos],
+                                                        instance.pickup_delivery_pair(request)):
+                return False
+        return True
+
+    def modified_tours(self, move: tuple) -> List[tr.Tour]:
+        delta, carrier, links = move
+        return [links[0][1]] + [link[4] for link in links]
+
+    def move_attributes(self, instance: it.MDPDPTWInstance, move: tuple):
+        delta, carrier, links = move
+        return [(request, from_tour, old_pickup_pos, to_tour, new_pickup_pos)
+                for request, from_tour, old_pickup_pos, old_delivery_pos, to_tour, new_pickup_pos, new_delivery_pos
+                in links]
+
+    def _execute_move(self, instance: it.MDPDPTWInstance, move):
+        delta, carrier, links = move
+
+        # remove all requests first, the insertion positions refer to the tours without the ejected requests
+        for request, from_tour, old_pickup_pos, old_delivery_pos, to_tour, new_pickup_pos, new_delivery_pos in links:
+            from_tour.pop_and_update(instance, [old_pickup_pos, old_delivery_pos])
+            from_tour.requests.remove(request)
+
+        logger.debug(f'PDPLargeInterTourNeighborhood: [{delta}] Ejection chain ' +
+                     ' -> '.join(f'{link[0]}: Tour {link[1].id_} to Tour {link[4].id_}' for link in links))
+
+        for request, from_tour, old_pickup_pos, old_delivery_pos, to_tour, new_pickup_pos, new_delivery_pos in links:
+            to_tour.insert_and_update(instance, [new_pickup_pos, new_delivery_pos],
+                                      instance.pickup_delivery_pair(request))
+            to_tour.requests.add(request)
+
+        # if it is now empty (i.e. depot -> depot), drop the tour of the first request
+        first_tour = links[0][1]
+        if len(first_tour) <= 2:
+            carrier.tours.remove(first_tour)
+        pass
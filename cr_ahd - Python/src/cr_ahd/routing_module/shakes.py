@@ -1,8 +1,11 @@
 import random
 from abc import ABC, abstractmethod
-from typing import final, List
+from typing import final, List, Union, Tuple, Sequence
+
+import numpy as np
 
 from core_module import instance as it, solution as slt, tour as tr
+from utility_module import utils as ut
 import logging
 
 logger = logging.getLogger(__name__)
@@ -77,6 +80,242 @@ class RandomRemovalShake(Shake):
             return []
 
 
+def _remove_from_tour(instance: it.MDPDPTWInstance, tour: tr.Tour, requests: Sequence[int]):
+    """removes the requests from the tour with a single pop"""
+    removal_indices = []
+    for request in requests:
+        removal_indices.extend(tour.vertex_pos[vertex] for vertex in instance.pickup_delivery_pair(request))
+        tour.requests.remove(request)
+    tour.pop_and_update(instance, sorted(removal_indices))
+
+
+def _remove_from_carrier(instance: it.MDPDPTWInstance, carrier: slt.AHDSolution, requests: Sequence[int]):
+    """removes the requests from the carrier's tours (one pop per tour) and marks them as unrouted"""
+    for tour in carrier.tours:
+        tour_requests = [request for request in requests if request in tour.requests]
+        if tour_requests:
+            _remove_from_tour(instance, tour, tour_requests)
+    for request in requests:
+        carrier.unrouted_requests.append(request)
+        carrier.routed_requests.remove(request)
+
+
+class RelatednessShake(Shake, ABC):
+    """
+    Shake that selects requests based on the relatedness measure of Ropke,S., & Pisinger,D. (2006). An Adaptive Large
+    Neighborhood Search Heuristic for the Pickup and Delivery Problem with Time Windows. Transportation Science, 40(4),
+    455–472. https://doi.org/10.1287/trsc.1050.0135. Since the measure is computed once per instance rather than once
+    per solution, time windows are compared instead of service times. Smaller values mean more related requests.
+    """
+
+    def __init__(self, distance_weight: float = 9, time_weight: float = 3, load_weight: float = 2):
+        self.distance_weight = distance_weight
+        self.time_weight = time_weight
+        self.load_weight = load_weight
+        # (instance, relatedness matrix of all requests of the instance)
+        self._relatedness: Union[None, Tuple[it.MDPDPTWInstance, np.ndarray]] = None
+
+    def relatedness_matrix(self, instance: it.MDPDPTWInstance) -> np.ndarray:
+        """
+        the (memoized) relatedness of all pairs of requests of the instance: a weighted sum of the distance between
+        their pickups plus the distance between their deliveries, the difference between their time window centers,
+        and the difference of their loads. Each term is normalized to [0, 1].
+        """
+        if self._relatedness is None or self._relatedness[0] is not instance:
+            pickups = instance.num_carriers + np.arange(instance.num_requests)
+            deliveries = pickups + instance.num_requests
+            distance = instance.distance_matrix[np.ix_(pickups, pickups)] + \
+                       instance.distance_matrix[np.ix_(deliveries, deliveries)]
+
+            tw_center = np.array([((instance.tw_open[vertex] - ut.START_TIME) +
+                                   (instance.tw_close[vertex] - ut.START_TIME)).total_seconds() / 2
+                                  for vertex in range(instance.num_carriers + 2 * instance.num_requests)])
+            time = np.abs(tw_center[pickups, None] - tw_center[None, pickups]) + \
+                   np.abs(tw_center[deliveries, None] - tw_center[None, deliveries])
+
+            load = np.array(instance.vertex_load)[pickups]
+            load = np.abs(load[:, None] - load[None, :])
+
+            relatedness = np.zeros((instance.num_requests, instance.num_requests))
+            for weight, term in ((self.distance_weight, distance), (self.time_weight, time),
+                                 (self.load_weight, load)):
+                if term.max() > 0:
+                    relatedness += weight * term / term.max()
+            self._relatedness = (instance, relatedness)
+        return self._relatedness[1]
+
+
+class ShawRemovalShake(RelatednessShake):
+    """
+    Shaw removal (Shaw, P. (1998). Using Constraint Programming and Local Search Methods to Solve Vehicle Routing
+    Problems. In CP-98 (pp. 417–431). https://doi.org/10.1007/3-540-49481-2_30) as in Ropke & Pisinger (2006):
+    starting from a random request, repeatedly remove a request that is related to one of the removed requests. The
+    k-th most related request is selected, where k is randomized by the determinism parameter p. Since the selection
+    uses np.partition rather than sorting, each selection is linear in the number of requests.
+    """
+
+    def __init__(self, determinism: float = 6, **relatedness_weights):
+        """
+        :param determinism: p >= 1. Larger values select more related requests
+        """
+        super().__init__(**relatedness_weights)
+        self.determinism = determinism
+
+    def execute(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution, num_requests: int):
+        """removes num_requests requests per tour (on average), selected across all tours of the carrier"""
+        routed = [request for tour in carrier.tours for request in tour.requests]
+        removed = self._select(instance, routed, min(num_requests * len(carrier.tours), len(routed)))
+        _remove_from_carrier(instance, carrier, removed)
+
+    def execute_on_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour, num_requests: int):
+        removed = self._select(instance, list(tour.requests), min(num_requests, len(tour.requests)))
+        if removed:
+            _remove_from_tour(instance, tour, removed)
+        return removed
+
+    def _select(self, instance: it.MDPDPTWInstance, requests: List[int], num_requests: int) -> List[int]:
+        if num_requests <= 0:
+            return []
+        relatedness = self.relatedness_matrix(instance)
+        candidates = np.array(requests)
+        first = random.randrange(len(candidates))
+        removed = [int(candidates[first])]
+        candidates = np.delete(candidates, first)
+        while len(removed) < num_requests:
+            reference = random.choice(removed)
+            k = int(random.random() ** self.determinism * len(candidates))
+            selected = np.argpartition(relatedness[reference, candidates], k)[k]
+            removed.append(int(candidates[selected]))
+            candidates = np.delete(candidates, selected)
+        return removed
+
+
+class WorstRemovalShake(Shake):
+    """
+    Worst removal as in Ropke & Pisinger (2006): repeatedly remove a request whose removal saves much travel distance.
+    The k-th largest saving is selected, where k is randomized by the determinism parameter p. The savings are
+    maintained by the tours (see Tour.request_removal_distance_deltas): they are computed with vectorized lookups
+    and memoized per tour version, i.e. across calls, only the savings of tours that have been modified since are
+    recomputed. Within a call, that is the tour of the previously removed request. Thus, each selection is linear in
+    the number of requests.
+    """
+
+    def __init__(self, determinism: float = 3):
+        """
+        :param determinism: p >= 1. Larger values select requests with larger savings
+        """
+        self.determinism = determinism
+
+    def execute(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution, num_requests: int):
+        """removes num_requests requests per tour (on average), selected across all tours of the carrier"""
+        num_requests = min(num_requests * len(carrier.tours), sum(len(tour.requests) for tour in carrier.tours))
+        removed = self._remove(instance, carrier.tours, num_requests)
+        for request in removed:
+            carrier.unrouted_requests.append(request)
+            carrier.routed_requests.remove(request)
+
+    def execute_on_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour, num_requests: int):
+        return self._remove(instance, [tour], min(num_requests, len(tour.requests)))
+
+    def _remove(self, instance: it.MDPDPTWInstance, tours: List[tr.Tour], num_requests: int) -> List[int]:
+        # tour index -> (requests, removal deltas)
+        savings = [tour.request_removal_distance_deltas(instance) for tour in tours]
+        removed = []
+        while len(removed) < num_requests:
+            tour_indices = np.concatenate([np.full(len(requests), idx) for idx, (requests, _) in enumerate(savings)])
+            requests = np.concatenate([requests for requests, _ in savings])
+            deltas = np.concatenate([deltas for _, deltas in savings])
+
+            # the most negative delta is the largest saving
+            k = int(random.random() ** self.determinism * len(deltas))
+            selected = np.argpartition(deltas, k)[k]
+            request, tour = int(requests[selected]), tours[tour_indices[selected]]
+            _remove_from_tour(instance, tour, [request])
+            savings[tour_indices[selected]] = tour.request_removal_distance_deltas(instance)
+            removed.append(request)
+        return removed
+
+
+class ClusterRemovalShake(RelatednessShake):
+    """
+    Cluster removal (Ropke,S., & Pisinger,D. (2006). A unified heuristic for a large class of Vehicle Routing
+    Problems with Backhauls. European Journal of Operational Research, 171(3), 750–775.
+    https://doi.org/10.1016/j.ejor.2004.09.004): the requests of a random tour are split into two clusters by removing
+    the heaviest edge of a minimum spanning tree (w.r.t. relatedness, i.e. Kruskal's clustering) and one of them is
+    removed. The next tour is the one of the request that is most related to a random removed request, until enough
+    requests have been removed. The spanning tree of a tour with m requests is built in O(m²) with Prim's algorithm.
+    """
+
+    def execute(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution, num_requests: int):
+        """removes num_requests requests per tour (on average), clustered in as few tours as possible"""
+        num_requests = min(num_requests * len(carrier.tours), sum(len(tour.requests) for tour in carrier.tours))
+        relatedness = self.relatedness_matrix(instance)
+        tours = [tour for tour in carrier.tours if tour.requests]
+        if num_requests <= 0 or not tours:
+            return
+
+        removed = []
+        tour = random.choice(tours)
+        while True:
+            removed.extend(self.execute_on_tour(instance, tour, num_requests - len(removed)))
+            tours.remove(tour)
+            if len(removed) >= num_requests or not tours:
+                break
+            # continue with the tour of the request that is most related to a random removed request
+            reference = random.choice(removed)
+            candidates = np.array([request for other_tour in tours for request in other_tour.requests])
+            most_related = int(candidates[np.argmin(relatedness[reference, candidates])])
+            tour = next(other_tour for other_tour in tours if most_related in other_tour.requests)
+
+        for request in removed:
+            carrier.unrouted_requests.append(request)
+            carrier.routed_requests.remove(request)
+
+    def execute_on_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour, num_requests: int):
+        """removes (at most num_requests requests of) one of the two clusters of the tour's requests"""
+        if num_requests <= 0 or not tour.requests:
+            return []
+        requests = list(tour.requests)
+        clusters = self._split(self.relatedness_matrix(instance)[np.ix_(requests, requests)])
+        cluster = random.choice([cluster for cluster in clusters if len(cluster) > 0])
+        removed = [requests[idx] for idx in cluster[:num_requests]]
+        _remove_from_tour(instance, tour, removed)
+        return removed
+
+    @staticmethod
+    def _split(relatedness: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        splits the elements into two clusters by removing the heaviest edge of a minimum spanning tree
+
+        :param relatedness: symmetric matrix of the edge weights
+        :return: the indices of the two clusters. The second one is empty if there is a single element only
+        """
+        m = len(relatedness)
+        in_tree = np.zeros(m, dtype=bool)
+        distance_to_tree = relatedness[0].astype(float)  # weight of the cheapest edge that connects each element
+        parent = np.zeros(m, dtype=int)
+        edge_weight = np.zeros(m)  # weight of the edge that connected each element
+        order = [0]
+        in_tree[0] = True
+        for _ in range(m - 1):
+            element = int(np.argmin(np.where(in_tree, np.inf, distance_to_tree)))
+            in_tree[element] = True
+            edge_weight[element] = distance_to_tree[element]
+            order.append(element)
+            closer = ~in_tree & (relatedness[element] < distance_to_tree)
+            distance_to_tree[closer] = relatedness[element, closer]
+            parent[closer] = element
+
+        # the subtree below the heaviest edge is one cluster. Parents are always added to the tree before children
+        in_subtree = np.zeros(m, dtype=bool)
+        if m > 1:
+            in_subtree[int(np.argmax(edge_weight))] = True
+            for element in order:
+                if element != 0:
+                    in_subtree[element] |= in_subtree[parent[element]]
+        return np.nonzero(in_subtree)[0], np.nonzero(~in_subtree)[0]
+
+
 # =====================================================================================================================
 # LNS REMOVAL - OLD
 # =====================================================================================================================
@@ -0,0 +1,131 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from core_module import instance as it, solution as slt
+from routing_module import bounds as bd
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================================================================================
+# STOPPING RULES
+# =====================================================================================================================
+class StoppingRule(ABC):
+    """
+    Convergence-based early termination of a metaheuristic's search of a carrier, in addition to its budget (see
+    PDPTWMetaHeuristic.add_stopping_rule). The metaheuristic starts the rule for every carrier and reports the objective
+    of its current solution after every iteration.
+    """
+
+    def __init__(self):
+        self.name = self.__class__.__name__
+        self.iteration = 0
+        self.objective = None  # objective of the current solution
+        self.best_objective = None
+
+    def start(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution):
+        self.iteration = 0
+        self.objective = self.best_objective = carrier.objective()
+
+    def update(self, objective: float):
+        """called after every iteration with the objective of the current solution"""
+        self.iteration += 1
+        self.objective = objective
+        self.best_objective = max(self.best_objective, objective)
+
+    @abstractmethod
+    def stop(self) -> bool:
+        pass
+
+
+class NoImprovement(StoppingRule):
+    """stops once the best objective has not improved for max_iterations consecutive iterations"""
+
+    def __init__(self, max_iterations: int = 100):
+        super().__init__()
+        self.max_iterations = max_iterations
+        self._last_improvement = 0  # iteration
+
+    def start(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution):
+        super().start(instance, carrier)
+        self._last_improvement = 0
+
+    def update(self, objective: float):
+        if objective > self.best_objective:
+            self._last_improvement = self.iteration + 1
+        super().update(objective)
+
+    def stop(self) -> bool:
+        return self.iteration - self._last_improvement >= self.max_iterations
+
+
+class RelativeGap(StoppingRule):
+    """
+    stops once the best travel distance is within max_gap (relative) of a lower bound on the carrier's travel
+    distance. The routed requests and thus the revenue do not change during the search, i.e. the travel distance is
+    the revenue minus the objective.
+
+    The default bound (see bounds.travel_distance_lower_bound) is loose: on the Gansterer & Hartl instances, the gaps
+    are 0.48 to 0.66 after the construction and still 0.44 to 0.62 after a long ALNS run. Thus, the default max_gap
+    only stops carriers that are about as good as this bound can tell. Smaller gaps require a tighter bound.
+    """
+
+    def __init__(self,
+                 lower_bound: Callable[[it.MDPDPTWInstance, slt.AHDSolution], float] = bd.travel_distance_lower_bound,
+                 max_gap: float = 0.45):
+        """
+        :param lower_bound: lower bound on the travel distance of the carrier's requests. Evaluated once per carrier
+        """
+        super().__init__()
+        self.lower_bound_function = lower_bound
+        self.max_gap = max_gap
+        self.lower_bound = None
+        self._revenue = None
+
+    def start(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution):
+        super().start(instance, carrier)
+        self.lower_bound = self.lower_bound_function(instance, carrier)
+        self._revenue = carrier.sum_revenue()
+
+    def gap(self) -> float:
+        """relative gap of the best travel distance to the lower bound"""
+        best_distance = self._revenue - self.best_objective
+        if best_distance <= 0:
+            return 0
+        return (best_distance - self.lower_bound) / best_distance
+
+    def stop(self) -> bool:
+        return self.gap() <= self.max_gap
+
+
+class ExponentialMovingAveragePlateau(StoppingRule):
+    """
+    stops once the exponential moving average of the absolute objective changes between iterations (0 for iterations
+    whose move was rejected) falls below tolerance times the objective, i.e. once the search hardly moves anymore. The
+    rule does not stop within the first min_iterations iterations, such that the average is not biased by its start.
+    """
+
+    def __init__(self, smoothing: float = 0.05, tolerance: float = 1e-4, min_iterations: int = None):
+        """
+        :param smoothing: weight of the latest change, i.e. the average covers about the last 1/smoothing iterations
+        :param min_iterations: defaults to 1/smoothing
+        """
+        super().__init__()
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.min_iterations = min_iterations if min_iterations is not None else int(1 / smoothing)
+        self.average_change = 0
+
+    def start(self, instance: it.MDPDPTWInstance, carrier: slt.AHDSolution):
+        super().start(instance, carrier)
+        self.average_change = 0
+
+    def update(self, objective: float):
+        change = abs(objective - self.objective)
+        self.average_change = self.smoothing * change + (1 - self.smoothing) * self.average_change
+        super().update(objective)
+
+    def stop(self) -> bool:
+        return self.iteration >= self.min_iterations and \
+               self.average_change <= self.tolerance * abs(self.best_objective)
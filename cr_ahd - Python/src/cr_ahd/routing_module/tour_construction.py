@@ -12,6 +12,9 @@ logger = logging.getLogger(__name__)
 class PDPParallelInsertionConstruction(ABC):
     def __init__(self):
         self.name = self.__class__.__name__
+        # number of insertion positions whose feasibility was checked, the counterpart of
+        # Neighborhood.num_move_evaluations for repair operators
+        self.num_move_evaluations = 0
 
     def insert_all_unrouted_statically(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution, carrier_id: int):
         """
@@ -215,6 +218,7 @@ class MinTravelDistanceInsertion(PDPParallelInsertionConstruction):
 
                     update_best = True
                     if check_feasibility:
+                        self.num_move_evaluations += 1
                         update_best = tour.insertion_feasibility_check(instance, [pickup_pos, delivery_pos],
                                                                        [pickup_vertex, delivery_vertex])
                     if update_best:
@@ -252,6 +256,7 @@ class MinTimeShiftInsertion(PDPParallelInsertionConstruction):
 
                 update_best = True
                 if check_feasibility:
+                    self.num_move_evaluations += 1
                     update_best = tour.insertion_feasibility_check(instance, [pickup_pos, delivery_pos],
                                                                    [pickup_vertex, delivery_vertex])
                 if update_best:
@@ -305,7 +310,8 @@ class TimeShiftRegretInsertion(PDPParallelInsertionConstruction):
 
     def best_insertion_for_request_in_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour, request: int,
                                            check_feasibility=True) -> Tuple[float, int, int]:
-        return MinTimeShiftInsertion().best_insertion_for_request_in_tour(instance, tour, request, check_feasibility)
+        return MinTimeShiftInsertion.best_insertion_for_request_in_tour(self, instance, tour, request,
+                                                                        check_feasibility)
 
 
 class TravelDistanceRegretInsertion(PDPParallelInsertionConstruction):
@@ -315,9 +321,12 @@ class TravelDistanceRegretInsertion(PDPParallelInsertionConstruction):
                                    carrier: slt.AHDSolution,
                                    request: int) -> Tuple[float, tr.Tour, int, int]:
         # steal the regret implementation from time shift
-        return TimeShiftRegretInsertion().best_insertion_for_request(instance, carrier, request)
+        time_shift_regret = TimeShiftRegretInsertion()
+        insertion = time_shift_regret.best_insertion_for_request(instance, carrier, request)
+        self.num_move_evaluations += time_shift_regret.num_move_evaluations
+        return insertion
 
     def best_insertion_for_request_in_tour(self, instance: it.MDPDPTWInstance, tour: tr.Tour, request: int,
                                            check_feasibility=True) -> Tuple[float, int, int]:
-        return MinTravelDistanceInsertion().best_insertion_for_request_in_tour(instance, tour, request,
-                                                                               check_feasibility)
+        return MinTravelDistanceInsertion.best_insertion_for_request_in_tour(self, instance, tour, request,
+                                                                             check_feasibility)
@@ -31,11 +31,18 @@ def parameter_generator():
         # mh.PDPTWReducedVariableNeighborhoodSearch,
         mh.PDPTWVariableNeighborhoodSearch,
         mh.PDPTWSimulatedAnnealing,
+        # mh.PDPTWParallelTempering,
+        # mh.PDPTWAdaptiveLargeNeighborhoodSearch,
+        # mh.PDPTWParallelMultiStart,
+        # mh.PDPTWTabuSearch,
+        # mh.PDPTWHybridGeneticSearch,
         mh.NoMetaheuristic,
     ]
 
     neighborhood_collections: List[List[nh.Neighborhood]] = [
         [nh.PDPMove(), nh.PDPTwoOpt(), nh.PDPRelocate()],
+        # [nh.PDPMove(), nh.PDPTwoOpt(), nh.PDPOrOpt(), nh.PDPRelocate()],
+        # [nh.PDPMove(), nh.PDPTwoOpt(), nh.PDPRelocate(), nh.PDPLargeInterTourNeighborhood()],
     ]
     tour_improvement_time_limits: List[float] = [
         1,
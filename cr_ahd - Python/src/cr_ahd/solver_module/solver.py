@@ -1,10 +1,11 @@
 import logging.config
+import multiprocessing
 import random
 from copy import deepcopy
 from typing import Tuple
 
 from core_module import instance as it, solution as slt
-from routing_module import metaheuristics as mh
+from routing_module import bounds as bd, metaheuristics as mh
 from routing_module import tour_construction as cns
 from tw_management_module import tw_offering as two, tw_selection as tws
 from utility_module import utils as ut, profiling as pr
@@ -21,7 +22,12 @@ class Solver:
                  num_intermediate_auctions: int = 0,
                  intermediate_auction=False,
                  final_auction=False,
+                 num_improvement_processes: int = 1,
                  ):
+        """
+        :param num_improvement_processes: if > 1, the carriers are improved in parallel worker processes in the final
+         improvement phase. Each carrier is then improved with a deterministic seed (its id)
+        """
         assert not (bool(num_intermediate_auctions) ^ bool(intermediate_auction))  # not XOR
         self.time_window_offering: two.TWOfferingBehavior = time_window_offering
         self.time_window_selection: tws.TWSelectionBehavior = time_window_selection
@@ -30,6 +36,7 @@ class Solver:
         self.num_intermediate_auctions: int = num_intermediate_auctions
         self.intermediate_auction = intermediate_auction
         self.final_auction = final_auction
+        self.num_improvement_processes = num_improvement_processes
 
     def execute(self,
                 instance: it.MDPDPTWInstance,
@@ -98,14 +105,45 @@ class Solver:
         # ===== [3] Final Improvement =====
         before_improvement = solution.objective()
         timer = pr.Timer()
-        solution = self.tour_improvement.execute(instance, solution)
+        solution = self.final_improvement(instance, solution)
         timer.write_duration_to_solution(solution, 'runtime_final_improvement')
         assert int(before_improvement) <= int(solution.objective()), instance.id_
 
         ut.validate_solution(instance, solution)  # safety check to make sure everything's functional
+
+        # ===== [4] Lower Bounds =====
+        for carrier in solution.carriers:
+            carrier.travel_distance_lower_bound = bd.travel_distance_lower_bound(instance, carrier)
         if verbose:
             logger.info(f'{instance.id_}: Success {solution.solver_config}')
         else:
             logger.debug(f'{instance.id_}: Success {solution.solver_config}')
 
         return instance, solution
+
+    def final_improvement(self, instance: it.MDPDPTWInstance, solution: slt.CAHDSolution) -> slt.CAHDSolution:
+        """
+        improve the carriers' routing with the tour improvement metaheuristic. In isolated planning, carriers share no
+        requests and can thus be improved independently in parallel worker processes. Their improved tours are merged
+        back into the solution. Daemonic processes (e.g. the workers of workflow.solve_instances_multiprocessing) are
+        not allowed to have children and improve the carriers sequentially.
+        """
+        num_processes = min(self.num_improvement_processes, len(solution.carriers))
+        if num_processes <= 1 or multiprocessing.current_process().daemon:
+            return self.tour_improvement.execute(instance, solution)
+
+        solution = deepcopy(solution)
+        tasks = [(self.tour_improvement, instance, solution, carrier.id_, carrier.id_) for carrier in solution.carriers]
+        with multiprocessing.Pool(num_processes) as pool:
+            checkpoints = pool.starmap(_improve_carrier, tasks)
+        for checkpoint in checkpoints:
+            solution.merge_carrier(checkpoint)
+        return solution
+
+
+def _improve_carrier(tour_improvement: mh.PDPTWMetaHeuristic, instance: it.MDPDPTWInstance,
+                     solution: slt.CAHDSolution, carrier_id: int, seed: int):
+    """improves a single carrier in a worker process and returns its checkpoint (see CAHDSolution.carrier_checkpoint)"""
+    random.seed(seed)
+    solution = tour_improvement.execute(instance, solution, [carrier_id])
+    return solution.carrier_checkpoint(carrier_id)
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# the modules of cr_ahd import each other as top-level packages, see main.py
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from core_module import instance as it
+from routing_module import metaheuristics as mh, tour_construction as cns
+from solver_module import solver as slv
+from tw_management_module import tw_offering as two, tw_selection as tws
+
+INPUT_DIR = Path(__file__).parents[4].joinpath('data', 'Input')
+
+
+def read_instance(name: str) -> it.MDPDPTWInstance:
+    path = INPUT_DIR.joinpath(name)
+    if not path.exists():
+        pytest.skip(f'{path} not found')
+    return it.read_gansterer_hartl_mv(path)
+
+
+def construct(instance: it.MDPDPTWInstance):
+    """the instance (with the selected time windows) and a solution of the construction phase"""
+    solver = slv.Solver(two.FeasibleTW(), tws.UnequalPreference(), cns.MinTravelDistanceInsertion(),
+                        mh.NoMetaheuristic([], 1))
+    return solver.execute(instance)
+
+
+@pytest.fixture(scope='session')
+def start():
+    """the instance and a solution of the construction phase of a small instance with 3 carriers and 10 requests each"""
+    return construct(read_instance('run=0+dist=200+rad=150+n=10.dat'))
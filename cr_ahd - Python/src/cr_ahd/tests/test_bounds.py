@@ -0,0 +1,70 @@
+import itertools
+import random
+from copy import deepcopy
+
+import pytest
+
+from conftest import construct, read_instance
+from routing_module import bounds as bd, metaheuristics as mh, neighborhoods as nh
+
+BOUNDS = [bd.minimum_spanning_tree_bound, bd.assignment_bound, bd.travel_distance_lower_bound]
+
+
+def relaxed_optimum(instance, carrier) -> float:
+    """
+    brute force: the shortest routing of the carrier's routed requests into at most carriers_max_num_tours tours that
+    visits each pickup before its delivery, ignoring time windows, load and tour length
+    """
+    depot = carrier.id_
+    vertices = [vertex for request in carrier.routed_requests for vertex in instance.pickup_delivery_pair(request)]
+    best = float('inf')
+    for sequence in itertools.permutations(vertices):
+        position = {vertex: index for index, vertex in enumerate(sequence)}
+        if any(position[vertex] > position[vertex + instance.num_requests] for vertex in vertices
+               if instance.vertex_type(vertex) == 'pickup'):
+            continue
+        for num_tours in range(1, instance.carriers_max_num_tours + 1):
+            for cuts in itertools.combinations(range(1, len(sequence)), num_tours - 1):
+                tours = [sequence[start:end] for start, end in zip((0, *cuts), (*cuts, len(sequence)))]
+                if any(position[vertex + instance.num_requests] >= end
+                       for tour, end in zip(tours, (*cuts, len(sequence))) for vertex in tour
+                       if instance.vertex_type(vertex) == 'pickup'):
+                    continue  # a request is split between tours
+                distance = sum(instance.distance(routing_sequence[:-1], routing_sequence[1:])
+                               for routing_sequence in ([depot, *tour, depot] for tour in tours))
+                best = min(best, distance)
+    return best
+
+
+@pytest.mark.parametrize('num_requests', [1, 2, 3])
+def test_bounds_of_small_carriers(start, num_requests):
+    """the bounds of subsets of the carriers' requests against the optimum of the relaxed routing problem"""
+    instance, solution = start
+    rng = random.Random(num_requests)
+    for carrier in solution.carriers:
+        for _ in range(3):
+            small_carrier = deepcopy(carrier)
+            small_carrier.routed_requests = rng.sample(carrier.routed_requests, num_requests)
+            optimum = relaxed_optimum(instance, small_carrier)
+            for bound in BOUNDS:
+                assert bound(instance, small_carrier) <= optimum + 1e-6
+            if num_requests == 1:
+                # depot -> pickup -> delivery -> depot is the only routing, the tree consists of its two shortest edges
+                pickup, delivery = instance.pickup_delivery_pair(small_carrier.routed_requests[0])
+                edges = sorted(min(instance.distance([i], [j]), instance.distance([j], [i]))
+                               for i, j in [(carrier.id_, pickup), (pickup, delivery), (delivery, carrier.id_)])
+                assert bd.minimum_spanning_tree_bound(instance, small_carrier) == pytest.approx(edges[0] + edges[1])
+                assert bd.assignment_bound(instance, small_carrier) == pytest.approx(optimum)
+
+
+@pytest.mark.parametrize('name', ['run=0+dist=200+rad=150+n=10.dat', 'run=1+dist=200+rad=300+n=10.dat'])
+def test_bounds_of_solutions(name):
+    """the bounds of the carriers against the constructed and the improved routings"""
+    instance, solution = construct(read_instance(name))
+    improved = mh.PDPTWVariableNeighborhoodDescent([nh.PDPMove(), nh.PDPRelocate(), nh.PDPTwoOpt()], 1) \
+        .execute(instance, solution)
+    for carrier, improved_carrier in zip(solution.carriers, improved.carriers):
+        distance = min(carrier.sum_travel_distance(), improved_carrier.sum_travel_distance())
+        for bound in BOUNDS:
+            assert 0 < bound(instance, carrier) <= distance
+        assert 0 <= bd.relative_gap(instance, improved_carrier) < 1
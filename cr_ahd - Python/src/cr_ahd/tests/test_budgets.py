@@ -0,0 +1,85 @@
+import signal
+from copy import deepcopy
+
+import pytest
+
+from routing_module import metaheuristics as mh, neighborhoods as nh
+from utility_module import utils as ut
+
+# small budgets per carrier, such that each run takes a few seconds at most
+BUDGETS = {'wall_time': 0.2, 'cpu_time': 0.2, 'move_evaluations': 300, 'kernel_calls': 2000}
+
+# a run that takes longer than this is considered to never stop
+TIMEOUT = 60
+
+METAHEURISTICS = {
+    'NoMetaheuristic': lambda: mh.NoMetaheuristic([], 1),
+    'LocalSearchFirst': lambda: mh.LocalSearchFirst([nh.PDPMove()], 1),
+    'LocalSearchBest': lambda: mh.LocalSearchBest([nh.PDPMove()], 1),
+    'PDPTWSequentialLocalSearch': lambda: mh.PDPTWSequentialLocalSearch([nh.PDPMove(), nh.PDPRelocate()], 1),
+    'PDPTWVariableNeighborhoodDescent':
+        lambda: mh.PDPTWVariableNeighborhoodDescent([nh.PDPMove(), nh.PDPRelocate()], 1),
+    'PDPTWReducedVariableNeighborhoodSearch':
+        lambda: mh.PDPTWReducedVariableNeighborhoodSearch([nh.PDPMove(), nh.PDPRelocate()], 1),
+    'PDPTWVariableNeighborhoodSearch':
+        lambda: mh.PDPTWVariableNeighborhoodSearch([nh.PDPMove(), nh.PDPRelocate()], 1),
+    'PDPTWSimulatedAnnealing': lambda: mh.PDPTWSimulatedAnnealing([nh.PDPMove(), nh.PDPRelocate()], 1),
+    'PDPTWParallelTempering':
+        lambda: mh.PDPTWParallelTempering([nh.PDPMove(), nh.PDPRelocate()], 1, num_replicas=2),
+    'PDPTWIteratedLocalSearch': lambda: mh.PDPTWIteratedLocalSearch([nh.PDPMove(), nh.PDPRelocate()], 1),
+    'PDPTWAdaptiveLargeNeighborhoodSearch':
+        lambda: mh.PDPTWAdaptiveLargeNeighborhoodSearch([nh.PDPMove(), nh.PDPRelocate()], 1),
+    # destroy and repair only
+    'PDPTWAdaptiveLargeNeighborhoodSearch without neighborhoods':
+        lambda: mh.PDPTWAdaptiveLargeNeighborhoodSearch([], 1),
+    'PDPTWTabuSearch': lambda: mh.PDPTWTabuSearch([nh.PDPMove(), nh.PDPRelocate()], 1),
+    'PDPTWHybridGeneticSearch': lambda: mh.PDPTWHybridGeneticSearch([nh.PDPMove(), nh.PDPRelocate()], 1),
+    'PDPTWParallelMultiStart':
+        lambda: mh.PDPTWParallelMultiStart([nh.PDPMove(), nh.PDPRelocate()], 1, num_starts=2),
+}
+
+
+@pytest.fixture(scope='module')
+def single_request_start(start):
+    """
+    the construction start, but the first carrier serves only the most profitable of its requests in a single tour.
+    None of the neighborhoods has a move for it, while its positive objective gives a positive start temperature
+    """
+    instance, solution = start
+    candidates = []
+    for request in solution.carriers[0].routed_requests:
+        candidate = deepcopy(solution)
+        carrier = candidate.carriers[0]
+        candidate.free_requests_from_carriers(instance, [r for r in carrier.routed_requests if r != request])
+        for tour in [tour for tour in carrier.tours if not tour.requests]:
+            carrier.tours.remove(tour)
+            candidate.tours[tour.id_] = None
+        candidates.append(candidate)
+    solution = max(candidates, key=lambda x: x.carriers[0].objective())
+    assert len(solution.carriers[0].tours) == 1 and solution.carriers[0].objective() > 0
+    return instance, solution
+
+
+def _timeout(signum, frame):
+    raise TimeoutError(f'no stop within {TIMEOUT} seconds')
+
+
+@pytest.mark.parametrize('unit', BUDGETS)
+@pytest.mark.parametrize('name', METAHEURISTICS)
+@pytest.mark.parametrize('start_name', ['start', 'single_request_start'])
+def test_metaheuristic_stops(request, start_name, name, unit):
+    instance, solution = request.getfixturevalue(start_name)
+    metaheuristic = METAHEURISTICS[name]()
+    metaheuristic.set_budget(BUDGETS[unit], unit)
+
+    if not hasattr(signal, 'SIGALRM'):
+        pytest.skip('the timeout requires SIGALRM')
+    handler = signal.signal(signal.SIGALRM, _timeout)
+    signal.alarm(TIMEOUT)
+    try:
+        improved = metaheuristic.execute(instance, solution)
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, handler)
+
+    ut.validate_solution(instance, improved)
@@ -0,0 +1,153 @@
+import itertools
+import random
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from core_module import tour as tr
+from routing_module import metaheuristics as mh, neighborhoods as nh
+from utility_module import utils as ut
+
+
+def test_tabu_list():
+    """against a plain dict of expiry iterations"""
+    rng = random.Random(0)
+    tabu_list = mh.TabuList(max_tenure=7)
+    expiry = dict()
+    for iteration in range(500):
+        for _ in range(rng.randint(0, 3)):
+            attribute, tenure = rng.randint(0, 20), rng.randint(-2, 10)
+            # the tenure is clipped to [1, max_tenure], re-adding never shortens it
+            expiry[attribute] = max(expiry.get(attribute, 0), iteration + max(1, min(tenure, 7)))
+            tabu_list.add(attribute, tenure)
+        for attribute in range(21):
+            assert (attribute in tabu_list) == (expiry.get(attribute, 0) > iteration)
+        # only the attributes that are tabu are stored
+        assert len(tabu_list) == sum(e > iteration for e in expiry.values())
+        tabu_list.next_iteration()
+
+
+def is_order_crossover(child: np.ndarray, first_parent: np.ndarray, second_parent: np.ndarray) -> bool:
+    """whether the child is an OX child of the parents for some slice"""
+    n = len(child)
+    for start, end in itertools.combinations(range(n + 1), 2):
+        rotated = np.roll(second_parent, -end)
+        rest = rotated[~np.isin(rotated, first_parent[start:end])]
+        if np.array_equal(child[start:end], first_parent[start:end]) and \
+                np.array_equal(np.roll(child, -end)[:n - (end - start)], rest):
+            return True
+    return False
+
+
+def test_order_crossover():
+    random.seed(0)
+    for _ in range(100):
+        first_parent = np.array(random.sample(range(30, 40), 10))
+        second_parent = np.array(random.sample(range(30, 40), 10))
+        child = mh.PDPTWHybridGeneticSearch.order_crossover(first_parent, second_parent)
+        assert sorted(child) == list(range(30, 40))
+        assert is_order_crossover(child, first_parent, second_parent)
+    assert np.array_equal(mh.PDPTWHybridGeneticSearch.order_crossover(first_parent, first_parent), first_parent)
+
+
+def travel_distance(instance, depot: int, encoding) -> float:
+    distance = 0
+    for routing_sequence in encoding:
+        tour = tr.Tour('tmp', depot_index=depot)
+        tour.insert_and_update(instance, range(1, len(routing_sequence) + 1), routing_sequence)
+        distance += tour.sum_travel_distance
+    return distance
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_split(start, seed):
+    """
+    each tour serves a consecutive part of the permutation, and the partition is the best one of all partitions into
+    at most carriers_max_num_tours parts. The distance of each part is that of splitting it into a single tour
+    """
+    instance, solution = deepcopy(start)
+    single_tour_instance = deepcopy(instance)
+    single_tour_instance.carriers_max_num_tours = 1
+    rng = random.Random(seed)
+    hgs = mh.PDPTWHybridGeneticSearch([nh.PDPMove()], 1)
+    num_split = 0
+    for carrier in solution.carriers:
+        permutation = np.array(rng.sample(carrier.routed_requests, len(carrier.routed_requests)))
+        n = len(permutation)
+        encoding = hgs.split(instance, carrier, permutation)
+
+        part_distances = dict()
+        for i, j in itertools.combinations(range(n + 1), 2):
+            part_encoding = hgs.split(single_tour_instance, carrier, permutation[i:j])
+            if part_encoding is not None:
+                part_distances[i, j] = travel_distance(instance, carrier.id_, part_encoding)
+        best_distance = min(sum(part_distances.get(part, float('inf')) for part in zip((0, *cuts), (*cuts, n)))
+                            for num_tours in range(1, instance.carriers_max_num_tours + 1)
+                            for cuts in itertools.combinations(range(1, n), num_tours - 1))
+        if best_distance == float('inf'):
+            assert encoding is None
+            continue
+        num_split += 1
+
+        position = {request: index for index, request in enumerate(permutation)}
+        positions = [sorted(position[instance.request_from_vertex(vertex)] for vertex in routing_sequence
+                            if instance.vertex_type(vertex) == 'pickup') for routing_sequence in encoding]
+        assert sorted(itertools.chain(*positions)) == list(range(n))
+        assert all(part == list(range(part[0], part[-1] + 1)) for part in positions)
+        assert travel_distance(instance, carrier.id_, encoding) == pytest.approx(best_distance)
+
+        solution.decode_carrier(instance, carrier.id_, encoding)
+    ut.validate_solution(instance, solution)
+    assert num_split > 0 and hgs.num_move_evaluations > 0
+
+
+def test_trajectory(tmp_path):
+    """full buffers are flushed to files, which together with the buffer hold the complete trajectory"""
+    rng = random.Random(0)
+    records = [(rng.choice(['PDPMove', 'PDPRelocate', 'PDPTwoOpt']), rng.sample(range(100), rng.randint(0, 6)),
+                rng.uniform(-100, 100), rng.random() < 0.5) for _ in range(23)]
+    trajectory = mh.Trajectory(capacity=5, max_requests_per_record=4, directory=tmp_path)
+    for record in records:
+        trajectory.append(*record)
+    assert len(trajectory) == 3
+
+    files = sorted(tmp_path.glob('trajectory_*.npz'))
+    assert len(files) == 4
+    trajectory.flush(tmp_path.joinpath('rest.npz'))
+    assert len(trajectory) == 0
+    columns = dict(index=[], operator=[], requests=[], delta=[], accepted=[])
+    for path in files + [tmp_path.joinpath('rest.npz')]:
+        with np.load(path) as data:
+            for name in columns:
+                # operator ids are resolved by the names stored in the same file
+                columns[name].extend(data['operators'][data[name]] if name == 'operator' else data[name])
+
+    assert columns['index'] == list(range(len(records)))
+    assert columns['operator'] == [operator for operator, _, _, _ in records]
+    # padded with -1, truncated to max_requests_per_record
+    assert [list(requests[requests >= 0]) for requests in columns['requests']] == \
+           [requests[:4] for _, requests, _, _ in records]
+    assert columns['delta'] == [delta for _, _, delta, _ in records]
+    assert columns['accepted'] == [accepted for _, _, _, accepted in records]
+
+
+def test_trajectory_ring_buffer():
+    """without a directory, the latest records are kept"""
+    trajectory = mh.Trajectory(capacity=5)
+    for index in range(12):
+        trajectory.append('PDPMove', [index], index, True)
+    assert len(trajectory) == 5
+    assert list(trajectory.columns()['index']) == list(range(7, 12))
+    assert list(trajectory.columns()['requests'][:, 0]) == list(range(7, 12))
+
+
+def test_record_trajectory(start):
+    """the accepted deltas of a local search add up to the change of the travel distance"""
+    instance, solution = start
+    local_search = mh.LocalSearchBest([nh.PDPRelocate()], 1)
+    local_search.record_trajectory()
+    improved = local_search.execute(instance, solution)
+    columns = local_search.trajectory.columns()
+    assert len(columns['index']) > 0 and all(columns['accepted'])
+    assert columns['delta'].sum() == pytest.approx(improved.sum_travel_distance() - solution.sum_travel_distance())
@@ -0,0 +1,179 @@
+import random
+from copy import deepcopy
+
+import pytest
+
+from routing_module import neighborhoods as nh
+from test_tour import schedule_feasible
+
+
+@pytest.fixture
+def carrier(start):
+    """a copy of the instance and of the construction's carrier with the most tours"""
+    instance, solution = deepcopy(start)
+    return instance, solution, max(solution.carriers, key=lambda x: len(x.tours))
+
+
+def num_evaluations_of_scan(instance, neighborhood, carrier, threshold=0):
+    """the number of move evaluations of exhausting a don't-look scan"""
+    num_move_evaluations = neighborhood.num_move_evaluations
+    for _ in neighborhood.dont_look_move_generator_for_carrier(instance, carrier, threshold):
+        pass
+    return neighborhood.num_move_evaluations - num_move_evaluations
+
+
+def test_dont_look_bits(carrier):
+    instance, solution, carrier = carrier
+    neighborhood = nh.PDPMove()
+    assert num_evaluations_of_scan(instance, neighborhood, carrier) > 0
+    assert set(neighborhood.dont_look_bits) == set(carrier.routed_requests)
+    # all bits are valid, nothing is evaluated again
+    assert num_evaluations_of_scan(instance, neighborhood, carrier) == 0
+
+    # modify a single tour: only its requests are scanned again
+    modified_tour = next(tour for tour in carrier.tours if len(tour.requests) > 1)
+    move = next(nh.PDPMove().feasible_move_generator_for_tour(instance, modified_tour))
+    nh.PDPMove().execute_move(instance, move)
+    expected = nh.PDPMove()
+    for request in modified_tour.requests:
+        for _ in expected.feasible_move_generator_for_request(instance, carrier, modified_tour, request, 0):
+            pass
+    assert num_evaluations_of_scan(instance, neighborhood, carrier) == expected.num_move_evaluations
+
+    neighborhood.reset_dont_look_bits()
+    assert not neighborhood.dont_look_bits
+
+
+def test_restore_dont_look_bits(carrier):
+    """bits that were valid at the time of a carrier checkpoint are valid again after restoring it"""
+    instance, solution, carrier = carrier
+    neighborhood = nh.PDPRelocate()
+    num_evaluations_of_scan(instance, neighborhood, carrier)
+    checkpoint = solution.carrier_checkpoint(carrier.id_)
+    dont_look_checkpoint = neighborhood.dont_look_checkpoint()
+
+    # an inter-tour move invalidates the bits of all requests of the carrier
+    move = next(nh.PDPRelocate().feasible_move_generator_for_carrier(instance, carrier))
+    nh.PDPRelocate().execute_move(instance, move)
+    assert num_evaluations_of_scan(instance, neighborhood, carrier) > 0
+
+    solution.restore_carrier(checkpoint)
+    neighborhood.restore_dont_look_bits(dont_look_checkpoint)
+    assert num_evaluations_of_scan(instance, neighborhood, carrier) == 0
+
+
+NEIGHBORHOODS = {
+    'PDPMove': nh.PDPMove,
+    'PDPTwoOpt': nh.PDPTwoOpt,
+    'PDPRelocate': nh.PDPRelocate,
+    'PDPOrOpt': nh.PDPOrOpt,
+    'PDPExchange': nh.PDPExchange,
+    'PDPRelocate2': nh.PDPRelocate2,
+    'PDPLargeInterTourNeighborhood': nh.PDPLargeInterTourNeighborhood,
+}
+
+
+@pytest.mark.parametrize('name', NEIGHBORHOODS)
+def test_move_cache(carrier, name):
+    """
+    after random moves, a cached neighborhood finds the same best delta as a fresh one, and the cached best move of
+    every (request, target tour) combination is still the best one
+    """
+    instance, solution, carrier = carrier
+    neighborhood = NEIGHBORHOODS[name]()
+    # chains are not cached, only the insertions of their links
+    caches_moves = name != 'PDPLargeInterTourNeighborhood'
+    rng = random.Random(0)
+    for _ in range(10):
+        move = neighborhood.best_feasible_move_for_carrier(instance, carrier)
+        expected = NEIGHBORHOODS[name]().best_feasible_move_for_carrier(instance, carrier)
+        if expected is None:
+            assert move is None
+            break
+        assert move[0] == pytest.approx(expected[0])
+
+        # without any modification, the cached moves are reused
+        if caches_moves:
+            num_move_evaluations = neighborhood.num_move_evaluations
+            assert neighborhood.best_feasible_move_for_carrier(instance, carrier) is move
+            assert neighborhood.num_move_evaluations == num_move_evaluations
+
+        neighborhood.execute_move(instance, neighborhood.random_feasible_move_for_carrier(instance, carrier, rng))
+        for tour in carrier.tours if caches_moves else []:
+            for request in tour.requests:
+                for target_tour in neighborhood._target_tours(carrier, tour):
+                    cached = neighborhood._cached_best_move(instance, carrier, tour, request, target_tour)
+                    fresh = NEIGHBORHOODS[name]().best_feasible_move_for_request_and_target(
+                        instance, carrier, tour, request, target_tour)
+                    assert (cached is None) == (fresh is None)
+                    assert cached is None or cached[0] == pytest.approx(fresh[0])
+    neighborhood.clear_move_cache()
+    assert not neighborhood._move_cache
+
+
+@pytest.mark.parametrize('name', NEIGHBORHOODS)
+def test_best_feasible_move_for_carrier(carrier, name):
+    """the streamed, pruned minimum is the minimum of the materialized neighborhood, a reservoir sample is a member"""
+    instance, solution, carrier = carrier
+    moves = list(NEIGHBORHOODS[name]().feasible_move_generator_for_carrier(instance, carrier))
+    assert moves
+    best_move = NEIGHBORHOODS[name]().best_feasible_move_for_carrier(instance, carrier)
+    assert best_move[0] == pytest.approx(min(move[0] for move in moves))
+    # a threshold that no move beats
+    assert NEIGHBORHOODS[name]().best_feasible_move_for_carrier(instance, carrier, best_move[0]) is None
+    assert NEIGHBORHOODS[name]().random_feasible_move_for_carrier(instance, carrier, random.Random(0)) in moves
+
+
+@pytest.mark.parametrize('name', NEIGHBORHOODS)
+def test_threshold(carrier, name):
+    """candidates are pruned on their delta before the feasibility check, but no move below the threshold is lost"""
+    instance, solution, carrier = carrier
+    neighborhood = NEIGHBORHOODS[name]()
+    moves = list(neighborhood.feasible_move_generator_for_carrier(instance, carrier))
+    threshold = sorted(move[0] for move in moves)[len(moves) // 4]
+    pruned = NEIGHBORHOODS[name]()
+    pruned_moves = list(pruned.feasible_move_generator_for_carrier(instance, carrier, threshold))
+    expected = [move for move in moves if move[0] < threshold]
+    assert len(pruned_moves) == len(expected) and all(move in expected for move in pruned_moves)
+    assert pruned.num_move_evaluations < neighborhood.num_move_evaluations
+
+
+def precedence_feasible(instance, tour) -> bool:
+    return all(tour.vertex_pos[instance.pickup_delivery_pair(request)[0]] <
+               tour.vertex_pos[instance.pickup_delivery_pair(request)[1]] for request in tour.requests)
+
+
+@pytest.mark.parametrize('capacity', [None, 20], ids=['capacity', 'tight capacity'])
+@pytest.mark.parametrize('name', NEIGHBORHOODS)
+def test_candidates(carrier, name, capacity):
+    """
+    the delta and the feasibility check of (a sample of) all candidate moves against executing them on a copy. The
+    tight capacity, i.e. two requests at most, makes the load binding. Moves of tours that are infeasible under it are
+    skipped
+    """
+    instance, solution, _ = carrier
+    if capacity is not None:
+        instance.vehicles_max_load = capacity
+    neighborhood = NEIGHBORHOODS[name]()
+    candidates = [(carrier, move)
+                  for carrier in solution.carriers
+                  for tour in carrier.tours
+                  for request in tour.requests
+                  for target_tour in neighborhood._target_tours(carrier, tour)
+                  for move in neighborhood.move_generator_for_request_and_target(instance, carrier, tour, request,
+                                                                                target_tour)
+                  if all(schedule_feasible(instance, tour) for tour in neighborhood.modified_tours(move))]
+    assert candidates
+    num_feasible = 0
+    for carrier, move in random.Random(0).sample(candidates, min(len(candidates), 300)):
+        feasible = neighborhood.feasibility_check(instance, move)
+        num_feasible += feasible
+
+        copy, copy_move = deepcopy((carrier, move))
+        sum_travel_distance = sum(tour.sum_travel_distance for tour in copy.tours)
+        modified_tours = neighborhood.modified_tours(copy_move)
+        neighborhood.execute_move(instance, copy_move)
+        assert sum(tour.sum_travel_distance for tour in copy.tours) - sum_travel_distance == pytest.approx(move[0])
+        assert feasible == all(schedule_feasible(instance, tour) and precedence_feasible(instance, tour)
+                               for tour in modified_tours)
+    assert num_feasible > 0
@@ -0,0 +1,124 @@
+import random
+from copy import deepcopy
+
+from routing_module import neighborhoods as nh, shakes as sh, tour_construction as cns
+from utility_module import utils as ut
+
+
+def carrier_state(solution, carrier_id: int):
+    """the carrier's routing and request lists, comparable across copies"""
+    carrier = solution.carriers[carrier_id]
+    tours = sorted((tour.id_, tour.version, tuple(tour.routing_sequence), tuple(tour.arrival_time_sequence),
+                    frozenset(tour.requests)) for tour in carrier.tours)
+    request_lists = (carrier.assigned_requests, carrier.accepted_requests, carrier.rejected_requests,
+                     carrier.unrouted_requests, carrier.routed_requests)
+    return tours, deepcopy(request_lists), carrier.acceptance_rate
+
+
+def assert_tour_ids_released(solution):
+    """every tour of the solution is part of its carrier, or is an empty tour that is found by get_free_tour_id"""
+    for tour in solution.tours:
+        assert tour is None or tour in solution.carriers[tour.routing_sequence[0]].tours or len(tour) <= 2
+
+
+def perturb(instance, solution, carrier_id: int, rng: random.Random):
+    """
+    empties and drops the smallest tour, as neighborhood moves do, and repairs the carrier, which creates new tours. As
+    in the ALNS, the repair may fail and leave unrouted requests behind. Finally, some random moves are executed
+    """
+    carrier = solution.carriers[carrier_id]
+    tour = min(carrier.tours, key=len)
+    sh._remove_from_carrier(instance, carrier, sorted(tour.requests))
+    carrier.tours.remove(tour)
+    try:
+        cns.MinTravelDistanceInsertion().insert_all_unrouted_statically(instance, solution, carrier_id)
+    except ut.ConstraintViolationError:
+        pass
+    neighborhood = nh.PDPRelocate()
+    for _ in range(5):
+        move = neighborhood.random_feasible_move_for_carrier(instance, carrier, rng)
+        if move is not None:
+            neighborhood.execute_move(instance, move)
+
+
+def test_get_free_tour_id(start):
+    instance, solution = deepcopy(start)
+    carrier = next(carrier for carrier in solution.carriers if carrier.tours)
+    tour = carrier.tours[0]
+    assert solution.get_free_tour_id() == len(solution.tours)
+
+    # an emptied tour that is still part of its carrier keeps its id, e.g. after a destroy operator
+    tour.pop_and_update(instance, list(range(1, len(tour) - 1)))
+    assert solution.get_free_tour_id() == len(solution.tours)
+
+    # an emptied tour that has been dropped from its carrier, e.g. by a neighborhood move, does not
+    carrier.tours.remove(tour)
+    assert solution.get_free_tour_id() == tour.id_
+
+
+def test_restore_carrier(start):
+    instance, solution = deepcopy(start)
+    rng = random.Random(0)
+    for carrier in solution.carriers:
+        checkpoint = solution.carrier_checkpoint(carrier.id_)
+        state = carrier_state(solution, carrier.id_)
+        # the checkpoint is not consumed, i.e. it can be restored multiple times
+        for _ in range(3):
+            for _ in range(3):
+                perturb(instance, solution, carrier.id_, rng)
+            assert carrier_state(solution, carrier.id_) != state
+            current_tours = {tour.id_: tour for tour in carrier.tours}
+
+            solution.restore_carrier(checkpoint)
+            assert carrier_state(solution, carrier.id_) == state
+            # tours are restored in place
+            assert all(tour is current_tours.get(tour.id_, tour) for tour in carrier.tours)
+            ut.validate_solution(instance, solution)
+            assert_tour_ids_released(solution)
+
+
+def test_merge_carrier(start):
+    """the carriers are improved on copies of the solution, e.g. in worker processes, and merged back"""
+    instance, solution = deepcopy(start)
+    rng = random.Random(0)
+    num_merged = 0
+    for carrier in solution.carriers:
+        worker_solution = deepcopy(solution)
+        perturb(instance, worker_solution, carrier.id_, rng)
+        if worker_solution.carriers[carrier.id_].unrouted_requests:
+            continue
+        num_merged += 1
+        routing = sorted(tuple(tour.routing_sequence) for tour in worker_solution.carriers[carrier.id_].tours)
+        other_carriers = [carrier_state(solution, other.id_) for other in solution.carriers if other is not carrier]
+
+        solution.merge_carrier(worker_solution.carrier_checkpoint(carrier.id_))
+        assert sorted(tuple(tour.routing_sequence) for tour in carrier.tours) == routing
+        assert [carrier_state(solution, other.id_) for other in solution.carriers if other is not carrier] == \
+               other_carriers
+        ut.validate_solution(instance, solution)
+        assert_tour_ids_released(solution)
+    assert num_merged > 0
+
+
+def test_carrier_encoding(start):
+    """decoding an encoding rebuilds the same tours and schedules, with new tour ids"""
+    instance, solution = deepcopy(start)
+    rng = random.Random(0)
+    for carrier in solution.carriers:
+        encoding = solution.carrier_encoding(carrier.id_)
+        schedules = sorted((tuple(tour.routing_sequence), tuple(tour.arrival_time_sequence), tour.sum_travel_distance)
+                           for tour in carrier.tours)
+        # another routing of the same requests, e.g. of a replica, and back
+        other_solution = deepcopy(solution)
+        perturb(instance, other_solution, carrier.id_, rng)
+        encodings = [encoding]
+        if not other_solution.carriers[carrier.id_].unrouted_requests:
+            encodings.insert(0, other_solution.carrier_encoding(carrier.id_))
+
+        for decoded in encodings:
+            solution.decode_carrier(instance, carrier.id_, decoded)
+            assert solution.carrier_encoding(carrier.id_) == decoded
+            ut.validate_solution(instance, solution)
+            assert_tour_ids_released(solution)
+        assert sorted((tuple(tour.routing_sequence), tuple(tour.arrival_time_sequence), tour.sum_travel_distance)
+                      for tour in carrier.tours) == schedules
@@ -0,0 +1,76 @@
+from copy import deepcopy
+from math import ceil, log
+
+import pytest
+
+from routing_module import metaheuristics as mh, neighborhoods as nh, stopping_rules as sr
+
+
+@pytest.fixture
+def carrier(start):
+    instance, solution = start
+    return instance, solution.carriers[0]
+
+
+def test_no_improvement(carrier):
+    instance, carrier = carrier
+    rule = sr.NoImprovement(max_iterations=3)
+    rule.start(instance, carrier)
+    objective = carrier.objective()
+    for new_objective in [objective - 1, objective, objective + 1, objective + 1, objective]:
+        rule.update(new_objective)
+        assert not rule.stop()
+    rule.update(objective - 5)
+    assert rule.stop()
+
+    # the rule starts from scratch for the next carrier
+    rule.start(instance, carrier)
+    assert not rule.stop()
+
+
+def test_relative_gap(carrier):
+    instance, carrier = carrier
+    revenue = carrier.sum_revenue()
+    rule = sr.RelativeGap(lambda instance_, carrier_: 800, max_gap=0.2)
+    rule.start(instance, carrier)
+    rule.update(revenue - 1200)
+    assert rule.gap() == pytest.approx(400 / 1200) and not rule.stop()
+    rule.update(revenue - 1000)
+    assert rule.gap() == pytest.approx(0.2) and rule.stop()
+    # the gap of the best distance
+    rule.update(revenue - 1100)
+    assert rule.gap() == pytest.approx(0.2) and rule.stop()
+
+
+def test_exponential_moving_average_plateau(carrier):
+    instance, carrier = carrier
+    rule = sr.ExponentialMovingAveragePlateau(smoothing=0.5, tolerance=1e-3, min_iterations=4)
+    rule.start(instance, carrier)
+    objective = carrier.objective()
+    # no changes, but not within the first min_iterations
+    for _ in range(3):
+        rule.update(objective)
+        assert not rule.stop()
+    rule.update(objective)
+    assert rule.stop()
+
+    # a large change keeps the search going until its weight has decayed: 0.5 * 100 * 0.5^k <= 1e-3 * objective
+    rule.update(objective + 100)
+    num_iterations = 0
+    while not rule.stop():
+        rule.update(objective + 100)
+        num_iterations += 1
+    assert num_iterations == ceil(log(1e-3 * abs(objective + 100) / 50, 0.5))
+
+
+@pytest.mark.parametrize('name', ['PDPTWSimulatedAnnealing', 'PDPTWAdaptiveLargeNeighborhoodSearch'])
+def test_stopping_rule_ends_search(start, name):
+    """a metaheuristic stops once a rule is met, long before its budget is spent"""
+    instance, solution = start
+    metaheuristic = getattr(mh, name)([nh.PDPMove(), nh.PDPRelocate()], 1)
+    metaheuristic.set_budget(10 ** 9, 'move_evaluations')
+    rule = sr.NoImprovement(max_iterations=20)
+    metaheuristic.add_stopping_rule(rule)
+    metaheuristic.execute(instance, deepcopy(solution), [0])
+    assert rule.stop()
+    assert rule.iteration - rule._last_improvement == 20
@@ -0,0 +1,125 @@
+import random
+from copy import deepcopy
+
+import pytest
+
+from core_module import tour as tr
+
+
+def schedule_feasible(instance, tour: tr.Tour) -> bool:
+    """brute force: the time windows, the load on board at every vertex and the tour length"""
+    if tour.sum_travel_distance > instance.vehicles_max_travel_distance:
+        return False
+    load = 0
+    for vertex, arrival_time in zip(tour.routing_sequence, tour.arrival_time_sequence):
+        load += instance.vertex_load[vertex]
+        if load > instance.vehicles_max_load or arrival_time > instance.tw_close[vertex]:
+            return False
+    return True
+
+
+def insertion_feasible(instance, tour: tr.Tour, insertion_indices, insertion_vertices) -> bool:
+    copy = deepcopy(tour)
+    copy.insert_and_update(instance, insertion_indices, insertion_vertices)
+    return schedule_feasible(instance, copy)
+
+
+def pop_insert_feasible(instance, tour: tr.Tour, pop_indices, insertion_indices, insertion_vertices) -> bool:
+    copy = deepcopy(tour)
+    copy.pop_and_update(instance, pop_indices)
+    copy.insert_and_update(instance, insertion_indices, insertion_vertices)
+    return schedule_feasible(instance, copy)
+
+
+@pytest.fixture(params=[None, 12], ids=['capacity', 'tight capacity'])
+def tours(request, start):
+    """the construction's tours and the requests of the other carriers. The tight capacity makes the load binding"""
+    instance, solution = deepcopy(start)
+    if request.param is not None:
+        instance.vehicles_max_load = request.param
+    tours = []
+    for carrier in solution.carriers:
+        other_requests = [r for other in solution.carriers if other is not carrier for r in other.routed_requests]
+        tours.extend((tour, other_requests) for tour in carrier.tours if schedule_feasible(instance, tour))
+    assert tours
+    return instance, tours
+
+
+def test_insertion_feasibility_check(tours):
+    instance, tours = tours
+    rng = random.Random(0)
+    for tour, requests in tours:
+        for _ in range(100):
+            pickup, delivery = instance.pickup_delivery_pair(rng.choice(requests))
+            pickup_pos = rng.randint(1, len(tour) - 1)
+            delivery_pos = rng.randint(pickup_pos + 1, len(tour))
+            assert tour.insertion_feasibility_check(instance, [pickup_pos, delivery_pos], [pickup, delivery]) == \
+                   insertion_feasible(instance, tour, [pickup_pos, delivery_pos], [pickup, delivery])
+            # a single pickup increases the load until the end of the tour
+            assert tour.insertion_feasibility_check(instance, [pickup_pos], [pickup]) == \
+                   insertion_feasible(instance, tour, [pickup_pos], [pickup])
+            assert tour.pop_insert_feasibility_check(instance, [], [pickup_pos], [pickup]) == \
+                   insertion_feasible(instance, tour, [pickup_pos], [pickup])
+
+
+def test_pop_insert_feasibility_check(tours):
+    """moves of a request within its tour, as in PDPMove"""
+    instance, tours = tours
+    rng = random.Random(0)
+    for tour, _ in tours:
+        for request in tour.requests:
+            pickup, delivery = instance.pickup_delivery_pair(request)
+            pop_indices = [tour.vertex_pos[pickup], tour.vertex_pos[delivery]]
+            for _ in range(20):
+                pickup_pos = rng.randint(1, len(tour) - 3)
+                delivery_pos = rng.randint(pickup_pos + 1, len(tour) - 2)
+                assert tour.pop_insert_feasibility_check(instance, pop_indices, [pickup_pos, delivery_pos],
+                                                         [pickup, delivery]) == \
+                       pop_insert_feasible(instance, tour, pop_indices, [pickup_pos, delivery_pos], [pickup, delivery])
+
+
+def test_reversal_feasibility_check(tours):
+    instance, tours = tours
+    for tour, _ in tours:
+        for i in range(len(tour) - 2):
+            reversed_sections = []
+            for j in range(i + 1, len(tour) - 1):
+                copy = deepcopy(tour)
+                section = copy.routing_sequence[i + 1:j + 1]
+                copy.pop_and_update(instance, list(range(i + 1, j + 1)))
+                copy.insert_and_update(instance, list(range(i + 1, j + 1)), section[::-1])
+                precedence = all(copy.vertex_pos[vertex - instance.num_requests] < copy.vertex_pos[vertex]
+                                 for vertex in section if instance.vertex_type(vertex) == 'delivery')
+                assert tour.reversal_feasibility_check(instance, i, j, reversed_sections) == \
+                       (precedence and schedule_feasible(instance, copy))
+
+
+def assert_same_schedule(tour: tr.Tour, other: tr.Tour):
+    assert (tour.routing_sequence, tour.vertex_pos, tour.arrival_time_sequence, tour.service_time_sequence,
+            tour.wait_duration_sequence, tour.max_shift_sequence, tour.sum_travel_duration) == \
+           (other.routing_sequence, other.vertex_pos, other.arrival_time_sequence, other.service_time_sequence,
+            other.wait_duration_sequence, other.max_shift_sequence, other.sum_travel_duration)
+    # summed in a different order
+    assert (tour.sum_travel_distance, tour.sum_load, tour.sum_revenue, tour.sum_profit) == \
+           pytest.approx((other.sum_travel_distance, other.sum_load, other.sum_revenue, other.sum_profit), abs=1e-9)
+
+
+def test_batch_pop_and_insert(tours):
+    """popping and inserting several vertices at once gives the same tour as one vertex at a time"""
+    instance, tours = tours
+    rng = random.Random(0)
+    for tour, _ in tours:
+        for _ in range(20):
+            pop_indices = sorted(rng.sample(range(1, len(tour) - 1), rng.randint(1, len(tour) - 2)))
+            batch, sequential = deepcopy(tour), deepcopy(tour)
+            popped = batch.pop_and_update(instance, pop_indices)
+            for pop_index in reversed(pop_indices):
+                sequential.pop_and_update(instance, [pop_index])
+            assert_same_schedule(batch, sequential)
+            assert list(popped) == [tour.routing_sequence[pop_index] for pop_index in pop_indices]
+
+            insertion_indices = sorted(rng.sample(range(1, len(tour) - 1), len(pop_indices)))
+            batch.insert_and_update(instance, insertion_indices, popped)
+            for insertion_index, vertex in zip(insertion_indices, popped):
+                sequential.insert_and_update(instance, [insertion_index], [vertex])
+            assert_same_schedule(batch, sequential)
@@ -414,6 +414,8 @@ solver_config = [
     'neighborhoods',
     'tour_construction',
     'tour_improvement_time_limit_per_carrier',
+    'tour_improvement_budget_unit',
+    'tour_improvement_budget_per_carrier',
     'time_window_offering',
     'time_window_selection',
 